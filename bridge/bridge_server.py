@@ -4,23 +4,76 @@ WebSocket server that bridges GMod and LM Studio.
 """
 
 import asyncio
-import json
 import signal
 import sys
-from typing import Dict, Set
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Set, Tuple
 import websockets
-from websockets.server import serve
 
-from config import WEBSOCKET_HOST, WEBSOCKET_PORT, DEBUG
+try:
+    # websockets >= 13 can hand us frames as bytes and send bytes as text frames
+    from websockets.asyncio.server import serve
+    RAW_FRAMES = True
+except ImportError:
+    from websockets.server import serve
+    RAW_FRAMES = False
+
+import codec
+from catalog import SEARCH_TOOL_NAME, base_catalog
+from companions import CompanionPlanner
+from confirmations import confirmation, single_action, templated
+from config import (
+    WEBSOCKET_HOST, WEBSOCKET_PORT, DEBUG, WORLD_STATE_ENABLED,
+    SUPERSEDE_PREVIOUS_MESSAGES, METRICS_LOG_INTERVAL, WARMUP_ENABLED,
+    MCP_HTTP_ENABLED, MCP_HTTP_HOST, MCP_HTTP_PORT, MCP_HTTP_TOKEN, MCP_TOOL_TIMEOUT, MCP_ALLOW_ADMIN_TOOLS, SCHEDULER_PRIORITIES, PLAN_STEP_TIMEOUT,
+    CATALOG_ENABLED
+)
 from lm_client import LMStudioClient
+from mcp_server import MCPHandler, serve_http
+from metrics import metrics
+from optimistic import PROVISIONAL_OUTCOME, Speculation, eligible
+from outbound import OutboundQueue
+from plans import PLAN_TOOL_NAME, Plan
+from reload import reload_modules, ReloadError
+from scheduler import AdmissionScheduler, ServerBusy
+from sessions import ServerSession, server_id_from_handshake, client_overrides
+from store import create_store
+from streaming import ChatStream, split_message
+from tool_cache import ToolCache
+from tools import ADMIN_TOOLS
+from usage import UsageLedger
+from validation import validate_tool_call
+from warmup import Warmer
+from world_state import WorldState
+
+
+BUSY_MESSAGE = "The AI is busy right now, please try again in a moment."
 
 
 class BridgeServer:
     def __init__(self):
         self.clients: Set[websockets.WebSocketServerProtocol] = set()
-        self.client_info: Dict[websockets.WebSocketServerProtocol, dict] = {}
-        self.lm_client = LMStudioClient()
-        self.pending_tool_calls: Dict[str, dict] = {}  # message_id -> tool call info
+        self.lm_client = LMStudioClient()  # Default client shared by servers without overrides
+        self.lm_clients: Dict[str, LMStudioClient] = {}  # server_id -> client with overrides
+        self.sessions: Dict[str, ServerSession] = {}  # server_id -> session
+        self.connections: Dict[websockets.WebSocketServerProtocol, ServerSession] = {}
+        self.outbound: Dict[websockets.WebSocketServerProtocol, OutboundQueue] = {}  # One writer per connection
+        self.scheduler = AdmissionScheduler()
+        self.usage = UsageLedger()
+        self.store = create_store()  # Conversations, pending tool calls and server info
+        self.stored_conversations = {}  # conversation_id -> messages as last read from / written to the store
+        self.tool_cache = ToolCache()
+        self.mcp_calls: Dict[str, dict] = {}  # call id -> direct tool call from MCP or a plan step (server_id, future)
+        self.active_turns: Dict[str, dict] = {}  # conversation_id -> in-flight message info
+        self.streams: Dict[str, ChatStream] = {}  # message_id -> answer being streamed
+        self.companions = CompanionPlanner()  # AI Live autonomy ticks
+        self.speculations: Dict[str, Speculation] = {}  # message_id -> optimistic continuation
+        self.plans: Dict[str, Tuple[str, asyncio.Task]] = {}  # run_plan tool_call_id -> (message_id, task)
+        self.tasks: Set[asyncio.Task] = set()
+        self.warmer = Warmer(self) if WARMUP_ENABLED else None
+        self.mcp_handler = None
         
     async def handle_client(self, websocket):
         """Handle a new client connection."""
@@ -28,61 +81,197 @@ class BridgeServer:
         client_id = id(websocket)
         print(f"[Bridge] Client connected: {client_id}")
         
+        # Until the handshake names it, the connection gets an anonymous session
+        session = ServerSession(f"conn-{client_id}", websocket, self.lm_client)
+        self.sessions[session.server_id] = session
+        self.connections[websocket] = session
+        
+        queue = OutboundQueue(websocket, self.send_frame)
+        self.outbound[websocket] = queue
+        writer = asyncio.create_task(queue.run())
+        
         try:
-            async for message in websocket:
-                await self.handle_message(websocket, message)
+            while True:
+                # Skip the UTF-8 decode when the codec can parse the raw frame
+                message = await websocket.recv(decode=False) if RAW_FRAMES else await websocket.recv()
+                
+                # Run each message as its own task so a long generation doesn't
+                # block tool results or cancel requests arriving behind it
+                task = asyncio.create_task(self.handle_message(websocket, message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
         except websockets.exceptions.ConnectionClosed:
             print(f"[Bridge] Client disconnected: {client_id}")
         finally:
+            await queue.close()
+            await writer
+            del self.outbound[websocket]
             self.clients.remove(websocket)
-            if websocket in self.client_info:
-                del self.client_info[websocket]
+            session = self.connections.pop(websocket)
+            if session.websocket is websocket:
+                self.fail_mcp_calls(session.server_id, "GMod server disconnected")
+                # Keep named sessions (and their conversations) for when the server reconnects
+                session.websocket = None
+                session.world = WorldState()
+                if session.server_id == f"conn-{client_id}":
+                    del self.sessions[session.server_id]
     
     async def handle_message(self, websocket, message):
         """Handle an incoming message from GMod."""
+        session = self.connections.get(websocket)
         try:
-            data = json.loads(message)
+            data = codec.loads(message)
             msg_type = data.get("type")
             
-            if DEBUG:
+            if DEBUG and msg_type != "world_state":
                 print(f"[Bridge] Received: {msg_type} - {str(data)[:200]}")
             
             if msg_type == "handshake":
                 await self.handle_handshake(websocket, data)
                 
             elif msg_type == "chat":
-                await self.handle_chat(websocket, data)
+                await self.handle_chat(session, data)
                 
             elif msg_type == "tool_result":
-                await self.handle_tool_result(websocket, data)
+                await self.handle_tool_result(session, data)
+            
+            elif msg_type == "world_state":
+                await self.handle_world_state(session, data)
+            
+            elif msg_type == "cancel":
+                await self.handle_cancel(session, data)
+            
+            elif msg_type == "control":
+                await self.handle_control(session, data)
+            
+            elif msg_type == "companion_tick":
+                await self.handle_companion_tick(session, data)
+            
+            elif msg_type == "usage_report":
+                await self.handle_usage_report(session, data)
+            
+            elif msg_type == "reload_config":
+                await self.handle_reload_config(session, data)
             
             elif msg_type == "mcp_tool_call":
                 # Direct tool call from MCP server
-                await self.handle_mcp_tool_call(websocket, data)
+                await self.handle_mcp_tool_call(session, data)
+            
+            elif msg_type == "mcp_list_servers":
+                await self.send(websocket, {
+                    "type": "mcp_servers",
+                    "call_id": data.get("call_id"),
+                    "servers": await self.list_servers()
+                })
                 
             else:
                 print(f"[Bridge] Unknown message type: {msg_type}")
                 
-        except json.JSONDecodeError as e:
+        except codec.DecodeError as e:
             print(f"[Bridge] JSON decode error: {e}")
         except Exception as e:
             print(f"[Bridge] Error handling message: {e}")
             await self.send_error(websocket, data.get("message_id"), str(e))
     
     async def handle_handshake(self, websocket, data):
-        """Handle handshake from GMod server."""
-        self.client_info[websocket] = {
+        """Handle handshake from GMod server and bind the connection to its server session."""
+        server_id = server_id_from_handshake(data, websocket)
+        anonymous = self.connections[websocket]
+        
+        session = self.sessions.get(server_id)
+        if session is None:
+            session = ServerSession(server_id, websocket, self.client_for(server_id))
+            self.sessions[server_id] = session
+        else:
+            # Reconnect (or a new socket for a known server) - conversations carry over
+            session.websocket = websocket
+            session.world = WorldState()
+        
+        if anonymous is not session:
+            self.sessions.pop(anonymous.server_id, None)
+            self.connections[websocket] = session
+        
+        session.info = {
             "server_name": data.get("server_name", "Unknown"),
             "map": data.get("map", "Unknown"),
             "max_players": data.get("max_players", 0),
             "player_count": data.get("player_count", 0)
         }
-        print(f"[Bridge] GMod server connected: {data.get('server_name')} on {data.get('map')}")
+        await self.store.save_server_info(server_id, session.info)
+        
+        # The server's installed models and classes, sent once per connection
+        if data.get("assets"):
+            session.assets = data["assets"]
+            session.catalog = self.catalog_for(session)
+            if DEBUG:
+                print(f"[Bridge] Asset catalog for {server_id}: {session.catalog.counts()}")
+        print(f"[Bridge] GMod server connected: {data.get('server_name')} on {data.get('map')} (server id: {server_id})")
+    
+    @staticmethod
+    def catalog_for(session):
+        """The asset catalog for a server: CATALOG_FILE with the server's own assets on top."""
+        if CATALOG_ENABLED and session.assets:
+            return base_catalog().merged(session.assets)
+        return base_catalog()
     
-    async def handle_chat(self, websocket, data):
+    def client_for(self, server_id):
+        """Return the provider client for a server, honouring SERVER_OVERRIDES."""
+        overrides = client_overrides(server_id)
+        if overrides is None:
+            return self.lm_client
+        if server_id not in self.lm_clients:
+            self.lm_clients[server_id] = LMStudioClient(**overrides)
+            if self.warmer:
+                self.warmer.warm_soon(self.lm_clients[server_id])
+        return self.lm_clients[server_id]
+    
+    def clients_in_use(self):
+        """Distinct provider clients: the default one and any per-server ones."""
+        clients = {id(self.lm_client): self.lm_client}
+        for client in self.lm_clients.values():
+            clients[id(client)] = client
+        return list(clients.values())
+    
+    def connected(self):
+        """Whether any GMod server is connected."""
+        # Anonymous sessions are connections that never sent a handshake (e.g. the stdio MCP server)
+        return any(session.connected and not session.server_id.startswith("conn-")
+                   for session in self.sessions.values())
+    
+    def session_for_tool_call(self, server_id=None):
+        """Pick the GMod server a direct tool call should run on. Returns (session, error)."""
+        connected = [s for s in self.sessions.values() if s.connected and s.info]
+        if server_id:
+            session = self.sessions.get(server_id)
+            if not session or not session.connected:
+                return None, f"GMod server '{server_id}' is not connected"
+            return session, None
+        if len(connected) == 1:
+            return connected[0], None
+        if not connected:
+            return None, "No GMod server connected"
+        return None, "Several GMod servers are connected, specify server_id: " + ", ".join(s.server_id for s in connected)
+    
+    async def handle_world_state(self, session, data):
+        """Apply a world state snapshot or delta from GMod."""
+        if not WORLD_STATE_ENABLED:
+            return
+        if not session.world.apply(data):
+            await self.send(session.websocket, {"type": "world_state_resync"})
+    
+    async def handle_chat(self, session, data):
         """Handle a chat message from a player."""
+        websocket = session.websocket
         message_id = data.get("message_id", "unknown")
         player_id = data.get("player", {}).get("steamid", "unknown")
+        conversation_id = session.conversation_id(player_id)
+        
+        # Newest message supersedes whatever this player still has in flight
+        if SUPERSEDE_PREVIOUS_MESSAGES and conversation_id in self.active_turns:
+            await self.cancel_turn(conversation_id, reason="superseded")
+        is_admin = bool(data.get("player", {}).get("is_admin"))
+        self.begin_turn(session, conversation_id, player_id, message_id, is_admin)
+        received = time.monotonic()
         
         # Send thinking status
         await self.send(websocket, {
@@ -90,62 +279,321 @@ class BridgeServer:
             "message_id": message_id
         })
         
+        # Enrich the context block from the world state mirror if it is fresh
+        world_context = session.world.build_context(player_id)
+        if world_context:
+            data["world_context"] = world_context
+        
         # Create stream callback
         async def stream_callback(chunk):
-            await self.send(websocket, {
-                "type": "response_stream",
-                "message_id": message_id,
-                "chunk": chunk
-            })
+            await self.send_stream_chunk(session.websocket, message_id, chunk)
+        
+        # Enforce the player's token budget before spending anything
+        self.usage.remember_name(player_id, data.get("player", {}).get("name"))
+        budget_error = self.usage.check_budget(player_id, is_admin)
+        if budget_error:
+            await self.abort_turn(session, conversation_id, message_id, budget_error)
+            return
         
         # Get response from LM Studio
-        result = await self.lm_client.chat(data, stream_callback)
+        try:
+            priority = self.scheduler.priority_for(is_admin, continuation=False)
+            async with self.provider_slot(session, conversation_id, priority):
+                await self.restore_conversation(session, conversation_id)
+                result = await session.lm_client.chat(data, stream_callback, conversation_id=conversation_id)
+        except ServerBusy:
+            await self.abort_turn(session, conversation_id, message_id, BUSY_MESSAGE)
+            return
+        
+        await self.persist_conversation(session, conversation_id)
+        if "usage" in result:
+            self.usage.record(player_id, result["usage"])
         
         if "error" in result:
-            await self.send_error(websocket, message_id, result["error"])
+            self.end_turn(conversation_id, message_id)
+            await self.send_error(session.websocket, message_id, result["error"])
             return
         
+        # Time until the player sees an answer or the first tool runs
+        time_to_action = time.monotonic() - received
+        metrics.observe("turn.time_to_action", time_to_action)
+        if "effort" in result:
+            metrics.observe(f"turn.time_to_action.{result['effort']}", time_to_action)
+        
         if result["type"] == "tool_calls":
             # AI wants to use tools
-            for tool_call in result["tool_calls"]:
-                tool_call_id = tool_call["id"]
-                
-                # Store pending tool call info using tool_call_id as unique key
-                self.pending_tool_calls[tool_call_id] = {
-                    "websocket": websocket,
-                    "message_id": message_id,
-                    "player_id": player_id,
-                    "tool_call": tool_call,
-                    "total_calls": len(result["tool_calls"])
-                }
-                
-                if DEBUG:
-                    print(f"[Bridge] Stored pending tool call: {tool_call_id} for message {message_id}")
-                
-                # Send tool call to GMod - include tool_call_id for tracking
-                await self.send(websocket, {
-                    "type": "tool_call",
-                    "message_id": message_id,
-                    "tool": tool_call["name"],
-                    "tool_call_id": tool_call_id,
-                    "args": tool_call["arguments"],
-                    "player_id": player_id
-                })
+            await self.dispatch_tool_calls(session, message_id, player_id, result["tool_calls"], is_admin)
         else:
-            # Regular response - send end-of-stream marker
-            await self.send(websocket, {
-                "type": "response_end",
-                "message_id": message_id
-            })
+            self.end_turn(conversation_id, message_id)
+            await self.send_response(session.websocket, message_id, result["text"])
+    
+    async def restore_conversation(self, session, conversation_id):
+        """Load a conversation from the session store (another bridge may have advanced it)."""
+        messages = await self.store.load_conversation(conversation_id)
+        if messages is not None:
+            session.lm_client.conversations[conversation_id] = messages
+            self.stored_conversations[conversation_id] = list(messages)
+    
+    async def persist_conversation(self, session, conversation_id):
+        """Write a conversation back to the session store, keeping what other bridges added meanwhile."""
+        messages = session.lm_client.conversations.get(conversation_id)
+        if messages is None:
+            return
+        known = self.stored_conversations.get(conversation_id)
+        
+        def merge(stored):
+            if stored is None or stored is messages or known is None or stored == known:
+                return messages
+            # Another bridge saved this conversation since it was read here: keep its
+            # history and add the messages this bridge appended (trimming keeps the
+            # message objects it read, so anything else is new)
+            seen = {id(message) for message in known}
+            return stored + [message for message in messages if id(message) not in seen]
+        
+        saved = await self.store.update_conversation(conversation_id, merge)
+        if saved is not messages:
+            session.lm_client.conversations[conversation_id] = saved
+        self.stored_conversations[conversation_id] = list(saved)
+    
+    @asynccontextmanager
+    async def provider_slot(self, session, conversation_id, priority):
+        """Hold a scheduler slot, within both the global and this server's concurrency limit."""
+        async with self.scheduler.slot(conversation_id, priority, session.server_id, session.max_concurrency):
+            yield
+    
+    async def dispatch_tool_calls(self, session, message_id, player_id, tool_calls, is_admin=False):
+        """Register pending tool calls, then answer them locally or forward them to GMod."""
+        # Bad calls are answered here with a precise error instead of failing in GMod
+        rejected = {}
+        plans = {}  # tool_call_id -> Plan for run_plan calls, which the bridge runs itself
+        for tool_call in tool_calls:
+            if tool_call.pop("malformed", False):
+                rejected[tool_call["id"]] = (f"Arguments for {tool_call['name']} were not valid JSON. "
+                                             "Call the tool again with a JSON object of arguments.")
+                metrics.incr("validation.gmod_round_trips_avoided")
+                continue
+            args, changed, error = self.check_arguments(session, tool_call["name"], tool_call["arguments"])
+            if error:
+                rejected[tool_call["id"]] = error
+                continue
+            if changed:
+                tool_call["arguments"] = args
+            if tool_call["name"] == PLAN_TOOL_NAME:
+                plan, error = Plan.parse(tool_call["arguments"])
+                if error:
+                    rejected[tool_call["id"]] = error
+                    metrics.incr("plans.rejected")
+                else:
+                    plans[tool_call["id"]] = plan
+        
+        # A mutating call anywhere in the batch makes cached reads on this server stale
+        if any(self.tool_cache.mutates(tool_call["name"]) for tool_call in tool_calls
+               if tool_call["id"] not in rejected):
+            self.tool_cache.invalidate(session.server_id)
+            session.world.mark_stale()
+        
+        # Register every call first so the completion count is right even if
+        # some of them are answered locally before the rest are sent
+        await self.store.add_tool_calls(session.server_id, message_id, [
+            {
+                "server_id": session.server_id,
+                "message_id": message_id,
+                "player_id": player_id,
+                "conversation_id": session.conversation_id(player_id),
+                "is_admin": is_admin,
+                "tool_call": tool_call,
+                "cache_generation": self.tool_cache.generation(session.server_id, tool_call["name"], player_id)
+            }
+            for tool_call in tool_calls
+        ])
+        
+        if DEBUG:
+            print(f"[Bridge] Stored {len(tool_calls)} pending tool calls for message {message_id}")
+        
+        # Work out which calls are answered here before anything resolves, so an
+        # optimistic continuation starts with every result that is already known
+        answered = {tool_call_id: (False, error) for tool_call_id, error in rejected.items()}
+        for tool_call in tool_calls:
+            if tool_call["id"] not in answered and tool_call["id"] not in plans:
+                local = self.answer_locally(session, tool_call, player_id)
+                if local is not None:
+                    answered[tool_call["id"]] = local
+        remote = [tool_call for tool_call in tool_calls if tool_call["id"] not in answered]
+        conversation = session.lm_client.conversations.get(session.conversation_id(player_id), [])
+        # A round the confirmation templates will answer needs no follow-up generation at all
+        confirmable = templated(tool_call["name"] for tool_call in tool_calls) and single_action(conversation)
+        if eligible(remote) and not confirmable:
+            self.start_speculation(session, message_id, player_id, tool_calls, answered, is_admin)
+        
+        for tool_call in tool_calls:
+            tool_call_id = tool_call["id"]
+            
+            if tool_call_id in answered:
+                success, result = answered[tool_call_id]
+                if DEBUG and tool_call_id not in rejected:
+                    print(f"[Bridge] Answered {tool_call['name']} locally ({tool_call_id})")
+                await self.complete_tool_call(tool_call_id, success, result, cache_result=False)
+                continue
             
-            # Also send complete response for chat display
-            await self.send(websocket, {
-                "type": "response",
+            if tool_call_id in plans:
+                self.start_plan(session, message_id, player_id, tool_call, plans[tool_call_id])
+                continue
+            
+            # Send tool call to GMod - include tool_call_id for tracking
+            await self.send(session.websocket, {
+                "type": "tool_call",
                 "message_id": message_id,
-                "text": result["text"]
+                "tool": tool_call["name"],
+                "tool_call_id": tool_call_id,
+                "args": tool_call["arguments"],
+                "player_id": player_id
             })
     
-    async def handle_tool_result(self, websocket, data):
+    def start_plan(self, session, message_id, player_id, tool_call, plan):
+        """Run a run_plan call in the background; its report completes the call like a GMod result."""
+        if DEBUG:
+            print(f"[Bridge] Running {len(plan.steps)}-step plan for message {message_id}")
+        task = asyncio.create_task(self.execute_plan(session, message_id, player_id, tool_call, plan))
+        self.plans[tool_call["id"]] = (message_id, task)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def execute_plan(self, session, message_id, player_id, tool_call, plan):
+        """Execute a plan's steps against GMod, then hand the report to the conversation."""
+        async def call(tool_name, args):
+            return await self.call_tool(tool_name, args, server_id=session.server_id, player_id=player_id,
+                                        timeout=PLAN_STEP_TIMEOUT, source="plan_steps")
+        
+        try:
+            report = await plan.run(call)
+        finally:
+            self.plans.pop(tool_call["id"], None)
+        # The model is only asked again once the whole plan is done (or a step failed)
+        await self.complete_tool_call(tool_call["id"], plan.succeeded(), report, cache_result=False)
+    
+    def start_speculation(self, session, message_id, player_id, tool_calls, answered, is_admin):
+        """Generate the follow-up answer now, assuming the calls sent to GMod succeed."""
+        if self.usage.check_budget(player_id, is_admin):
+            return
+        conversation_id = session.conversation_id(player_id)
+        results = []
+        for tool_call in tool_calls:
+            if tool_call["id"] in answered:
+                success, result = answered[tool_call["id"]]
+                outcome = {"success": success, "result": result}
+            else:
+                outcome = PROVISIONAL_OUTCOME
+            results.append((tool_call["id"], tool_call["name"], outcome))
+        provisional = [tool_call["id"] for tool_call in tool_calls if tool_call["id"] not in answered]
+        speculation = Speculation(message_id, conversation_id, provisional)
+        speculation.task = asyncio.create_task(self.speculate(session, speculation, results, is_admin))
+        self.speculations[message_id] = speculation
+        metrics.incr("optimistic.started")
+    
+    async def speculate(self, session, speculation, results, is_admin):
+        """Run the optimistic continuation, holding its text back until it is kept."""
+        async def stream_callback(chunk):
+            if speculation.live:
+                await self.send_stream_chunk(session.websocket, speculation.message_id, chunk)
+            else:
+                speculation.held.append(chunk)
+        
+        try:
+            priority = self.scheduler.priority_for(is_admin, continuation=True)
+            async with self.provider_slot(session, speculation.conversation_id, priority):
+                return await session.lm_client.continue_speculatively(
+                    speculation.conversation_id, results, stream_callback
+                )
+        except ServerBusy:
+            return None  # The real results are continued the usual way
+        finally:
+            speculation.finished_at = time.monotonic()
+    
+    async def settle_speculation(self, session, speculation, completed, player_id):
+        """
+        Keep an optimistic continuation once the real results are in. Returns
+        its result, or None if a tool failed (or the generation did) and the
+        answer has to be generated again from the real results.
+        """
+        results_at = time.monotonic()
+        outcomes = {entry["tool_call"]["id"]: outcome for entry, outcome in completed}
+        failed = speculation.failed_tools(outcomes)
+        if failed:
+            task = speculation.task
+            task.cancel()
+            await asyncio.wait([task], timeout=5)
+            # The wasted answer was already paid for, in full or up to the cancel
+            if task.done() and not task.cancelled() and task.exception() is None and task.result():
+                wasted = task.result()[0].get("usage")
+            else:
+                wasted = session.lm_client.take_interrupted_usage(speculation.conversation_id)
+            if wasted:
+                self.usage.record(player_id, wasted)
+                metrics.incr("optimistic.tokens_wasted", wasted["total_tokens"])
+            metrics.incr("optimistic.regenerated")
+            if DEBUG:
+                print(f"[Bridge] Optimistic continuation for {speculation.message_id} dropped, "
+                      f"{len(failed)} tool(s) failed")
+            return None
+        
+        # Text generated so far goes out now; the rest streams live
+        while speculation.held:
+            text = "".join(speculation.held)
+            speculation.held.clear()
+            await self.send_stream_chunk(session.websocket, speculation.message_id, text)
+        speculation.live = True
+        outcome = await speculation.task
+        if outcome is None:
+            metrics.incr("optimistic.busy")
+            return None
+        result, messages, escalated = outcome
+        if "error" in result:
+            metrics.incr("optimistic.errors")
+            return None
+        
+        real = [(entry["tool_call"]["id"], entry["tool_call"]["name"], outcome)
+                for entry, outcome in completed if entry["tool_call"]["id"] in speculation.provisional]
+        session.lm_client.keep_speculation(speculation.conversation_id, messages, escalated, real)
+        saved = speculation.latency_saved(results_at)
+        metrics.incr("optimistic.kept")
+        metrics.observe("optimistic.latency_saved", saved)
+        if DEBUG:
+            print(f"[Bridge] Optimistic continuation for {speculation.message_id} kept, {saved:.2f}s saved")
+        return result
+    
+    def check_arguments(self, session, tool_name, args):
+        """Validate and coerce tool arguments, then fix asset names from the catalog. Returns (args, changed, error)."""
+        args, changed, error = validate_tool_call(tool_name, args)
+        if not error and CATALOG_ENABLED:
+            args, normalized, error = session.catalog.normalize(tool_name, args)
+            changed = changed or normalized
+            if normalized:
+                metrics.incr("catalog.normalized")
+            if error:
+                metrics.incr("catalog.rejected")
+        if error:
+            metrics.incr("validation.rejected")
+            metrics.incr(f"validation.rejected.{tool_name}")
+            metrics.incr("validation.gmod_round_trips_avoided")
+            if DEBUG:
+                print(f"[Bridge] Rejected {tool_name} call: {error}")
+        elif changed:
+            metrics.incr("validation.coerced")
+        return args, changed, error
+    
+    def answer_locally(self, session, tool_call, player_id):
+        """Return (success, result) if a tool call can be answered without GMod, else None."""
+        if tool_call["name"] == SEARCH_TOOL_NAME:
+            metrics.incr("catalog.searches")
+            return True, session.catalog.answer(tool_call["arguments"])
+        if session.world.can_answer(tool_call["name"], player_id):
+            return session.world.answer(tool_call["name"], tool_call["arguments"], player_id)
+        cached = self.tool_cache.get(session.server_id, tool_call["name"], tool_call["arguments"], player_id)
+        if cached is not None:
+            return True, cached
+        return None
+    
+    async def handle_tool_result(self, session, data):
         """Handle tool execution result from GMod."""
         message_id = data.get("message_id")
         tool_call_id = data.get("tool_call_id")
@@ -155,67 +603,116 @@ class BridgeServer:
         
         if DEBUG:
             print(f"[Bridge] Tool result received - message_id: {message_id}, tool_call_id: {tool_call_id}, tool: {tool_name}")
-            print(f"[Bridge] Pending tool calls: {list(self.pending_tool_calls.keys())}")
+        
+        # Snapshots and lookups answered before GMod ran a mutating tool do not show its effect
+        if tool_name and self.tool_cache.mutates(tool_name):
+            session.world.mark_stale()
+            if success:
+                self.tool_cache.invalidate(session.server_id)
+        
+        # Direct MCP calls are correlated by their own id and bypass the conversation
+        mcp_call = self.mcp_calls.get(tool_call_id or message_id)
+        if mcp_call:
+            if not mcp_call["future"].done():
+                mcp_call["future"].set_result((success, result))
+            return
         
         # Look up by tool_call_id first (preferred), fall back to message_id + tool_name for backwards compatibility
-        pending = None
         lookup_key = None
         
-        if tool_call_id and tool_call_id in self.pending_tool_calls:
+        if tool_call_id and await self.store.get_tool_call(tool_call_id):
             lookup_key = tool_call_id
-            pending = self.pending_tool_calls[lookup_key]
         elif message_id:
             # Fallback: try to find by message_id
-            for key, value in self.pending_tool_calls.items():
-                if value.get("message_id") == message_id and value.get("tool_call", {}).get("name") == tool_name:
+            for key in await self.store.pending_tool_calls(session.server_id, message_id):
+                pending = await self.store.get_tool_call(key)
+                if pending and pending["tool_call"]["name"] == tool_name:
                     lookup_key = key
-                    pending = value
                     break
         
-        if not pending:
+        if not lookup_key:
             print(f"[Bridge] No pending tool call found for tool_call_id: {tool_call_id}, message_id: {message_id}, tool: {tool_name}")
-            print(f"[Bridge] Available pending calls: {self.pending_tool_calls}")
             return
         
+        await self.complete_tool_call(lookup_key, success, result)
+    
+    async def complete_tool_call(self, lookup_key, success, result, cache_result=True):
+        """Record a tool result and continue the conversation once every call for the message is done."""
+        resolved = await self.store.resolve_tool_call(lookup_key, {"success": success, "result": result})
+        if resolved is None:
+            # Already resolved (duplicate result) or dropped by a cancel
+            return
+        pending, completed = resolved
+        
+        if cache_result and success:
+            tool_call = pending["tool_call"]
+            self.tool_cache.put(pending["server_id"], tool_call["name"], tool_call["arguments"],
+                                pending["player_id"], result, pending.get("cache_generation"))
+        session = self.sessions.get(pending["server_id"])
         player_id = pending["player_id"]
-        tool_call = pending["tool_call"]
+        conversation_id = pending["conversation_id"]
         original_message_id = pending["message_id"]
         
         if DEBUG:
             print(f"[Bridge] Found pending call with key: {lookup_key}, original message_id: {original_message_id}")
         
-        # Add tool result to LM Studio conversation
-        self.lm_client.add_tool_result(
-            player_id,
-            tool_call["id"],
-            tool_name,
-            {"success": success, "result": result}
-        )
-        
-        del self.pending_tool_calls[lookup_key]
-        
-        # Check if all tool calls for this original message are complete
-        remaining = sum(1 for k, v in self.pending_tool_calls.items() if v.get("message_id") == original_message_id)
-        
-        if remaining == 0:
+        # Only the node that resolves the last call of the batch continues the conversation
+        if completed is not None and session is not None:
             if DEBUG:
                 print(f"[Bridge] All tool calls complete for message {original_message_id}, getting final AI response")
             
-            # All tools executed, get final response from AI
-            async def stream_callback(chunk):
-                await self.send(websocket, {
-                    "type": "response_stream",
-                    "message_id": original_message_id,
-                    "chunk": chunk
-                })
+            # The continuation now belongs to this task, so a cancel aborts it
+            turn = self.active_turns.get(conversation_id)
+            if turn and turn["message_id"] == original_message_id:
+                turn["task"] = asyncio.current_task()
+            is_admin = pending.get("is_admin", False)
+            
+            # An optimistic continuation may already hold the answer
+            result = None
+            speculation = self.speculations.pop(original_message_id, None)
+            if speculation:
+                result = await self.settle_speculation(session, speculation, completed, player_id)
             
-            result = await self.lm_client.continue_after_tools(player_id, stream_callback)
+            if result is None:
+                # Add tool results to the conversation in the order the model asked for them
+                await self.restore_conversation(session, conversation_id)
+                for entry, outcome in completed:
+                    session.lm_client.add_tool_result(
+                        conversation_id,
+                        entry["tool_call"]["id"],
+                        entry["tool_call"]["name"],
+                        outcome
+                    )
+                result = self.confirm_from_templates(session, conversation_id, completed)
+            
+            if result is None:
+                # All tools executed, get final response from AI
+                async def stream_callback(chunk):
+                    await self.send_stream_chunk(session.websocket, original_message_id, chunk)
+                
+                budget_error = self.usage.check_budget(player_id, is_admin)
+                if budget_error:
+                    await self.abort_turn(session, conversation_id, original_message_id, budget_error, repair_history=True)
+                    return
+                
+                try:
+                    priority = self.scheduler.priority_for(is_admin, continuation=True)
+                    async with self.provider_slot(session, conversation_id, priority):
+                        result = await session.lm_client.continue_after_tools(conversation_id, stream_callback)
+                except ServerBusy:
+                    await self.abort_turn(session, conversation_id, original_message_id, BUSY_MESSAGE, repair_history=True)
+                    return
+            
+            await self.persist_conversation(session, conversation_id)
+            if "usage" in result:
+                self.usage.record(player_id, result["usage"])
             
             if DEBUG:
                 print(f"[Bridge] AI continuation result type: {result.get('type', 'unknown')}")
             
             if "error" in result:
-                await self.send_error(websocket, original_message_id, result["error"])
+                self.end_turn(conversation_id, original_message_id)
+                await self.send_error(session.websocket, original_message_id, result["error"])
                 return
             
             if result["type"] == "tool_calls":
@@ -223,92 +720,454 @@ class BridgeServer:
                 if DEBUG:
                     print(f"[Bridge] AI requested {len(result['tool_calls'])} more tool calls")
                 
-                for tool_call in result["tool_calls"]:
-                    tool_call_id = tool_call["id"]
-                    
-                    self.pending_tool_calls[tool_call_id] = {
-                        "websocket": websocket,
-                        "message_id": original_message_id,
-                        "player_id": player_id,
-                        "tool_call": tool_call
-                    }
-                    
-                    await self.send(websocket, {
-                        "type": "tool_call",
-                        "message_id": original_message_id,
-                        "tool": tool_call["name"],
-                        "tool_call_id": tool_call_id,
-                        "args": tool_call["arguments"],
-                        "player_id": player_id
-                    })
+                await self.dispatch_tool_calls(session, original_message_id, player_id, result["tool_calls"], is_admin)
             else:
                 # Send final response
                 if DEBUG:
                     print(f"[Bridge] Sending final response: {result.get('text', '')[:100]}...")
                 
-                await self.send(websocket, {
-                    "type": "response_end",
-                    "message_id": original_message_id
-                })
-                
-                await self.send(websocket, {
-                    "type": "response",
-                    "message_id": original_message_id,
-                    "text": result["text"]
-                })
+                self.end_turn(conversation_id, original_message_id)
+                await self.send_response(session.websocket, original_message_id, result["text"])
+        elif DEBUG:
+            print(f"[Bridge] Tool calls still pending for message {original_message_id}")
+    
+    def confirm_from_templates(self, session, conversation_id, completed):
+        """Answer a round of simple successful actions from CONFIRMATION_TEMPLATES, without the provider."""
+        client = session.lm_client
+        text = confirmation(client.conversations.get(conversation_id, []), [
+            (entry["tool_call"]["name"], entry["tool_call"]["arguments"], outcome) for entry, outcome in completed
+        ])
+        if text is None:
+            return None
+        # The provider call this replaces would have resent the whole history
+        metrics.incr("confirmations.templated")
+        metrics.incr("confirmations.tokens_saved_est", client.estimate_tokens(conversation_id))
+        client.add_assistant_message(conversation_id, text)
+        if DEBUG:
+            print(f"[Bridge] Confirmed from templates for {conversation_id}: {text}")
+        return {"type": "response", "text": text}
+    
+    def begin_turn(self, session, conversation_id, player_id, message_id, is_admin=False):
+        """Track a player's in-flight message so it can be cancelled."""
+        self.active_turns[conversation_id] = {
+            "message_id": message_id,
+            "server_id": session.server_id,
+            "player_id": player_id,  # Server ids may contain ":" (IP:port), so it is not parsed from the key
+            "task": asyncio.current_task(),
+            "is_admin": is_admin,
+            "lm_client": session.lm_client  # Still there if the server disconnects mid-turn
+        }
+    
+    def end_turn(self, conversation_id, message_id):
+        """Forget a finished turn (no-op if it was already cancelled or superseded)."""
+        turn = self.active_turns.get(conversation_id)
+        if turn and turn["message_id"] == message_id:
+            del self.active_turns[conversation_id]
+    
+    async def abort_turn(self, session, conversation_id, message_id, error, repair_history=False):
+        """End a turn without calling the provider and report why to the player."""
+        self.end_turn(conversation_id, message_id)
+        if repair_history:
+            session.lm_client.cancel_turn(conversation_id)
+            await self.persist_conversation(session, conversation_id)
+        await self.send_error(session.websocket, message_id, error)
+    
+    async def handle_control(self, session, data):
+        """Answer a player's control command (clear, memory, model, flush_cache) without calling the provider."""
+        player_id = data.get("player_id") or "unknown"
+        conversation_id = session.conversation_id(player_id)
+        command = data.get("command")
+        args = data.get("args") or {}
+        
+        if command == "clear":
+            success, lines = await self.clear_memory(session, conversation_id)
+        elif command == "memory":
+            success, lines = self.memory_report(session, conversation_id, player_id)
+        elif command == "model":
+            success, lines = self.pick_model(session, conversation_id, str(args.get("model") or "").strip().lower())
+        elif command == "flush_cache":
+            dropped = self.tool_cache.flush(session.server_id)
+            success, lines = True, [f"Cleared {dropped} cached game lookups for this server."]
         else:
-            if DEBUG:
-                print(f"[Bridge] {remaining} tool calls still pending for message {original_message_id}")
+            success, lines = False, [f"Unknown command: {command}"]
+        
+        metrics.incr(f"control.{command if success else 'rejected'}")
+        await self.send(session.websocket, {
+            "type": "control_result",
+            "command": command,
+            "player_id": player_id,
+            "success": success,
+            "lines": lines
+        })
+    
+    async def clear_memory(self, session, conversation_id):
+        """Forget a player's conversation here and in the session store, cancelling any turn in flight."""
+        await self.cancel_turn(conversation_id, reason="cleared")
+        session.lm_client.clear_conversation(conversation_id)
+        self.stored_conversations.pop(conversation_id, None)
+        await self.store.delete_conversation(conversation_id)
+        return True, ["Memory cleared. I've forgotten our conversation."]
+    
+    def memory_report(self, session, conversation_id, player_id):
+        """Describe what the bridge remembers for a player and which model answers them."""
+        client = session.lm_client
+        stats = client.conversation_stats(conversation_id)
+        _, tokens_today = self.usage.tokens_used(player_id)
+        picked = client.player_models.get(conversation_id)
+        if picked and client.player_model(conversation_id):
+            model = f"{client.player_model(conversation_id)} (your pick: {picked})"
+        elif client.small_model:
+            model = f"{client.small_model} -> {client.model}"
+        else:
+            model = client.model
+        return True, [
+            f"Memory: {stats['messages']} messages ({stats['player_messages']} from you, "
+            f"{stats['tool_calls']} tool calls), ~{stats['tokens']} tokens",
+            f"Model: {model}",
+            f"Tokens used today: {tokens_today}"
+        ]
     
-    async def handle_mcp_tool_call(self, websocket, data):
-        """Handle direct tool call from MCP server (bypasses LM Studio)."""
+    def pick_model(self, session, conversation_id, choice):
+        """Set or show the model answering a player; choices come from PLAYER_MODELS."""
+        client = session.lm_client
+        choices = client.model_choices()
+        if not choices:
+            return False, ["Model selection is not enabled on this server."]
+        available = "Available: " + ", ".join(["default"] + sorted(choices))
+        if not choice:
+            current = client.player_models.get(conversation_id) or "default"
+            return True, [f"Your model: {current}", available]
+        if not client.set_player_model(conversation_id, choice):
+            return False, [f"Unknown model '{choice}'.", available]
+        if choice == "default":
+            return True, ["Back to the default model."]
+        return True, [f"Now using {choice} ({choices[choice]}) for your requests."]
+    
+    async def handle_companion_tick(self, session, data):
+        """Plan every autonomous AI Live companion on a server in one request and answer with one frame."""
+        reply = {"type": "companion_commands", "tick": data.get("tick"), "commands": []}
+        if session.server_id in self.companions.running:
+            # GMod waits for our answer before the next tick; this only happens after a reconnect
+            metrics.incr("companions.ticks_busy")
+            await self.send(session.websocket, dict(reply, skipped="busy"))
+            return
+        
+        # Companions of players who are out of tokens sit this tick out
+        companions = [
+            companion for companion in data.get("companions") or []
+            if self.usage.check_budget(companion.get("owner"), companion.get("owner_admin", False)) is None
+        ]
+        self.companions.running.add(session.server_id)
+        try:
+            priority = SCHEDULER_PRIORITIES["background"]
+            async with self.provider_slot(session, f"{session.server_id}:companions", priority):
+                commands, stats = await self.companions.plan(session.lm_client, session.server_id, companions)
+        except ServerBusy:
+            metrics.incr("companions.ticks_busy")
+            await self.send(session.websocket, dict(reply, skipped="busy"))
+            return
+        finally:
+            self.companions.running.discard(session.server_id)
+        
+        # One request served every planned companion; charge each owner a share
+        usage = stats.get("usage")
+        if usage:
+            owners = [owner for owner in stats["owners"] if owner]
+            for owner in set(owners):
+                share = owners.count(owner) / len(owners)
+                self.usage.record(owner, dict(
+                    usage,
+                    prompt_tokens=round(usage["prompt_tokens"] * share),
+                    completion_tokens=round(usage["completion_tokens"] * share)
+                ))
+        
+        reply["commands"] = commands
+        await self.send(session.websocket, reply)
+    
+    async def handle_usage_report(self, session, data):
+        """Send the top token consumers report (GMod only forwards this for admins)."""
+        await self.send(session.websocket, {
+            "type": "usage_report",
+            "player_id": data.get("player_id"),
+            "lines": self.usage.report(data.get("limit", 5))
+        })
+    
+    async def handle_reload_config(self, session, data):
+        """Reload config.py and tools.py on an admin's request (GMod only forwards this for admins)."""
+        success, lines = self.reload_config()
+        await self.send(session.websocket, {
+            "type": "reload_result",
+            "player_id": data.get("player_id"),
+            "success": success,
+            "lines": lines
+        })
+    
+    def reload_config(self):
+        """
+        Re-read config.py and tools.py and swap in rebuilt provider clients.
+        Runs without awaiting, so it lands between requests; conversations,
+        sessions and in-flight streams (which keep their old client) are kept.
+        Returns (success, report lines).
+        """
+        try:
+            reloaded = reload_modules()
+        except ReloadError as e:
+            print(f"[Bridge] Reload failed, keeping the running configuration: {e}")
+            metrics.incr("reload.failed")
+            return False, [f"Reload failed, nothing changed: {e}"]
+        
+        # Names imported from config/tools in this module now point at the new values
+        old_default, old_clients = self.lm_client, self.lm_clients
+        self.lm_client = LMStudioClient()
+        self.lm_client.adopt_state(old_default)
+        self.lm_clients = {}
+        for session in self.sessions.values():
+            session.lm_client = self.client_for(session.server_id)
+            old = old_clients.get(session.server_id)
+            if old is not None and session.lm_client is not self.lm_client:
+                session.lm_client.adopt_state(old)
+            session.catalog = self.catalog_for(session)
+        
+        self.tool_cache = ToolCache()
+        companions = CompanionPlanner()
+        companions.planned, companions.running = self.companions.planned, self.companions.running
+        self.companions = companions
+        if self.mcp_handler:
+            self.mcp_handler.refresh_tools()
+        if self.warmer:
+            self.warmer.warm_soon(self.lm_client, "reload")
+        
+        metrics.incr("reload.succeeded")
+        lines = [
+            f"Reloaded {len(reloaded)} modules",
+            f"Provider: {self.lm_client.provider} / {self.lm_client.model}",
+            f"{len(self.lm_client.tools)} tools, {len(self.lm_client.conversations)} conversations kept"
+        ]
+        for line in lines:
+            print(f"[Bridge] {line}")
+        return True, lines
+    
+    async def handle_cancel(self, session, data):
+        """Handle an explicit cancel request from a player."""
+        player_id = data.get("player_id") or data.get("player", {}).get("steamid", "unknown")
         message_id = data.get("message_id")
-        tool_name = data.get("tool")
-        args = data.get("args", {})
         
-        # Store the pending call
-        self.pending_tool_calls[message_id] = {
-            "websocket": websocket,
-            "message_id": message_id,
-            "is_mcp": True
-        }
+        if not await self.cancel_turn(session.conversation_id(player_id), message_id):
+            await self.send(session.websocket, {
+                "type": "cancelled",
+                "message_id": None,
+                "player_id": player_id,
+                "reason": "nothing_to_cancel"
+            })
+    
+    async def cancel_turn(self, conversation_id, message_id=None, reason="cancelled"):
+        """
+        Cancel a player's in-flight turn: abort the provider request, drop its
+        pending tool calls and repair the conversation history.
+        Returns False if there was nothing to cancel.
+        """
+        turn = self.active_turns.get(conversation_id)
+        if not turn or (message_id and turn["message_id"] != message_id):
+            return False
         
-        # Find a connected GMod client
-        gmod_client = None
-        for client in self.clients:
-            if client in self.client_info:
-                gmod_client = client
-                break
+        del self.active_turns[conversation_id]
+        cancelled_id = turn["message_id"]
+        player_id = turn["player_id"]
+        self.streams.pop(cancelled_id, None)
+        generations = [turn["task"]]
+        speculation = self.speculations.pop(cancelled_id, None)
+        if speculation:
+            speculation.task.cancel()
+            generations.append(speculation.task)
+        for tool_call_id in [key for key, (plan_message_id, _) in self.plans.items() if plan_message_id == cancelled_id]:
+            self.plans.pop(tool_call_id)[1].cancel()  # Steps already sent to GMod still run; the rest are never sent
+        # None if the GMod server disconnected while the turn was in flight
+        session = self.sessions.get(turn["server_id"])
         
-        if not gmod_client:
-            await self.send(websocket, {
-                "type": "tool_result",
-                "message_id": message_id,
-                "success": False,
-                "error": "No GMod server connected"
+        # Drop tool calls GMod hasn't answered yet; their late results are ignored
+        # Results that already came back are kept; the rest are marked cancelled below
+        batch = await self.store.drop_tool_calls(turn["server_id"], cancelled_id)
+        if session:
+            for entry, outcome in batch:
+                if outcome is not None:
+                    session.lm_client.add_tool_result(
+                        conversation_id, entry["tool_call"]["id"], entry["tool_call"]["name"], outcome
+                    )
+        dropped = [entry for entry, outcome in batch if outcome is None]
+        
+        # Abort the provider request if one is running
+        task = turn["task"]
+        aborted = task is not None and task is not asyncio.current_task() and not task.done()
+        if aborted:
+            task.cancel()
+        running = [gen for gen in generations if gen is not None and gen is not asyncio.current_task()]
+        if running:
+            await asyncio.wait(running, timeout=5)
+        
+        # A cancelled generation was still paid for up to the cancel; charge it so
+        # superseding turns over and over does not get around the token budget
+        wasted = turn["lm_client"].take_interrupted_usage(conversation_id)
+        if wasted:
+            self.usage.record(player_id, wasted)
+            metrics.incr("cancel.tokens_charged", wasted["total_tokens"])
+        
+        # Dropping pending tool calls skips the continuation request that would have followed
+        tokens_saved = 0
+        if session:
+            tokens_saved = session.lm_client.estimate_tokens(conversation_id) if dropped else 0
+            session.lm_client.cancel_turn(conversation_id)
+            await self.persist_conversation(session, conversation_id)
+        
+        metrics.incr("cancel.superseded" if reason == "superseded" else "cancel.requested")
+        metrics.incr("cancel.tool_calls_dropped", len(dropped))
+        metrics.incr("cancel.tokens_saved_est", tokens_saved)
+        if aborted:
+            metrics.incr("cancel.generations_aborted")
+        
+        if DEBUG:
+            print(f"[Bridge] Cancelled message {cancelled_id} for {conversation_id} ({reason}): "
+                  f"aborted={aborted}, dropped {len(dropped)} tool calls, ~{tokens_saved} tokens saved")
+        
+        if session:
+            await self.send(session.websocket, {
+                "type": "cancelled",
+                "message_id": cancelled_id,
+                "player_id": player_id,
+                "reason": reason
             })
-            return
+        return True
+    
+    async def send_stream_chunk(self, websocket, message_id, chunk):
+        """Send new answer text with its offset and any chat lines it completed."""
+        stream = self.streams.get(message_id)
+        if stream is None:
+            stream = self.streams[message_id] = ChatStream(message_id)
+        await self.send(websocket, stream.chunk_frame(chunk))
+    
+    async def send_response(self, websocket, message_id, text):
+        """Send the end-of-stream marker followed by the complete response."""
+        stream = self.streams.pop(message_id, None) or ChatStream(message_id)
+        await self.send(websocket, stream.end_frame())
         
-        # Forward tool call to GMod
-        await self.send(gmod_client, {
-            "type": "tool_call",
+        # Also send complete response for chat display (GMod skips it if it was streamed)
+        await self.send(websocket, {
+            "type": "response",
             "message_id": message_id,
-            "tool": tool_name,
-            "args": args
+            "text": text,
+            "segments": split_message(text)
+        })
+    
+    async def handle_mcp_tool_call(self, session, data):
+        """Handle a direct tool call from a stdio MCP server (bypasses LM Studio)."""
+        if data.get("tool") in ADMIN_TOOLS and not (MCP_ALLOW_ADMIN_TOOLS and data.get("player_id")):
+            # GMod only checks permissions for a player; without one the call would run unchecked
+            success, result = False, f"{data.get('tool')} is an admin tool and is not available over MCP without an admin player_id"
+        else:
+            success, result = await self.call_tool(
+                data.get("tool"),
+                data.get("args", {}),
+                server_id=data.get("server_id"),
+                player_id=data.get("player_id"),
+                timeout=data.get("timeout") or MCP_TOOL_TIMEOUT
+            )
+        
+        await self.send(session.websocket, {
+            "type": "mcp_tool_result",
+            "call_id": data.get("call_id") or data.get("message_id"),
+            "success": success,
+            "result" if success else "error": result
         })
     
+    async def call_tool(self, tool_name, args, server_id=None, player_id=None, timeout=MCP_TOOL_TIMEOUT, source="mcp"):
+        """
+        Run one tool on a GMod server and wait for the result. Returns (success, result).
+        Used by MCP clients and plan steps; source prefixes the metrics.
+        """
+        target, error = self.session_for_tool_call(server_id)
+        if not target:
+            return False, error
+        
+        metrics.incr(f"{source}.calls")
+        args, _, error = self.check_arguments(target, tool_name, args)
+        if error:
+            return False, error
+        tool_call = {"name": tool_name, "arguments": args}
+        local = self.answer_locally(target, tool_call, player_id)
+        if local is not None:
+            metrics.incr(f"{source}.answered_locally")
+            return local
+        
+        if self.tool_cache.mutates(tool_name):
+            self.tool_cache.invalidate(target.server_id)
+            target.world.mark_stale()
+        generation = self.tool_cache.generation(target.server_id, tool_name, player_id)
+        
+        # Unique per call so concurrent calls never collide; GMod echoes it back as tool_call_id
+        call_id = f"{source}_{uuid.uuid4().hex}"
+        future = asyncio.get_running_loop().create_future()
+        self.mcp_calls[call_id] = {"server_id": target.server_id, "future": future}
+        started = time.monotonic()
+        
+        try:
+            await self.send(target.websocket, {
+                "type": "tool_call",
+                "message_id": call_id,
+                "tool_call_id": call_id,
+                "tool": tool_name,
+                "args": args,
+                "player_id": player_id
+            })
+            success, result = await asyncio.wait_for(future, timeout)
+            if success:
+                self.tool_cache.put(target.server_id, tool_name, args, player_id, result, generation)
+            return success, result
+        except asyncio.TimeoutError:
+            metrics.incr(f"{source}.timeouts")
+            return False, f"Timed out after {timeout}s waiting for GMod server '{target.server_id}'"
+        finally:
+            self.mcp_calls.pop(call_id, None)
+            metrics.observe(f"{source}.latency", time.monotonic() - started)
+    
+    def fail_mcp_calls(self, server_id, error):
+        """Resolve every MCP call waiting on a server with an error."""
+        for call in self.mcp_calls.values():
+            if call["server_id"] == server_id and not call["future"].done():
+                call["future"].set_result((False, error))
+    
+    async def list_servers(self):
+        """Describe the connected GMod servers for MCP callers."""
+        return [
+            dict(session.info, server_id=session.server_id)
+            for session in self.sessions.values()
+            if session.connected and session.info
+        ]
+    
     async def send(self, websocket, data):
         """Send a message to a client."""
+        if websocket is None:
+            # Server disconnected mid-turn; it will resync on reconnect
+            return
+        if DEBUG:
+            print(f"[Bridge] Sending: {str(data)[:200]}")
+        queue = self.outbound.get(websocket)
+        if queue is not None:
+            await queue.put(data)
+            return
         try:
-            message = json.dumps(data)
-            if DEBUG:
-                print(f"[Bridge] Sending: {str(data)[:200]}")
-            await websocket.send(message)
+            await self.send_frame(websocket, codec.dumps(data))
         except Exception as e:
             print(f"[Bridge] Send error: {e}")
     
+    async def send_frame(self, websocket, message):
+        """Send already-encoded JSON bytes as a text frame."""
+        if RAW_FRAMES:
+            await websocket.send(message, text=True)
+        else:
+            await websocket.send(message.decode())
+    
     async def send_error(self, websocket, message_id, error):
         """Send an error message to a client."""
+        self.streams.pop(message_id, None)
         await self.send(websocket, {
             "type": "error",
             "message_id": message_id,
@@ -317,14 +1176,39 @@ class BridgeServer:
     
     async def broadcast(self, data):
         """Broadcast a message to all connected clients."""
-        for client in self.clients:
-            await self.send(client, data)
+        message = codec.dumps(data)  # Encode once for every client
+        for queue in list(self.outbound.values()):
+            await queue.put(data, message)
+    
+    async def log_metrics(self):
+        """Periodically print bridge metrics."""
+        while True:
+            await asyncio.sleep(METRICS_LOG_INTERVAL)
+            summary = metrics.format_summary()
+            if summary:
+                print(f"[Bridge] Metrics:\n{summary}")
     
     async def start(self):
         """Start the WebSocket server."""
         print(f"[Bridge] Starting server on ws://{WEBSOCKET_HOST}:{WEBSOCKET_PORT}")
         print("[Bridge] Waiting for GMod connection...")
         print("[Bridge] Press Ctrl+C to stop")
+        if DEBUG:
+            print(f"[Bridge] JSON codec: {codec.NAME}")
+        
+        if METRICS_LOG_INTERVAL:
+            self.tasks.add(asyncio.create_task(self.log_metrics()))
+        
+        if self.warmer:
+            self.tasks.add(asyncio.create_task(self.warmer.run()))
+        
+        self.tasks.add(asyncio.create_task(self.usage.run()))
+        
+        if MCP_HTTP_ENABLED and not MCP_HTTP_TOKEN:
+            print("[Bridge] MCP over HTTP is not started: set MCP_HTTP_TOKEN in config.py")
+        elif MCP_HTTP_ENABLED:
+            self.mcp_handler = MCPHandler(self)
+            self.mcp_http = await serve_http(self.mcp_handler, MCP_HTTP_HOST, MCP_HTTP_PORT, MCP_HTTP_TOKEN)
         
         async with serve(self.handle_client, WEBSOCKET_HOST, WEBSOCKET_PORT):
             await asyncio.Future()  # Run forever
@@ -336,10 +1220,15 @@ async def main():
     # Handle graceful shutdown
     def signal_handler(sig, frame):
         print("\n[Bridge] Shutting down...")
+        server.usage.flush()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
     
+    # kill -HUP <pid> reloads config.py and tools.py without a restart (not available on Windows)
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, server.reload_config)
+    
     await server.start()
 
 
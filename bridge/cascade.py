@@ -0,0 +1,75 @@
+"""
+GMod AI Assistant - Model Cascade
+Routing rules for trying a small, fast model first and escalating to the
+provider's large model only when needed. The client runs the small stage,
+asks escalation_reason() whether to keep its answer, and rolls the history
+back if not.
+"""
+
+import re
+from config import (
+    CASCADE_ENABLED, CASCADE_MODELS, CASCADE_MAX_SMALL_TOOL_CALLS, CASCADE_UNSURE_PHRASES, MODEL_PRICES
+)
+from validation import VALIDATORS, validate_tool_call
+
+# Messages that ask for several steps in sequence go straight to the large model
+PLAN_PATTERN = re.compile(r"\b(then|after that|afterwards|and have|and make|once .+ is)\b", re.IGNORECASE)
+COMPANION_PATTERN = re.compile(r"\b(companion|ai live|buddy)\b", re.IGNORECASE)
+LIST_PATTERN = re.compile(r",| and ", re.IGNORECASE)
+TOOL_FAILED = '"success":false'  # Compact JSON, as written by compact_tool_result
+
+
+def small_model_for(provider):
+    """The provider's small model, or None if the cascade is off for it."""
+    if not CASCADE_ENABLED:
+        return None
+    return (CASCADE_MODELS.get(provider) or {}).get("small") or None
+
+
+def large_model_for(provider, default):
+    return (CASCADE_MODELS.get(provider) or {}).get("large") or default
+
+
+def needs_large_model(text):
+    """Whether a player message asks for a multi-step plan (checked before the small stage)."""
+    text = text or ""
+    if PLAN_PATTERN.search(text):
+        return True
+    return bool(COMPANION_PATTERN.search(text) and LIST_PATTERN.search(text))
+
+
+def last_tools_failed(conversation):
+    """Whether any tool result at the end of the history reports a failure."""
+    for message in reversed(conversation):
+        if message.get("role") != "tool":
+            break
+        if TOOL_FAILED in (message.get("content") or ""):
+            return True
+    return False
+
+
+def escalation_reason(result):
+    """Why a small-model result should be redone by the large model, or None to keep it."""
+    if "error" in result:
+        return "error"
+    tool_calls = result.get("tool_calls") or []
+    if tool_calls:
+        for tc in tool_calls:
+            if tc["name"] not in VALIDATORS:
+                return "unknown_tool"
+            if tc.get("malformed") or validate_tool_call(tc["name"], tc["arguments"])[2]:
+                return "invalid_arguments"
+        companion_calls = sum(tc["name"].startswith("ai_live_") for tc in tool_calls)
+        if len(tool_calls) > CASCADE_MAX_SMALL_TOOL_CALLS or companion_calls > 1:
+            return "plan"
+        return None
+    text = (result.get("text") or "").lower()
+    if not text.strip() or any(phrase in text for phrase in CASCADE_UNSURE_PHRASES):
+        return "low_confidence"
+    return None
+
+
+def cost(model, usage):
+    """Dollar cost of one completion from MODEL_PRICES (0 for unpriced models)."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0, 0))
+    return (usage["prompt_tokens"] * prompt_price + usage["completion_tokens"] * completion_price) / 1e6
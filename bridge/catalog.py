@@ -0,0 +1,297 @@
+"""
+GMod AI Assistant - Asset Catalog
+Index of the model paths, NPC types, weapon, entity and vehicle classes a
+server has installed. spawn_prop needs an exact model path and spawn_npc /
+give_weapon need exact class names; a wrong guess fails in Lua and costs
+another provider round trip. The catalog fixes near-misses before dispatch
+("oil drum" -> models/props_c17/oildrum001.mdl), rejects names the server
+does not have with suggestions, and answers the bridge-local search_assets
+tool without asking GMod.
+
+It is filled from CATALOG_FILE and from the "assets" the GMod server sends
+with its handshake:
+    {"npc": [{"name": "npc_zombie", "label": "Zombie"}, ...],
+     "weapon": [...], "entity": [...], "vehicle": [...],
+     "model": ["models/props_c17/oildrum001.mdl", ...],
+     "aliases": {"npc": {"zombie": "npc_zombie"}, ...}}
+"""
+
+import bisect
+import difflib
+import os
+import re
+import codec
+from config import (
+    CATALOG_ENABLED, CATALOG_FILE, CATALOG_ARGUMENTS, CATALOG_STRICT_KINDS, CATALOG_UNLISTED_ARGUMENTS,
+    CATALOG_SEARCH_LIMIT, DEBUG
+)
+from tools import SEARCH_TOOL
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEARCH_TOOL_NAME = SEARCH_TOOL["function"]["name"]
+KINDS = ("model", "npc", "weapon", "entity", "vehicle")
+KIND_LABELS = {"model": "model", "npc": "NPC type", "weapon": "weapon class",
+               "entity": "entity class", "vehicle": "vehicle type"}
+# Class prefixes players and models leave out ("zombie" for npc_zombie)
+PREFIXES = ("npc_", "weapon_", "item_", "prop_vehicle_", "gmod_", "sent_")
+WORDS = re.compile(r"[a-z]+|[0-9]+")
+CLASS_NAME = re.compile(r"[a-z0-9_]+")
+
+# Match quality. Word matches score up to 60; a best match of at least MATCHED
+# (every word of the query found in the name) replaces a tool argument
+EXACT, PREFIX, MATCHED = 100, 80, 45
+
+
+def _prefixed(sorted_items, prefix):
+    """Items of a sorted list of words or (word, ...) tuples whose word starts with prefix."""
+    start = bisect.bisect_left(sorted_items, prefix if sorted_items and isinstance(sorted_items[0], str) else (prefix,))
+    for item in sorted_items[start:]:
+        if not (item if isinstance(item, str) else item[0]).startswith(prefix):
+            break
+        yield item
+
+
+def _exact(kind, name):
+    """Whether a name is already a full model path or class name, so it is never swapped for a near match."""
+    name = name.strip().lower().replace("\\", "/")
+    if kind == "model":
+        return name.startswith("models/") and name.endswith(".mdl")
+    return name.startswith(PREFIXES) and CLASS_NAME.fullmatch(name) is not None
+
+
+def _key(name):
+    """Lookup form of a name: lower case, without models/ and .mdl and class prefixes."""
+    key = name.strip().lower().replace("\\", "/")
+    if key.startswith("models/"):
+        key = key[len("models/"):]
+    if key.endswith(".mdl"):
+        key = key[:-len(".mdl")]
+    for prefix in PREFIXES:
+        if key.startswith(prefix):
+            return key[len(prefix):]
+    return key
+
+
+class Entry:
+    __slots__ = ("kind", "name", "label", "key", "base", "words")
+
+    def __init__(self, kind, name, label):
+        self.kind = kind
+        self.name = name
+        self.label = label or ""
+        self.key = _key(name)
+        self.base = self.key.rsplit("/", 1)[-1]  # File name of a model, the key otherwise
+        self.words = set(WORDS.findall(f"{self.key} {self.label.lower()}"))
+
+
+class Index:
+    """Lookup structures for one kind, built on its first search."""
+
+    def __init__(self, entries):
+        keys = set()
+        self.labels = {}  # lower-case label -> lower-case name
+        self.words = {}  # word -> lower-case names containing it
+        for lowered, entry in entries.items():
+            keys.add((entry.key, lowered))
+            keys.add((entry.base, lowered))
+            if entry.label:
+                self.labels.setdefault(entry.label.lower(), lowered)
+            for word in entry.words:
+                self.words.setdefault(word, set()).add(lowered)
+        self.keys = sorted(keys)  # (key or model file name, lower-case name), for prefix lookups
+        self.vocabulary = sorted(self.words)
+        self.spelled = [word for word in self.vocabulary if word.isalpha()]  # Typo candidates
+
+    def word_matches(self, token):
+        """Names matching one query word, with the match quality (best first)."""
+        quality = {word: 1.0 for word in _prefixed(self.vocabulary, token)}
+        for word in self.vocabulary:
+            if word not in quality and token in word:
+                quality[word] = 0.8  # "drum" in oildrum
+        if token.isalpha() and len(token) >= 4:
+            for word in difflib.get_close_matches(token, self.spelled, n=3, cutoff=0.75):
+                quality.setdefault(word, 0.6)  # Typo ("zombei") or variant ("wooden" for wood)
+        matches = {}
+        for word, value in quality.items():
+            for lowered in self.words[word]:
+                if value > matches.get(lowered, 0):
+                    matches[lowered] = value
+        return matches
+
+
+class AssetCatalog:
+    def __init__(self):
+        self.entries = {kind: {} for kind in KINDS}  # kind -> {lower-case name: Entry}
+        self.aliases = {kind: {} for kind in KINDS}  # kind -> {alias: name}
+        self.complete = set()  # Kinds the GMod server sent in full, so unknown names really are unknown
+        self._indexes = {}  # kind -> Index
+
+    def load(self, assets, complete=False):
+        """Add a catalog in the handshake / CATALOG_FILE format."""
+        for kind in KINDS:
+            items = assets.get(kind)
+            if not items:
+                continue
+            for item in items:
+                name, label = (item, None) if isinstance(item, str) else (item.get("name"), item.get("label"))
+                if name:
+                    self.entries[kind][name.lower()] = Entry(kind, name, label)
+            if complete:
+                self.complete.add(kind)
+        for kind, aliases in (assets.get("aliases") or {}).items():
+            if kind in self.aliases:
+                self.aliases[kind].update({alias.lower(): name for alias, name in aliases.items()})
+        self._indexes.clear()
+        return self
+
+    def merged(self, assets):
+        """A copy of this catalog with a GMod server's assets added on top."""
+        catalog = AssetCatalog()
+        for kind in KINDS:
+            catalog.entries[kind] = dict(self.entries[kind])
+            catalog.aliases[kind] = dict(self.aliases[kind])
+        catalog.complete = set(self.complete)
+        return catalog.load(assets, complete=True)
+
+    def counts(self):
+        return {kind: len(entries) for kind, entries in self.entries.items() if entries}
+
+    def _index(self, kind):
+        if kind not in self._indexes:
+            self._indexes[kind] = Index(self.entries[kind])
+        return self._indexes[kind]
+
+    def _kind_scores(self, kind, query, tokens):
+        """Scores of the names of one kind that match a query."""
+        index = self._index(kind)
+        scores = {}
+        # Every query word has to match
+        per_word = [index.word_matches(token) for token in tokens]
+        for lowered in set.intersection(*(set(matches) for matches in per_word)):
+            quality = sum(matches[lowered] for matches in per_word) / len(tokens)
+            scores[lowered] = 60 * quality
+        prefixed = list(_prefixed(index.keys, query))
+        for _, lowered in prefixed:
+            scores[lowered] = PREFIX
+        exact = [lowered for key, lowered in prefixed if key == query]
+        exact += [name.lower() for name in (self.aliases[kind].get(query), index.labels.get(query)) if name]
+        for lowered in exact:
+            if lowered in self.entries[kind]:
+                scores[lowered] = EXACT
+        return scores
+
+    def search(self, query, kind=None, limit=CATALOG_SEARCH_LIMIT):
+        """Best matches for a query as (score, Entry), across every kind unless one is given."""
+        query = _key(query)
+        tokens = WORDS.findall(query)
+        if not tokens:
+            return []
+        scored = []
+        for kind in [kind] if kind else KINDS:
+            if self.entries[kind]:
+                scored += [(score, self.entries[kind][lowered])
+                           for lowered, score in self._kind_scores(kind, query, tokens).items()]
+        # Shorter names first among equal matches: "crate" prefers wood_crate001a over its gibs
+        scored.sort(key=lambda item: (-item[0], len(item[1].key), item[1].name))
+        return scored[:limit]
+
+    def resolve(self, kind, value):
+        """The catalog name a tool argument means, or None. Returns (name, suggestions)."""
+        lowered = value.strip().lower()
+        if lowered in self.entries[kind]:
+            return self.entries[kind][lowered].name, []
+        if lowered in self.aliases[kind]:
+            return self.aliases[kind][lowered], []
+        matches = self.search(value, kind, limit=5)
+        # A full path or class name missing from the list may still exist in the
+        # game (models/props_c17/oildrum.mdl next to oildrum001), so it is kept as sent
+        if matches and matches[0][0] >= MATCHED and not _exact(kind, value):
+            return matches[0][1].name, []
+        return None, [entry.name for _, entry in matches]
+
+    def normalize(self, tool_name, args):
+        """
+        Replace near-miss asset names in a tool call with catalog names.
+        Returns (args, changed, error); error names the unknown asset with
+        suggestions when the server sent its full list of that kind.
+        """
+        changed = False
+        for arg, kind in CATALOG_ARGUMENTS.get(tool_name, {}).items():
+            value = args.get(arg)
+            if not isinstance(value, str) or not self.entries[kind]:
+                continue
+            name, suggestions = self.resolve(kind, value)
+            if name is None:
+                unlisted_ok = arg in CATALOG_UNLISTED_ARGUMENTS.get(tool_name, ()) and _exact(kind, value)
+                if kind in self.complete and kind in CATALOG_STRICT_KINDS and not unlisted_ok:
+                    hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+                    return args, changed, (f"Unknown {KIND_LABELS[kind]} '{value}' for {tool_name}.{hint} "
+                                           "Use search_assets to find the exact name.")
+                continue
+            if name != value:
+                if DEBUG:
+                    print(f"[Catalog] {tool_name}.{arg}: {value!r} -> {name!r}")
+                args = dict(args, **{arg: name})
+                changed = True
+        return args, changed, None
+
+    def answer(self, args):
+        """Result of a search_assets call."""
+        if not any(self.entries.values()):
+            return {"results": [], "message": "No asset catalog is loaded for this server"}
+        kind = args.get("kind") if args.get("kind") in KINDS else None
+        limit = min(int(args.get("limit") or CATALOG_SEARCH_LIMIT), 25)
+        matches = self.search(str(args.get("query", "")), kind, limit)
+        results = [{"kind": entry.kind, "name": entry.name, **({"label": entry.label} if entry.label else {})}
+                   for _, entry in matches]
+        return {"results": results, "count": len(results)}
+
+
+_base = None
+
+
+def base_catalog():
+    """The catalog from CATALOG_FILE (empty if there is none), loaded once."""
+    global _base
+    if _base is None:
+        _base = AssetCatalog()
+        path = CATALOG_FILE and os.path.join(HERE, CATALOG_FILE)
+        if CATALOG_ENABLED and path and os.path.exists(path):
+            with open(path, "rb") as f:
+                _base.load(codec.loads(f.read()))
+            if DEBUG:
+                print(f"[Catalog] Loaded {path}: {_base.counts()}")
+    return _base
+
+
+if __name__ == "__main__":
+    # Lookups against the bundled catalog plus a synthetic server, with timing: python catalog.py
+    import random
+    import time
+
+    DEBUG = False
+    rng = random.Random(50)
+    words = ["wood", "crate", "barrel", "chair", "table", "door", "fence", "tire", "box", "lamp", "sign", "pipe"]
+    server = {"model": [f"models/props_addon{i % 40}/{rng.choice(words)}_{rng.choice(words)}{i:03d}.mdl"
+                        for i in range(5000)],
+              "npc": [{"name": e.name, "label": e.label} for e in base_catalog().entries["npc"].values()],
+              "weapon": [{"name": e.name, "label": e.label} for e in base_catalog().entries["weapon"].values()]}
+    catalog = base_catalog().merged(server)
+    print(f"catalog: {catalog.counts()}")
+
+    for tool, args in [("spawn_prop", {"model": "oil drum"}), ("spawn_prop", {"model": "oildrum001"}),
+                       ("spawn_npc", {"npc_type": "combine", "weapon": "ar2"}),
+                       ("spawn_npc", {"npc_type": "zombei"}), ("spawn_npc", {"npc_type": "dragon"}),
+                       ("spawn_prop", {"model": "models/props_c17/oildrum.mdl"}),
+                       ("spawn_npc", {"npc_type": "npc_alyx", "weapon": "weapon_alyxgun"}),
+                       ("give_weapon", {"weapon": "weapon_alyxgun"}),
+                       ("spawn_entity", {"class": "item_ammo_crate"}), ("give_weapon", {"weapon": "crowbar"}), ("give_weapon", {"weapon": "rocket launcher"})]:
+        print(f"{tool} {args} -> {catalog.normalize(tool, args)}")
+    for query in ("wooden crate", "fast zombie", "hl2 pistol"):
+        print(f"search {query!r}: {[r['name'] for r in catalog.answer({'query': query, 'limit': 5})['results']]}")
+
+    number = 200
+    started = time.perf_counter()
+    for _ in range(number):
+        catalog.search("wooden crate", "model")
+    print(f"{(time.perf_counter() - started) / number * 1000:.2f} ms per model search over {len(catalog.entries['model'])} models")
@@ -0,0 +1,96 @@
+"""
+GMod AI Assistant - JSON Codec
+Single place the bridge encodes and decodes JSON. Uses orjson when it is
+installed and falls back to the standard library otherwise. Both backends
+emit compact JSON (no spaces after separators).
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    NAME = "orjson"
+    DecodeError = orjson.JSONDecodeError  # Subclass of json.JSONDecodeError
+
+    def dumps(obj):
+        """Encode to UTF-8 bytes."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps_text(obj):
+        """Encode to str (for APIs that need text, like tool call arguments)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(data):
+        """Decode from bytes or str."""
+        return orjson.loads(data)
+else:
+    NAME = "json"
+    DecodeError = json.JSONDecodeError
+    _encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def dumps(obj):
+        """Encode to UTF-8 bytes."""
+        return _encoder.encode(obj).encode()
+
+    def dumps_text(obj):
+        """Encode to str (for APIs that need text, like tool call arguments)."""
+        return _encoder.encode(obj)
+
+    def loads(data):
+        """Decode from bytes or str."""
+        return json.loads(data)
+
+
+def _sample_frames():
+    """Representative bridge traffic, used when no recorded frames are given."""
+    player = {"steamid": "STEAM_0:1:12345678", "name": "Player", "health": 100, "armor": 25,
+              "pos": [1024.5, -512.25, 64.0], "weapon": "weapon_physgun", "is_admin": True}
+    entities = [
+        {"id": i, "class": "prop_physics", "model": "models/props_c17/oildrum001.mdl",
+         "pos": [i * 10.5, i * -3.25, 12.0], "is_npc": False, "is_player": False}
+        for i in range(300)
+    ]
+    return [
+        {"type": "chat", "message_id": "msg_42", "player": player, "text": "spawn 5 zombies around me"},
+        {"type": "world_state", "full": True, "seq": 1, "players": [player] * 8, "entities": entities,
+         "class_counts": {"prop_physics": 300, "npc_zombie": 5}},
+        {"type": "world_state", "full": False, "seq": 2, "entities": entities[:12], "removed": [5, 9]},
+        {"type": "response_stream", "message_id": "msg_42", "chunk": "Spawning five zombies around you now."},
+        {"type": "tool_call", "message_id": "msg_42", "tool": "spawn_npc", "tool_call_id": "call_abc123",
+         "args": {"npc_type": "npc_zombie", "count": 5, "radius": 200}, "player_id": player["steamid"]},
+        {"type": "tool_result", "message_id": "msg_42", "tool_call_id": "call_abc123", "tool": "get_map_entities",
+         "success": True, "result": {"entities": entities[:30], "total": 300}},
+    ]
+
+
+if __name__ == "__main__":
+    # Microbenchmark: python codec.py [recorded_frames.jsonl]
+    import sys
+    import timeit
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            frames = [json.loads(line) for line in f if line.strip()]
+    else:
+        frames = _sample_frames()
+    encoded = [json.dumps(frame).encode() for frame in frames]
+    total_bytes = sum(len(e) for e in encoded)
+
+    # Baseline is what the bridge did before: json.dumps to str, encoded by the WebSocket library
+    candidates = {
+        "json.dumps/loads": (lambda o: json.dumps(o).encode(), json.loads),
+        f"codec ({NAME})": (dumps, loads),
+    }
+
+    rounds = 200
+    print(f"{len(frames)} frames, {total_bytes} bytes, {rounds} rounds")
+    for label, (encode, decode) in candidates.items():
+        dump_time = timeit.timeit(lambda: [encode(f) for f in frames], number=rounds)
+        load_time = timeit.timeit(lambda: [decode(e) for e in encoded], number=rounds)
+        mb = total_bytes * rounds / 1e6
+        print(f"  {label:16} dumps {dump_time * 1000:8.1f} ms ({mb / dump_time:7.1f} MB/s)   "
+              f"loads {load_time * 1000:8.1f} ms ({mb / load_time:7.1f} MB/s)")
@@ -0,0 +1,256 @@
+"""
+GMod AI Assistant - AI Live Autonomy
+Plans for every autonomous AI Live companion on a server in one request per
+tick. GMod sends a companion_tick frame with one observation per companion;
+the model answers with one command per companion (structured output), and
+the bridge sends all of them back in a single companion_commands frame.
+
+Cost grows slower than the number of companions: the instructions are sent
+once per tick instead of once per companion, companions whose surroundings
+have not changed keep their command without being sent, and a per-tick
+token budget moves whatever does not fit to the next tick.
+"""
+
+import time
+from config import (
+    COMPANION_MODEL, COMPANION_REPLAN_AFTER, COMPANION_MAX_NEARBY,
+    COMPANION_TICK_TOKEN_BUDGET, COMPANION_TOKENS_PER_COMMAND, DEBUG
+)
+from metrics import metrics
+
+ACTIONS = ["none", "follow", "stop", "move_to", "attack", "say", "find_cover", "retreat", "patrol"]
+MAX_SAY_CHARS = 120
+
+TICK_INSTRUCTIONS = """You control AI companions in Garry's Mod. Each line below is one companion and what it sees (distances in units, #n = entity id).
+Pick one command per companion:
+- none: keep doing what it is doing
+- follow: follow its owner
+- stop: stand still
+- move_to: walk to the entity in target
+- attack: attack the entity in target (hostile NPCs only, never players)
+- say: say a short line (put it in say)
+- find_cover, retreat: get away from danger
+- patrol: wander nearby
+Protect the owner, attack hostile NPCs that come close, otherwise stay near the owner. Prefer none when the current state already fits, and speak rarely.
+Answer with JSON: {"commands": [{"id": <companion id>, "action": "<command>", "target": <entity id or null>, "say": <text or null>}]}"""
+
+
+def tick_schema(ids):
+    """Schema admitting one command for each of the given companion ids."""
+    return {
+        "type": "object",
+        "properties": {
+            "commands": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer", "enum": ids},
+                        "action": {"type": "string", "enum": ACTIONS},
+                        "target": {"type": ["integer", "null"]},
+                        "say": {"type": ["string", "null"]}
+                    },
+                    "required": ["id", "action", "target", "say"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["commands"],
+        "additionalProperties": False
+    }
+
+
+def _nearby(companion):
+    return (companion.get("nearby") or [])[:COMPANION_MAX_NEARBY]
+
+
+def signature(companion):
+    """What a companion's plan depends on, coarsened so small movements do not count as changes."""
+    return (
+        companion.get("state"),
+        (companion.get("health") or 0) // 10,
+        companion.get("weapon"),
+        companion.get("target"),
+        (companion.get("owner_distance") or 0) // 200,
+        tuple((e.get("id"), e.get("type"), (e.get("distance") or 0) // 200) for e in _nearby(companion)),
+    )
+
+
+def describe(companion):
+    """One prompt line for a companion."""
+    line = (f"#{companion['id']} \"{companion.get('name', 'AI')}\" owner {companion.get('owner_name', '?')} "
+            f"{companion.get('owner_distance', '?')}u away, hp {companion.get('health', '?')}/"
+            f"{companion.get('max_health', '?')}, {companion.get('weapon') or 'unarmed'}, "
+            f"{companion.get('state', 'idle')}")
+    if companion.get("target"):
+        line += f" #{companion['target']}"
+    seen = []
+    for e in _nearby(companion):
+        label = e.get("name") or e.get("class", "?")
+        extra = f" hp{e['health']}" if e.get("health") is not None else ""
+        seen.append(f"{label}#{e.get('id')} {e.get('type', '')} {e.get('distance', '?')}u{extra}")
+    return line + (" | sees: " + ", ".join(seen) if seen else " | sees nothing")
+
+
+class CompanionPlanner:
+    """Remembers what each server's companions were last planned for; one tick per server at a time."""
+
+    def __init__(self):
+        self.planned = {}  # server_id -> {companion id: (signature, planned_at)}
+        self.running = set()  # server_ids with a tick in flight
+
+    def select(self, server_id, companions, now=None):
+        """Split a tick's companions into (to plan, unchanged); changed and longest-unplanned first."""
+        now = now or time.monotonic()
+        known = self.planned.get(server_id, {})
+        changed, unchanged = [], []
+        for companion in companions:
+            last = known.get(companion["id"])
+            if last and last[0] == signature(companion) and now - last[1] < COMPANION_REPLAN_AFTER:
+                unchanged.append(companion)
+            else:
+                changed.append((last[1] if last else 0, companion))
+        changed.sort(key=lambda item: item[0])
+        return [companion for _, companion in changed], unchanged
+
+    def build_prompt(self, companions):
+        """Prompt lines for as many companions as fit the token budget; returns (lines, deferred)."""
+        budget_chars = COMPANION_TICK_TOKEN_BUDGET * 4 - len(TICK_INSTRUCTIONS)
+        lines = []
+        for i, companion in enumerate(companions):
+            line = describe(companion)
+            if lines and budget_chars - len(line) < 0:
+                return lines, companions[i:]
+            budget_chars -= len(line) + 1
+            lines.append(line)
+        return lines, []
+
+    async def plan(self, client, server_id, companions):
+        """
+        Plan one tick for a server. Returns (commands, stats); commands are
+        validated dicts for the companions that should do something new.
+        """
+        started = time.monotonic()
+        metrics.incr("companions.ticks")
+        metrics.observe("companions.tick.companions", len(companions))
+
+        to_plan, unchanged = self.select(server_id, companions, started)
+        lines, deferred = self.build_prompt(to_plan)
+        planning = to_plan[:len(lines)]
+        stats = {"companions": len(companions), "planned": len(planning),
+                 "unchanged": len(unchanged), "deferred": len(deferred),
+                 "owners": [companion.get("owner") for companion in planning]}
+        metrics.incr("companions.unchanged", len(unchanged))
+        if deferred:
+            metrics.incr("companions.deferred", len(deferred))
+        if not planning:
+            return [], stats
+
+        ids = [companion["id"] for companion in planning]
+        messages = [
+            {"role": "system", "content": TICK_INSTRUCTIONS},
+            {"role": "user", "content": "\n".join(lines)},
+        ]
+        model = COMPANION_MODEL or client.small_model or client.model
+        max_tokens = 20 + COMPANION_TOKENS_PER_COMMAND * len(planning)
+        answer, usage = await client.complete_json(messages, "companion_tick", tick_schema(ids), max_tokens, model)
+
+        commands, invalid = self.validate(answer, ids)
+        known = self.planned.setdefault(server_id, {})
+        for companion in planning:
+            known[companion["id"]] = (signature(companion), started)
+        # Forget companions that are no longer sent (removed, dead or switched off)
+        current = {companion["id"] for companion in companions}
+        for companion_id in [cid for cid in known if cid not in current]:
+            del known[companion_id]
+
+        latency = time.monotonic() - started
+        stats.update(usage=usage, commands=len(commands), invalid=invalid, latency=latency)
+        metrics.observe("companions.tick.latency", latency)
+        metrics.observe("companions.tick.prompt_tokens", usage["prompt_tokens"])
+        metrics.observe("companions.tick.completion_tokens", usage["completion_tokens"])
+        metrics.observe("companions.tick.tokens_per_companion", usage["total_tokens"] / len(companions))
+        metrics.incr("companions.commands", len(commands))
+        if invalid:
+            metrics.incr("companions.invalid_commands", invalid)
+        if DEBUG:
+            print(f"[Companions] {server_id}: planned {len(planning)}/{len(companions)} "
+                  f"({len(unchanged)} unchanged, {len(deferred)} deferred), {len(commands)} commands, "
+                  f"{usage['total_tokens']} tokens in {latency:.2f}s")
+        return commands, stats
+
+    @staticmethod
+    def validate(answer, ids):
+        """Keep well-formed commands for companions in this tick; returns (commands, number dropped)."""
+        items = answer.get("commands") if isinstance(answer, dict) else None
+        if not isinstance(items, list):
+            return [], 1  # Not an answer at all
+        commands, invalid, seen = [], 0, set()
+        for item in items:
+            if not isinstance(item, dict):
+                invalid += 1
+                continue
+            companion_id, action, target = item.get("id"), item.get("action"), item.get("target")
+            if companion_id not in ids or companion_id in seen or action not in ACTIONS:
+                invalid += 1
+                continue
+            if action in ("move_to", "attack") and not isinstance(target, int):
+                invalid += 1
+                continue
+            seen.add(companion_id)
+            if action == "none":
+                continue
+            command = {"id": companion_id, "action": action}
+            if isinstance(target, int):
+                command["target"] = target
+            say = item.get("say")
+            if isinstance(say, str) and say.strip():
+                command["say"] = say.strip()[:MAX_SAY_CHARS]
+            elif action == "say":
+                invalid += 1
+                continue
+            commands.append(command)
+        return commands, invalid
+
+
+if __name__ == "__main__":
+    # Tokens per tick as companions are added, batched vs one request each: python companions.py
+    import asyncio
+    import random
+    import lm_client
+    from lm_client import LMStudioClient
+
+    DEBUG = lm_client.DEBUG = False
+    rng = random.Random(45)
+
+    def companion(i):
+        return {
+            "id": 100 + i, "name": f"Buddy{i}", "owner": str(i), "owner_name": f"Player{i}",
+            "state": rng.choice(["following", "idle", "attacking"]), "health": 100, "max_health": 100,
+            "weapon": "weapon_smg1", "owner_distance": rng.randint(50, 400),
+            "nearby": [{"id": 500 + j, "class": "npc_zombie", "type": "npc", "distance": rng.randint(100, 900),
+                        "health": 50} for j in range(rng.randint(0, 4))],
+        }
+
+    async def run():
+        client = LMStudioClient(provider="mock")
+        print(f"{'companions':>10} {'batched':>9} {'per companion':>14} {'one each':>9}   (prompt+completion tokens)")
+        for count in (1, 2, 4, 8, 16):
+            squad = [companion(i) for i in range(count)]
+            _, batched = await CompanionPlanner().plan(client, "s", squad)
+            single = 0
+            for c in squad:
+                _, stats = await CompanionPlanner().plan(client, "s", [c])
+                single += stats["usage"]["total_tokens"]
+            total = batched["usage"]["total_tokens"]
+            print(f"{count:10} {total:9} {total / count:14.1f} {single:9}")
+
+        planner = CompanionPlanner()
+        squad = [companion(i) for i in range(16)]
+        await planner.plan(client, "s", squad)
+        squad[0]["health"] = 20  # Only one companion's situation changes
+        _, stats = await planner.plan(client, "s", squad)
+        print(f"next tick with one change: planned {stats['planned']}, unchanged {stats['unchanged']}, "
+              f"{stats['usage']['total_tokens']} tokens")
+
+    asyncio.run(run())
@@ -6,6 +6,7 @@ GMod AI Assistant - Configuration
 # PROVIDER SELECTION
 # =============================================================================
 # Choose your AI provider: "ollama", "lmstudio", "cerebras", or "openai_compatible"
+# ("mock" is an offline fake provider for testing the bridge, see mock_provider.py)
 PROVIDER = "cerebras"
 
 # =============================================================================
@@ -16,6 +17,7 @@ PROVIDER = "cerebras"
 # Pull a model first: ollama pull llama3.1:8b (or any model you prefer)
 OLLAMA_URL = "http://localhost:11434/v1"
 OLLAMA_MODEL = "gpt-oss:20b"  # You have: qwen3:latest, llama3.2:latest
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after each request
 
 # =============================================================================
 # LM STUDIO SETTINGS (PROVIDER = "lmstudio")
@@ -48,6 +50,99 @@ CUSTOM_MODEL = ""
 WEBSOCKET_HOST = "localhost"
 WEBSOCKET_PORT = 8765
 
+# Frames waiting to be written to one GMod server. When full, senders wait
+# (stream chunks never wait; they are merged into the queued chunk instead)
+OUTBOUND_QUEUE_SIZE = 256
+
+# Bytes of answer text per chat line sent to GMod. Chat lines are capped at
+# 230 bytes in Lua, which adds the 15-byte "[AI Assistant] " prefix
+CHAT_SEGMENT_BYTES = 215
+
+# =============================================================================
+# MCP SERVER SETTINGS
+# =============================================================================
+# Lets external agents call GMod tools directly over the Model Context Protocol.
+# Streamable HTTP is served by the bridge itself at http://HOST:PORT/mcp.
+# For stdio, have your MCP client launch: python mcp_server.py
+MCP_HTTP_ENABLED = False
+MCP_HTTP_HOST = "127.0.0.1"
+MCP_HTTP_PORT = 8766
+
+# Bearer token HTTP clients must send ("Authorization: Bearer <token>"). The
+# HTTP endpoint is not started without one
+MCP_HTTP_TOKEN = ""
+
+# Browser origins allowed to call the HTTP endpoint, e.g. ["http://localhost:3000"].
+# Requests with any other Origin header are refused (DNS rebinding protection);
+# clients that send no Origin, like most MCP clients, are not affected
+MCP_HTTP_ALLOWED_ORIGINS = []
+
+# Largest request body the HTTP endpoint accepts, in bytes
+MCP_HTTP_MAX_BODY = 1024 * 1024
+
+# Offer admin tools (tools.ADMIN_TOOLS: run_command, change_map) over MCP.
+# Even then they need a player_id, and GMod checks that player is an admin
+MCP_ALLOW_ADMIN_TOOLS = False
+
+# Seconds to wait for GMod to answer one tool call (callers may pass a lower
+# or higher value in the tools/call "_meta.timeout" field)
+MCP_TOOL_TIMEOUT = 15
+
+# Bridge address the stdio MCP server connects to
+MCP_BRIDGE_URL = f"ws://{WEBSOCKET_HOST}:{WEBSOCKET_PORT}"
+
+# =============================================================================
+# WARM-UP & KEEP-ALIVE
+# =============================================================================
+# On startup the bridge sends each provider a one-token request with the
+# system prompt and tools, so the connection is open, the model is loaded and
+# the prompt prefix is cached before the first player asks something.
+WARMUP_ENABLED = True
+
+# While a GMod server is connected, ping local providers (Ollama, LM Studio)
+# that have been idle this many seconds so they don't unload the model; 0
+# disables. Hosted providers are not pinged unless PROVIDER_CAPABILITIES sets
+# {"keepalive": True} for them. Warm-up tokens are recorded under
+# "system:warmup" in the usage ledger.
+WARMUP_KEEPALIVE_INTERVAL = 120
+
+# Requests to a provider idle longer than this (seconds) count as "cold" in
+# the provider.ttft.cold / provider.ttft.warm metrics
+WARMUP_COLD_AFTER = 300
+
+# =============================================================================
+# MULTI-SERVER SETTINGS
+# =============================================================================
+# One bridge can serve several GMod servers. Each server identifies itself
+# with AIAssistant.Config.SERVER_ID (falls back to its IP:port) and gets its
+# own conversations, world state and concurrency limit.
+
+# Default number of provider requests one GMod server may run at the same time
+SERVER_MAX_CONCURRENCY = 2
+
+# Per-server overrides keyed by server id. Supported keys: "provider",
+# "model", "system_prompt", "max_concurrency". Example:
+# SERVER_OVERRIDES = {
+#     "rp-server": {"provider": "ollama", "model": "llama3.1:8b", "max_concurrency": 1},
+# }
+SERVER_OVERRIDES = {}
+
+# =============================================================================
+# SESSION STORE
+# =============================================================================
+# Where conversations, pending tool calls and server info are kept.
+# "memory" keeps them inside this bridge process. "redis" keeps them in a
+# Redis-protocol server so several bridge processes (on other cores or hosts)
+# can serve the same GMod fleet and resume each other's conversations.
+# Without a Redis install, "python mock_redis.py" serves a stand-in on
+# SESSION_STORE_URL for testing.
+SESSION_STORE = "memory"
+SESSION_STORE_URL = "redis://localhost:6379/0"
+SESSION_STORE_PREFIX = "gmodai"
+
+# Seconds before an idle conversation expires from the shared store
+SESSION_TTL = 24 * 60 * 60
+
 # =============================================================================
 # AI ASSISTANT SETTINGS
 # =============================================================================
@@ -198,6 +293,71 @@ Be helpful, creative, and take ACTION. Don't just talk about what you could do -
 # =============================================================================
 STREAM_RESPONSES = True  # Enable streamed responses
 
+# Ask the provider to include token usage in the final stream chunk.
+# Disable if your provider rejects the stream_options parameter.
+STREAM_USAGE = True
+
+# =============================================================================
+# CONSTRAINED DECODING
+# =============================================================================
+# Ask providers that support it to only generate tool calls matching the tool
+# schemas, so arguments can't come back as malformed JSON. Which mechanism is
+# used depends on the provider (see providers.py); when on, only providers
+# with native strict tool calls (Cerebras) use it unless overridden below.
+# Off by default: strict mode sends rewritten schemas (nullable unions,
+# minimum/maximum), so check that your provider accepts them before enabling.
+CONSTRAINED_DECODING = False
+
+# Per-provider capability overrides. Example for a vLLM server behind
+# openai_compatible that enforces strict tool schemas:
+# PROVIDER_CAPABILITIES = {"openai_compatible": {"constrained": "strict_tools"}}
+# Ollama and LM Studio can constrain the reply with a JSON envelope instead;
+# the reply is then not streamed and the model sees tools only in the prompt:
+# PROVIDER_CAPABILITIES = {"ollama": {"constrained": "json_schema"}}
+# Use {"constrained": None} to turn it off for one provider.
+PROVIDER_CAPABILITIES = {}
+
+# =============================================================================
+# MODEL CASCADE
+# =============================================================================
+# Try a small, fast model first and hand the request to the provider's large
+# model (its *_MODEL setting above, or "large" below) only when the small one
+# calls an unknown tool, sends bad arguments, plans many steps, sounds unsure,
+# or fails. Multi-step requests and continuations after a failed tool go
+# straight to the large model.
+CASCADE_ENABLED = False
+
+# Per-provider small (and optionally large) model names
+CASCADE_MODELS = {
+    "cerebras": {"small": "llama3.1-8b"},
+    "ollama": {"small": "llama3.2:3b"},
+    "lmstudio": {"small": ""},
+    "openai_compatible": {"small": ""},
+}
+
+# The small model's answer is redone by the large one if it makes more tool
+# calls than this, or if its reply contains one of these phrases
+CASCADE_MAX_SMALL_TOOL_CALLS = 2
+CASCADE_UNSURE_PHRASES = ["i'm not sure", "i am not sure", "i don't know", "i can't", "i cannot", "unable to"]
+
+# Models players may pick for their own conversation with !ai_model <name>,
+# per provider (name shown to players -> provider model). A picked model
+# answers every request of that player, bypassing the cascade, until they
+# pick "default". Empty = players cannot choose.
+PLAYER_MODELS = {
+    "cerebras": {"fast": "llama3.1-8b", "smart": "gpt-oss-120b"},
+    "ollama": {},
+    "lmstudio": {},
+    "openai_compatible": {},
+}
+
+# USD per million tokens (prompt, completion), used for the cascade.cost
+# metrics. Check your provider's current pricing; local models cost nothing.
+MODEL_PRICES = {
+    "gpt-oss-120b": (0.35, 0.75),
+    "llama3.1-8b": (0.10, 0.10),
+}
+
 # =============================================================================
 # MEMORY / CONTEXT WINDOW SETTINGS
 # =============================================================================
@@ -208,6 +368,163 @@ MAX_CONTEXT_TOKENS = 4096
 # Maximum messages to keep in history (as backup limit)
 MAX_HISTORY_MESSAGES = 50
 
+# =============================================================================
+# TOOL RESULT COMPACTION
+# =============================================================================
+# Tool results are compacted before they enter the conversation history,
+# since every later request resends them. "*" applies to every tool and is
+# merged under the tool's own policy. See result_policy.py for the keys.
+TOOL_RESULT_POLICIES = {
+    "*": {"max_tokens": 600, "round": 1},
+    "get_map_entities": {
+        "top_k": {"entity_classes": 15}
+    },
+    "get_entities_nearby": {
+        "sort": {"entities": "distance"},
+        "top_k": {"entities": 12},
+        "fields": {"entities": ["id", "class", "distance", "name", "is_npc", "is_player"]},
+        "round": 0
+    },
+    "ai_live_scan": {
+        "top_k": {"entities": 10},
+        "fields": {"entities": ["id", "class", "type", "distance", "visible", "name", "health"]},
+        "round": 0
+    },
+    "get_server_info": {
+        "top_k": {"players": 16},
+        "fields": {"players": ["name", "is_admin"]}
+    },
+}
+
+# =============================================================================
+# TOOL RESULT CACHE
+# =============================================================================
+# Results of read-only tools (see READ_ONLY_TOOLS in tools.py) are reused for
+# a short time instead of asking GMod again. Any mutating tool clears every
+# entry for its server, since it can change what any player's lookup returns.
+TOOL_CACHE_ENABLED = True
+TOOL_CACHE_TTL = 2.0  # Seconds
+
+# Per-tool TTL overrides (seconds)
+TOOL_CACHE_TTLS = {
+    "get_server_info": 10.0,
+    "get_map_entities": 5.0,
+}
+
+# =============================================================================
+# TEMPLATED CONFIRMATIONS
+# =============================================================================
+# When every tool of a round succeeded and has a template here, and the
+# player asked for a single action, the bridge writes the reply itself
+# instead of asking the model again. "{field}" is filled from the tool's
+# arguments, then its result; the first template whose fields are all known
+# is used, and a tool with none that fits goes back to the model.
+CONFIRMATIONS_ENABLED = True
+CONFIRMATION_TEMPLATES = {
+    "spawn_npc": ["I spawned {count}x {npc_type} for you.", "I spawned one {npc_type} for you."],
+    "spawn_prop": "I spawned {model} for you.",
+    "spawn_vehicle": "I spawned one {vehicle_type} for you.",
+    "give_weapon": "I gave you the {weapon}.",
+    "give_ammo": ["I gave you {amount} {ammo_type} ammo.", "I gave you some {ammo_type} ammo."],
+    "set_player_health": "Your health is now {health}.",
+    "set_player_armor": "Your armor is now {armor}.",
+    "set_player_scale": "Your size is now {scale}x.",
+    "set_gravity": "Gravity is now set to {gravity}.",
+    "set_timescale": "Time scale is now {scale}.",
+    "godmode": ["God mode is {enable}.", "God mode toggled."],
+    "noclip": ["Noclip is {enable}.", "Noclip toggled."],
+    "respawn_player": "You have been respawned.",
+    "play_sound": "Playing {sound}.",
+    "ai_live_give_weapon": "Your companion now has the {weapon}.",
+    "ai_live_gesture": "Your companion did the {gesture} gesture.",
+    "ai_live_stop": "Your companion stopped.",
+}
+
+# =============================================================================
+# OPTIMISTIC CONTINUATION
+# =============================================================================
+# For fire-and-forget tools (OPTIMISTIC_TOOLS in tools.py) start the model's
+# follow-up answer as soon as the calls are sent, assuming they succeed. The
+# answer is shown once GMod confirms them, and generated again if one failed.
+OPTIMISTIC_CONTINUATION = True
+
+# =============================================================================
+# ADMISSION SCHEDULER
+# =============================================================================
+# Maximum number of provider requests running at the same time
+SCHEDULER_MAX_CONCURRENCY = 4
+
+# If a request would wait in the queue longer than this (seconds), reject it
+# right away with a "busy, try again" message instead of letting it time out
+SCHEDULER_QUEUE_SLO = 20
+
+# Priority classes (lower is served first). Within a class, players are
+# served round-robin so one player's long tool chain can't starve others.
+SCHEDULER_PRIORITIES = {
+    "admin": 0,
+    "first_turn": 1,
+    "continuation": 2,
+    "background": 3,  # AI Live autonomy ticks
+}
+
+# =============================================================================
+# AI LIVE AUTONOMY
+# =============================================================================
+# Companions switched to autonomous mode in GMod (!ai_live_auto) are sent to
+# the bridge together every tick. All of a server's companions are planned in
+# one request; companions whose surroundings have not changed keep their
+# current command and are left out until COMPANION_REPLAN_AFTER seconds pass.
+COMPANION_MODEL = ""  # Empty = the cascade's small model if set, else the server's model
+COMPANION_REPLAN_AFTER = 15  # Seconds before an unchanged companion is planned again
+COMPANION_MAX_NEARBY = 6  # Nearby entities described per companion
+
+# Per tick: prompt tokens allowed (companions that do not fit wait for the
+# next tick) and completion tokens per planned companion
+COMPANION_TICK_TOKEN_BUDGET = 3000
+COMPANION_TOKENS_PER_COMMAND = 40
+
+# =============================================================================
+# TOKEN USAGE LEDGER & QUOTAS
+# =============================================================================
+# Token usage of every completion is recorded per player and per provider in
+# a local SQLite file, with per-minute and per-day rollups. A relative path
+# is taken from the bridge directory.
+USAGE_DB_PATH = "usage.db"
+
+# Seconds between commits of recorded usage; records in between are batched
+# into one write (and flushed on shutdown)
+USAGE_FLUSH_INTERVAL = 5
+
+# Per-player token budgets, checked before every provider call (0 = unlimited)
+USAGE_TOKENS_PER_MINUTE = 20000
+USAGE_TOKENS_PER_DAY = 500000
+
+# Admins are not limited by the budgets above
+USAGE_ADMINS_EXEMPT = True
+
+# =============================================================================
+# CANCELLATION
+# =============================================================================
+# When a player sends a new message while their previous one is still
+# generating or running tools, cancel the old one (aborts the provider stream
+# and drops its pending tool calls). Players can also cancel with !ai_cancel.
+SUPERSEDE_PREVIOUS_MESSAGES = True
+
+# =============================================================================
+# WORLD STATE MIRROR
+# =============================================================================
+# GMod can periodically send delta-encoded world snapshots (players, entities,
+# companions). The bridge keeps them in memory and answers read-only tools
+# (get_player_info, get_server_info, get_map_entities, get_entities_nearby)
+# locally instead of round-tripping to GMod.
+WORLD_STATE_ENABLED = True
+
+# Snapshots older than this (seconds) are considered stale; tools fall back to GMod
+WORLD_STATE_MAX_AGE = 3.0
+
+# Cell size (in game units) of the spatial grid used for radius queries
+WORLD_STATE_GRID_SIZE = 512
+
 # =============================================================================
 # THINKING MODEL SETTINGS
 # =============================================================================
@@ -223,45 +540,120 @@ THINKING_BUDGET = None
 # Reasoning effort (for o1-style models: "low", "medium", "high")
 REASONING_EFFORT = None
 
+# Pick reasoning effort and completion cap per request instead of using the
+# two settings above for everything. Requests are classed as "trivial"
+# (short single actions, confirming one tool), "complex" (multi-step plans,
+# long tool chains) or "normal" (see reasoning.py). None leaves a parameter out.
+# Only sent to providers whose capabilities (providers.py) include
+# "reasoning_effort"; the completion cap includes the model's reasoning tokens.
+ADAPTIVE_REASONING = False
+REASONING_PROFILES = {
+    "trivial": {"reasoning_effort": "low", "max_completion_tokens": 2048},
+    "normal": {"reasoning_effort": "medium", "max_completion_tokens": 4096},
+    "complex": {"reasoning_effort": "high", "max_completion_tokens": None},
+}
+
+# =============================================================================
+# PLAN AND EXECUTE
+# =============================================================================
+# Offer the model the bridge-local run_plan tool (see plans.py). For requests
+# with several steps it sends the whole plan in one call; the bridge runs the
+# steps against GMod (independent ones in parallel) and the model is only asked
+# again for the summary, instead of once per step of the chain
+PLAN_MODE_ENABLED = True
+
+# Longest plan accepted; longer ones are sent back to the model to split
+PLAN_MAX_STEPS = 12
+
+# Seconds to wait for GMod to answer one step before it counts as failed
+PLAN_STEP_TIMEOUT = 15
+
+# =============================================================================
+# ASSET CATALOG
+# =============================================================================
+# Index of installed models and NPC/weapon/entity/vehicle classes (see catalog.py).
+# Near-miss names in tool calls are fixed before they are sent to GMod, and the
+# model gets the bridge-local search_assets tool
+CATALOG_ENABLED = True
+
+# Catalog loaded at startup (relative to this folder; "" for none). GMod servers
+# add their own installed assets to it when they connect
+CATALOG_FILE = "assets.json"
+
+# Tool arguments that name an asset: tool -> {argument: kind}
+CATALOG_ARGUMENTS = {
+    "spawn_prop": {"model": "model"},
+    "spawn_npc": {"npc_type": "npc", "weapon": "weapon"},
+    "spawn_entity": {"class": "entity"},
+    "spawn_vehicle": {"vehicle_type": "vehicle"},
+    "give_weapon": {"weapon": "weapon"},
+    "ai_live_give_weapon": {"weapon": "weapon"},
+}
+
+# Kinds where a name missing from the server's full list is rejected before
+# dispatch (models and entities can exist without being listed)
+CATALOG_STRICT_KINDS = ["npc", "weapon", "vehicle"]
+
+# Arguments that accept an exact class name missing from the server's list
+# even for strict kinds: NPCs carry weapons players can't be given
+# (weapon_annabelle, weapon_alyxgun)
+CATALOG_UNLISTED_ARGUMENTS = {"spawn_npc": ["weapon"]}
+
+# Default number of search_assets results
+CATALOG_SEARCH_LIMIT = 10
+
 # =============================================================================
 # DEBUG SETTINGS
 # =============================================================================
 DEBUG = True
 
+# Print bridge metrics (counters and timings) every N seconds; 0 to disable
+METRICS_LOG_INTERVAL = 60
+
 
 # =============================================================================
 # HELPER FUNCTION - DO NOT MODIFY
 # =============================================================================
-def get_provider_config():
-    """Get the configuration for the selected provider."""
-    if PROVIDER == "ollama":
-        return {
+def get_provider_config(provider=None, model=None):
+    """Get the configuration for the selected provider (or an explicitly given one)."""
+    provider = provider or PROVIDER
+    if provider == "ollama":
+        config = {
             "base_url": OLLAMA_URL,
             "api_key": "ollama",  # Ollama doesn't require API key
             "model": OLLAMA_MODEL
         }
-    elif PROVIDER == "lmstudio":
-        return {
+    elif provider == "lmstudio":
+        config = {
             "base_url": LMSTUDIO_URL,
             "api_key": "lm-studio",
             "model": LMSTUDIO_MODEL
         }
-    elif PROVIDER == "cerebras":
+    elif provider == "cerebras":
         if not CEREBRAS_API_KEY:
             raise ValueError("CEREBRAS_API_KEY is required when using Cerebras provider")
-        return {
+        config = {
             "base_url": "https://api.cerebras.ai/v1",
             "api_key": CEREBRAS_API_KEY,
             "model": CEREBRAS_MODEL
         }
-    elif PROVIDER == "openai_compatible":
+    elif provider == "openai_compatible":
         if not CUSTOM_URL or not CUSTOM_API_KEY:
             raise ValueError("CUSTOM_URL and CUSTOM_API_KEY are required for openai_compatible provider")
-        return {
+        config = {
             "base_url": CUSTOM_URL,
             "api_key": CUSTOM_API_KEY,
             "model": CUSTOM_MODEL
         }
+    elif provider == "mock":
+        config = {
+            "base_url": "mock://local",
+            "api_key": "mock",
+            "model": "mock"
+        }
     else:
-        raise ValueError(f"Unknown provider: {PROVIDER}. Use 'ollama', 'lmstudio', 'cerebras', or 'openai_compatible'")
-
+        raise ValueError(f"Unknown provider: {provider}. Use 'ollama', 'lmstudio', 'cerebras', or 'openai_compatible'")
+    
+    if model:
+        config["model"] = model
+    return config
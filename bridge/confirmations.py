@@ -0,0 +1,88 @@
+"""
+GMod AI Assistant - Templated Confirmations
+After a simple action succeeds the model's second request usually only
+says "Done! I spawned 10 zombies for you." When every tool of a round
+succeeded and has a template in CONFIRMATION_TEMPLATES, and the player asked
+for a single action, the bridge writes that reply itself and skips the
+provider call.
+"""
+
+import re
+from cascade import needs_large_model
+from config import CONFIRMATIONS_ENABLED, CONFIRMATION_TEMPLATES
+from reasoning import ACTION_VERBS, turn_state
+
+FIELD = re.compile(r"\{(\w+)\}")
+# Class and path noise dropped from names shown to players
+NAME_PREFIXES = ("npc_", "weapon_", "item_", "prop_", "ent_")
+
+
+def _pretty(value):
+    """Readable form of an argument or result value."""
+    if isinstance(value, bool):
+        return "on" if value else "off"
+    if isinstance(value, str):
+        value = value.rsplit("/", 1)[-1].rsplit(".", 1)[0] if value.startswith("models/") else value
+        for prefix in NAME_PREFIXES:
+            if value.startswith(prefix):
+                value = value[len(prefix):]
+                break
+        return value.replace("_", " ")
+    return str(value)
+
+
+def partial(arguments, result):
+    """Whether GMod did less than asked (fewer entities spawned than the requested count)."""
+    requested = (arguments or {}).get("count")
+    done = result.get("count") if isinstance(result, dict) else None
+    return isinstance(requested, (int, float)) and isinstance(done, (int, float)) and done < requested
+
+
+def render(tool_name, arguments, result):
+    """Fill the first of the tool's templates whose fields are all known; None if none fits."""
+    # What GMod reports wins over what was asked for (clamped values, actual counts)
+    fields = dict(arguments or {})
+    if isinstance(result, dict):
+        fields.update(result)
+    templates = CONFIRMATION_TEMPLATES.get(tool_name) or []
+    for template in [templates] if isinstance(templates, str) else templates:
+        names = FIELD.findall(template)
+        if all(fields.get(name) is not None for name in names):
+            return template.format(**{name: _pretty(fields[name]) for name in names})
+    return None
+
+
+def single_action(conversation):
+    """Whether the player's message asks for one action, so nothing is left for the model to chain."""
+    text, _ = turn_state(conversation)
+    return not needs_large_model(text) and len(ACTION_VERBS.findall(text)) <= 1
+
+
+def templated(tool_names):
+    """Whether every tool of a round has a template (checked before the results are in)."""
+    return CONFIRMATIONS_ENABLED and all(name in CONFIRMATION_TEMPLATES for name in tool_names)
+
+
+def confirmation(conversation, tool_results):
+    """
+    Reply for a finished round of (tool name, arguments, outcome), or None
+    if the model has to write it: a tool failed, did only part of the job or
+    has no template, or the player asked for more than one thing.
+    """
+    if not templated(name for name, _, _ in tool_results) or not single_action(conversation):
+        return None
+    lines = []
+    for name, arguments, outcome in tool_results:
+        if not outcome.get("success") or partial(arguments, outcome.get("result")):
+            return None
+        line = render(name, arguments, outcome.get("result"))
+        if line is None:
+            return None
+        lines.append(line)
+
+    # The same confirmation for repeated calls is said once, with a count
+    counted = []
+    for line in dict.fromkeys(lines):
+        repeats = lines.count(line)
+        counted.append(f"{line} (x{repeats})" if repeats > 1 else line)
+    return "Done! " + " ".join(counted)
@@ -5,16 +5,23 @@ Supports: LM Studio, Cerebras, and any OpenAI-compatible provider.
 Supports both regular models and thinking/reasoning models.
 """
 
-import json
+import asyncio
 import re
 import time
-from openai import OpenAI
+import codec
+from cascade import small_model_for, large_model_for, needs_large_model, last_tools_failed, escalation_reason, cost
 from config import (
-    SYSTEM_PROMPT, STREAM_RESPONSES, DEBUG, PROVIDER,
-    THINKING_MODEL, SHOW_THINKING, THINKING_BUDGET, REASONING_EFFORT,
-    get_provider_config
+    SYSTEM_PROMPT, STREAM_RESPONSES, STREAM_USAGE, DEBUG, PROVIDER, OLLAMA_KEEP_ALIVE, WARMUP_COLD_AFTER,
+    THINKING_MODEL, SHOW_THINKING, THINKING_BUDGET, REASONING_EFFORT, ADAPTIVE_REASONING, REASONING_PROFILES,
+    PLAYER_MODELS, PLAN_MODE_ENABLED, CATALOG_ENABLED, get_provider_config
 )
-from tools import GMOD_TOOLS
+from metrics import metrics
+from reasoning import classify
+from providers import capabilities, create_client, constrained_mode, strict_tools, envelope_format, envelope_instructions, parse_envelope
+from result_policy import compact_tool_result
+from sanitizer import StreamSanitizer, sanitize
+from warmup import FirstChunkTimer
+from tools import GMOD_TOOLS, PLAN_TOOL, SEARCH_TOOL
 
 # Rate limit retry settings
 MAX_RETRIES = 3
@@ -22,56 +29,61 @@ RETRY_BASE_DELAY = 2  # seconds
 
 
 class LMStudioClient:  # Name kept for backwards compatibility
-    def __init__(self):
-        # Get provider configuration
-        provider_config = get_provider_config()
-        
-        self.client = OpenAI(
-            base_url=provider_config["base_url"],
-            api_key=provider_config["api_key"]
-        )
-        self.model = provider_config["model"]
-        self.conversations = {}  # Store conversation history per player
+    def __init__(self, provider=None, model=None, system_prompt=None):
+        # Get provider configuration (per-server overrides may pick another provider/model)
+        self.provider = provider or PROVIDER
+        provider_config = get_provider_config(self.provider, model)
+        
+        self.client = create_client(self.provider, provider_config)
+        # An explicit (per-server) model wins over the cascade's "large" setting
+        self.model = provider_config["model"] if model else large_model_for(self.provider, provider_config["model"])
+        self.small_model = small_model_for(self.provider)
+        self.large_turns = set()  # Conversations that skip the small model for the rest of the turn
+        self.player_models = {}  # Conversation id -> PLAYER_MODELS choice picked with !ai_model
+        self.interrupted = {}  # Conversation id -> usage of generations cancelled before they returned
+        self.last_request_at = None  # time.monotonic() of the last provider request, warm-ups included
+        self.system_prompt = system_prompt or SYSTEM_PROMPT
+        self.conversations = {}  # Store conversation history per conversation id (server:player)
+        
+        # Tool payloads are built once; constrained modes rewrite the schemas
+        # run_plan (plans.py) and search_assets (catalog.py) are run by the bridge itself, the rest by GMod
+        offered = list(GMOD_TOOLS)
+        if PLAN_MODE_ENABLED:
+            offered.append(PLAN_TOOL)
+        if CATALOG_ENABLED:
+            offered.append(SEARCH_TOOL)
+        self.constrained = constrained_mode(self.provider)
+        # Per-request effort and caps only go to providers known to accept them
+        self.adaptive_reasoning = ADAPTIVE_REASONING and capabilities(self.provider).get("reasoning_effort", False)
+        self.tools = strict_tools(offered) if self.constrained == "strict_tools" else offered
+        if self.constrained == "json_schema":
+            self.response_format = envelope_format(offered)
+            self.envelope_prompt = self.system_prompt + envelope_instructions(offered)
         
         if DEBUG:
-            print(f"[AI Client] Using provider: {PROVIDER}")
+            print(f"[AI Client] Using provider: {self.provider}")
             print(f"[AI Client] Model: {self.model}")
             print(f"[AI Client] Base URL: {provider_config['base_url']}")
+            if self.constrained:
+                print(f"[AI Client] Constrained decoding: {self.constrained}")
+            if self.small_model:
+                print(f"[AI Client] Cascade: {self.small_model} -> {self.model}")
         
     def _get_conversation(self, player_id):
         """Get or create conversation history for a player."""
         if player_id not in self.conversations:
             self.conversations[player_id] = [
-                {"role": "system", "content": SYSTEM_PROMPT}
+                {"role": "system", "content": self.system_prompt}
             ]
         return self.conversations[player_id]
     
     def _clean_response_text(self, text):
         """
         Remove problematic unicode characters and clean up response text.
-        This fixes garbled responses from thinking models.
+        This fixes garbled responses from thinking models. Streamed chunks
+        get the same cleaning through a StreamSanitizer.
         """
-        if not text:
-            return ""
-        
-        # Remove zero-width and invisible unicode characters
-        text = re.sub(r'[\u200b\u200c\u200d\u2060\ufeff]', '', text)
-        # Normalize various space characters to regular space
-        text = re.sub(r'[\u00a0\u2007\u202f\u2009\u200a]', ' ', text)
-        # Remove non-breaking hyphens and other oddities
-        text = text.replace('\u2011', '-')
-        # Remove stray backslashes that appear in garbled output
-        text = re.sub(r'(?<!\\)\\(?![\\nrt"\'\[\]{}])', '', text)
-        # Collapse multiple newlines
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        # Collapse multiple spaces
-        text = re.sub(r'  +', ' ', text)
-        # Remove lines that are just punctuation/ellipsis
-        text = re.sub(r'^[\s\-\.…]+$', '', text, flags=re.MULTILINE)
-        # Clean up multiple blank lines
-        text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
-        
-        return text.strip()
+        return sanitize(text)
     
     def _add_message(self, player_id, role, content):
         """Add a message to the conversation history."""
@@ -96,7 +108,7 @@ class LMStudioClient:  # Name kept for backwards compatibility
                 "type": "function",
                 "function": {
                     "name": tc["name"],
-                    "arguments": json.dumps(tc["arguments"]) if isinstance(tc["arguments"], dict) else tc["arguments"]
+                    "arguments": codec.dumps_text(tc["arguments"]) if isinstance(tc["arguments"], dict) else tc["arguments"]
                 }
             })
         
@@ -159,18 +171,37 @@ Map: {message_data.get('map', 'unknown')}"""
         if looking_at:
             context += f"\nLooking at: {looking_at.get('class', 'unknown')} ({looking_at.get('model', 'no model')})"
         
+        # Extra context from the bridge's world state mirror (if available)
+        world_context = message_data.get("world_context") or {}
+        companion = world_context.get("companion")
+        if companion:
+            context += f"\nCompanion: {companion.get('name', 'AI Companion')} (health {companion.get('health', '?')}, {companion.get('state', 'unknown')}, weapon {companion.get('weapon', 'none')})"
+        nearby = world_context.get("nearby")
+        if nearby:
+            context += "\nNearby: " + ", ".join(f"{ent.get('name') or ent.get('class')} ({ent.get('distance')}u)" for ent in nearby)
+        
         return f"{context}\n\n[Player Message]\n{message_data.get('text', '')}"
     
-    def _build_api_params(self):
-        """Build API parameters based on configuration."""
-        params = {
-            "model": self.model,
-            "tools": GMOD_TOOLS,
-            "tool_choice": "auto",
-        }
+    def _build_api_params(self, model=None, player_id=None):
+        """Build API parameters based on configuration and, with adaptive reasoning, the request's class."""
+        params = {"model": model or self.model}
+        if self.constrained == "json_schema":
+            # Tools are described in the system prompt and enforced by the envelope schema
+            params["response_format"] = self.response_format
+        else:
+            params["tools"] = self.tools
+            params["tool_choice"] = "auto"
+        if self.provider == "ollama" and OLLAMA_KEEP_ALIVE:
+            params["extra_body"] = {"keep_alive": OLLAMA_KEEP_ALIVE}
         
         # Add thinking/reasoning parameters if applicable
-        if THINKING_MODEL:
+        if THINKING_MODEL and self.adaptive_reasoning and player_id is not None:
+            effort = classify(self._get_conversation(player_id))
+            params["effort"] = effort  # Removed before the request is sent
+            for key, value in REASONING_PROFILES[effort].items():
+                if value is not None:
+                    params[key] = value
+        elif THINKING_MODEL:
             # For extended thinking models (like some DeepSeek variants)
             if THINKING_BUDGET is not None:
                 params["max_completion_tokens"] = THINKING_BUDGET
@@ -221,7 +252,7 @@ Map: {message_data.get('map', 'unknown')}"""
         
         return thinking, response
     
-    async def chat(self, message_data, stream_callback=None, thinking_callback=None):
+    async def chat(self, message_data, stream_callback=None, thinking_callback=None, conversation_id=None):
         """
         Send a chat message and get a response.
         
@@ -229,11 +260,12 @@ Map: {message_data.get('map', 'unknown')}"""
             message_data: Dict with player info and message text
             stream_callback: Async function to call with each streamed response chunk
             thinking_callback: Async function to call with thinking content (optional)
+            conversation_id: History key (defaults to the player's steamid)
             
         Returns:
             Dict with response and any tool calls
         """
-        player_id = message_data.get("player", {}).get("steamid", "unknown")
+        player_id = conversation_id or message_data.get("player", {}).get("steamid", "unknown")
         user_message = self._build_user_message(message_data)
         
         if DEBUG:
@@ -243,21 +275,13 @@ Map: {message_data.get('map', 'unknown')}"""
         
         self._add_message(player_id, "user", user_message)
         
+        self.large_turns.discard(player_id)
+        if self.small_model and needs_large_model(message_data.get("text")):
+            self.large_turns.add(player_id)
+            metrics.incr("cascade.direct_to_large")
+        
         try:
-            # Build API parameters
-            params = self._build_api_params()
-            params["messages"] = self._get_conversation(player_id)
-            params["stream"] = STREAM_RESPONSES and stream_callback is not None
-            
-            # Make the API call with retry logic for rate limits
-            response = self._api_call_with_retry(params)
-            
-            if STREAM_RESPONSES and stream_callback is not None:
-                return await self._handle_streaming_response(
-                    response, player_id, stream_callback, thinking_callback
-                )
-            else:
-                return self._handle_response(response, player_id, thinking_callback)
+            return await self._complete(player_id, stream_callback, thinking_callback)
                 
         except Exception as e:
             error_str = str(e)
@@ -267,24 +291,281 @@ Map: {message_data.get('map', 'unknown')}"""
                 return {"error": "Rate limited by AI provider. Please wait a moment and try again."}
             return {"error": error_str}
     
-    def _api_call_with_retry(self, params):
+    async def _complete(self, player_id, stream_callback=None, thinking_callback=None):
+        """Run one completion, trying the cascade's small model first when it is enabled."""
+        picked = self.player_model(player_id)
+        if picked:
+            return await self._run_stage(player_id, picked, stream_callback, thinking_callback)
+        if not self.small_model:
+            return await self._run_stage(player_id, self.model, stream_callback, thinking_callback)
+        
+        conv = self._get_conversation(player_id)
+        if player_id not in self.large_turns and last_tools_failed(conv):
+            self.large_turns.add(player_id)
+            metrics.incr("cascade.escalated.tool_failure")
+        if player_id in self.large_turns:
+            return await self._timed_stage("large", player_id, self.model, stream_callback, thinking_callback)
+        
+        # The small model's output is held back until it is accepted, so an
+        # escalation leaves no trace in the history or in the player's chat
+        snapshot = list(conv)
+        held = []
+        
+        async def hold(chunk):
+            held.append(chunk)
+        
+        try:
+            small = await self._timed_stage("small", player_id, self.small_model, hold if stream_callback else None)
+            reason = escalation_reason(small)
+        except Exception as e:
+            if DEBUG:
+                print(f"[LM Client] Small model failed: {e}")
+            small, reason = None, "error"
+        
+        if reason is None:
+            metrics.incr("cascade.accepted")
+            if held:
+                await stream_callback("".join(held))
+            return small
+        
+        if DEBUG:
+            print(f"[LM Client] Escalating to {self.model}: {reason}")
+        metrics.incr("cascade.escalated")
+        metrics.incr(f"cascade.escalated.{reason}")
+        self.conversations[player_id] = snapshot  # Trimming may have replaced the list
+        self.large_turns.add(player_id)
+        try:
+            result = await self._timed_stage("large", player_id, self.model, stream_callback, thinking_callback)
+        except asyncio.CancelledError:
+            if small is not None:
+                self._add_interrupted(player_id, small["usage"])
+            raise
+        if small is not None:
+            # The wasted small attempt still counts against the player's budget
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                result["usage"][key] += small["usage"][key]
+            result["usage"]["estimated"] = result["usage"]["estimated"] or small["usage"]["estimated"]
+        return result
+    
+    async def _timed_stage(self, stage, player_id, model, stream_callback=None, thinking_callback=None):
+        """Run one cascade stage and record its latency and cost."""
+        started = time.monotonic()
+        result = await self._run_stage(player_id, model, stream_callback, thinking_callback)
+        metrics.observe(f"cascade.latency.{stage}", time.monotonic() - started)
+        metrics.incr(f"cascade.requests.{stage}")
+        metrics.incr(f"cascade.cost_usd.{stage}", cost(model, result["usage"]))
+        return result
+    
+    async def _run_stage(self, player_id, model, stream_callback=None, thinking_callback=None):
+        """Run one completion over the player's conversation and attach token usage to the result."""
+        # Build API parameters
+        params = self._build_api_params(model, player_id)
+        effort = params.pop("effort", None)
+        params["stream"] = STREAM_RESPONSES and stream_callback is not None
+        envelope = self.constrained == "json_schema"
+        if envelope:
+            params["stream"] = False  # The reply is inside a JSON object
+        # The system prompt is sent from the client, not the history, so a
+        # reloaded prompt applies to existing conversations too
+        conv = self._get_conversation(player_id)
+        system_prompt = self.envelope_prompt if envelope else self.system_prompt
+        params["messages"] = [{"role": "system", "content": system_prompt}] + conv[1:]
+        if params["stream"] and STREAM_USAGE:
+            params["stream_options"] = {"include_usage": True}
+        prompt_estimate = self.estimate_tokens(player_id)
+        partial = {"text": ""}  # Streamed so far, for the usage of a cancelled generation
+        
+        # Make the API call with retry logic for rate limits
+        started = time.monotonic()
+        idle = started - self.last_request_at if self.last_request_at is not None else None
+        self.last_request_at = started
+        try:
+            response = await self._api_call_with_retry(params)
+            
+            if params["stream"]:
+                response = FirstChunkTimer(response)
+                result = await self._handle_streaming_response(
+                    response, player_id, stream_callback, thinking_callback, partial
+                )
+            elif envelope:
+                result = self._handle_envelope_response(response, player_id)
+            else:
+                result = self._handle_response(response, player_id, thinking_callback)
+        except asyncio.CancelledError:
+            # The provider still charges the prompt and what it generated before the cancel
+            self._add_interrupted(player_id, self._normalize_usage(None, prompt_estimate, partial, model))
+            raise
+        
+        result["usage"] = self._normalize_usage(result.get("usage"), prompt_estimate, result, model)
+        first_token_at = (response.first_chunk_at if params["stream"] else None) or time.monotonic()
+        warmth = "cold" if idle is None or idle > WARMUP_COLD_AFTER else "warm"
+        metrics.observe(f"provider.ttft.{warmth}", first_token_at - started)
+        if effort:
+            result["effort"] = effort
+            metrics.incr(f"reasoning.requests.{effort}")
+            metrics.incr(f"reasoning.completion_tokens.{effort}", result["usage"]["completion_tokens"])
+            metrics.observe(f"reasoning.latency.{effort}", time.monotonic() - started)
+        return result
+    
+    async def warm_up(self, model=None):
+        """
+        Send a one-token request with the real system prompt and tools, so the
+        provider connects, loads the model and caches the shared prompt prefix.
+        Returns (time to first token in seconds, estimated usage).
+        """
+        params = self._build_api_params(model)
+        system_prompt = self.envelope_prompt if self.constrained == "json_schema" else self.system_prompt
+        params["messages"] = [{"role": "system", "content": system_prompt}, {"role": "user", "content": "ping"}]
+        params["max_completion_tokens"] = 1
+        params["stream"] = True
+        
+        started = time.monotonic()
+        self.last_request_at = started
+        stream = FirstChunkTimer(await self.client.chat.completions.create(**params))
+        try:
+            async for _ in stream:
+                break
+        finally:
+            await stream.close()
+        # The stream is closed before any usage chunk, so the prompt (tools included) is estimated
+        prompt_chars = len(system_prompt) + len(codec.dumps_text(params.get("tools") or []))
+        usage = self._normalize_usage(None, prompt_chars // 4, {"text": "x"}, params["model"])
+        return (stream.first_chunk_at or time.monotonic()) - started, usage
+    
+    async def complete_json(self, messages, name, schema, max_tokens, model=None):
+        """
+        One request for a JSON answer outside any conversation. Providers that
+        constrain decoding get the schema as a json_schema response_format;
+        others rely on the prompt. Returns (parsed object or None, usage).
+        """
+        params = {"model": model or self.model, "messages": messages, "max_completion_tokens": max_tokens}
+        if capabilities(self.provider).get("constrained"):
+            params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": name, "strict": True, "schema": schema}
+            }
+        if self.provider == "ollama" and OLLAMA_KEEP_ALIVE:
+            params["extra_body"] = {"keep_alive": OLLAMA_KEEP_ALIVE}
+        
+        self.last_request_at = time.monotonic()
+        response = await self._api_call_with_retry(params)
+        content = response.choices[0].message.content or ""
+        if THINKING_MODEL:
+            _, content = self._extract_thinking_and_response(content)
+        
+        parsed = None
+        start, end = content.find("{"), content.rfind("}")
+        if start != -1 and end > start:
+            try:
+                parsed = codec.loads(content[start:end + 1])
+            except codec.DecodeError:
+                pass
+        prompt_estimate = sum(len(m["content"]) for m in messages) // 4
+        usage = self._normalize_usage(getattr(response, "usage", None), prompt_estimate, {"text": content}, params["model"])
+        return parsed, usage
+    
+    def _add_interrupted(self, player_id, usage):
+        """Remember the usage of a generation that was cancelled, until the bridge records it."""
+        total = self.interrupted.get(player_id)
+        if total is None:
+            self.interrupted[player_id] = dict(usage)
+            return
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            total[key] += usage[key]
+        total["estimated"] = total["estimated"] or usage["estimated"]
+    
+    def take_interrupted_usage(self, player_id):
+        """Usage of this conversation's cancelled generations since the last call, or None."""
+        return self.interrupted.pop(player_id, None)
+    
+    def _normalize_usage(self, usage, prompt_estimate, result, model=None):
+        """Convert provider usage to a plain dict, estimating it if the provider sent none."""
+        if usage is not None and getattr(usage, "total_tokens", None):
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            estimated = False
+        else:
+            completion_chars = len(result.get("text") or "")
+            for tc in result.get("tool_calls") or []:
+                completion_chars += len(codec.dumps_text(tc["arguments"]))
+            prompt_tokens = prompt_estimate
+            completion_tokens = completion_chars // 4
+            estimated = True
+        
+        return {
+            "provider": self.provider,
+            "model": model or self.model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "estimated": estimated
+        }
+    
+    async def _api_call_with_retry(self, params):
         """Make API call with retry logic for rate limits."""
         last_error = None
         for attempt in range(MAX_RETRIES):
             try:
-                return self.client.chat.completions.create(**params)
+                return await self.client.chat.completions.create(**params)
             except Exception as e:
                 error_str = str(e)
                 if "429" in error_str or "rate" in error_str.lower() or "too_many_requests" in error_str.lower():
                     delay = RETRY_BASE_DELAY * (2 ** attempt)
                     if DEBUG:
                         print(f"[LM Client] Rate limited, retrying in {delay}s (attempt {attempt + 1}/{MAX_RETRIES})")
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                     last_error = e
                 else:
                     raise e
         raise last_error
     
+    def _parse_tool_call(self, tool_call_id, name, arguments):
+        """Decode a tool call's arguments; undecodable ones are flagged so the bridge can reject the call."""
+        tool_call = {"id": tool_call_id, "name": name, "arguments": {}}
+        try:
+            args = codec.loads(arguments) if arguments else {}
+        except codec.DecodeError:
+            args = None
+        if isinstance(args, dict):
+            tool_call["arguments"] = args
+        else:
+            tool_call["malformed"] = True
+            metrics.incr("tool_args.malformed")
+            if DEBUG:
+                print(f"[LM Client] Malformed arguments for {name}: {arguments[:200]!r}")
+        return tool_call
+    
+    def _handle_envelope_response(self, response, player_id):
+        """Handle a JSON envelope answer (json_schema constrained mode)."""
+        message = response.choices[0].message
+        try:
+            text, tool_calls = parse_envelope(message.content)
+        except codec.DecodeError:
+            # Only possible if the server ignored the schema; show the raw text
+            metrics.incr("tool_args.malformed")
+            text, tool_calls = message.content or "", []
+        
+        if THINKING_MODEL:
+            _, text = self._extract_thinking_and_response(text)
+        
+        if tool_calls:
+            self._add_assistant_message_with_tool_calls(player_id, text, tool_calls)
+            if DEBUG:
+                print(f"[LM Client] Envelope: Tool calls detected: {[tc['name'] for tc in tool_calls]}")
+            return {
+                "type": "tool_calls",
+                "tool_calls": tool_calls,
+                "text": self._clean_response_text(text),
+                "usage": response.usage
+            }
+        
+        self._add_message(player_id, "assistant", text)
+        return {
+            "type": "response",
+            "text": self._clean_response_text(text),
+            "usage": response.usage
+        }
+    
     def _handle_response(self, response, player_id, thinking_callback=None):
         """Handle a non-streaming response."""
         message = response.choices[0].message
@@ -296,16 +577,7 @@ Map: {message_data.get('map', 'unknown')}"""
                 if DEBUG:
                     print(f"[LM Client] Raw tool call from API - id: {tc.id}, function: {tc.function.name}")
                 
-                try:
-                    args = json.loads(tc.function.arguments) if tc.function.arguments else {}
-                except json.JSONDecodeError:
-                    args = {}
-                    
-                tool_calls.append({
-                    "id": tc.id,
-                    "name": tc.function.name,
-                    "arguments": args
-                })
+                tool_calls.append(self._parse_tool_call(tc.id, tc.function.name, tc.function.arguments))
             
             # Get content and extract thinking if applicable
             content = message.content or ""
@@ -325,7 +597,8 @@ Map: {message_data.get('map', 'unknown')}"""
             return {
                 "type": "tool_calls",
                 "tool_calls": tool_calls,
-                "text": self._clean_response_text(content)
+                "text": self._clean_response_text(content),
+                "usage": response.usage
             }
         
         # Regular text response
@@ -345,7 +618,8 @@ Map: {message_data.get('map', 'unknown')}"""
         
         result = {
             "type": "response",
-            "text": clean_text
+            "text": clean_text,
+            "usage": response.usage
         }
         
         if thinking and SHOW_THINKING:
@@ -353,72 +627,96 @@ Map: {message_data.get('map', 'unknown')}"""
         
         return result
     
-    async def _handle_streaming_response(self, response, player_id, stream_callback, thinking_callback=None):
-        """Handle a streaming response with support for thinking models."""
+    async def _handle_streaming_response(self, response, player_id, stream_callback, thinking_callback=None, partial=None):
+        """Handle a streaming response with support for thinking models. partial["text"] gets the raw text if cancelled."""
         collected_content = ""
         collected_tool_calls = {}
         in_thinking = False
         thinking_buffer = ""
         response_buffer = ""
+        usage = None
         
-        for chunk in response:
-            delta = chunk.choices[0].delta if chunk.choices else None
-            
-            if delta is None:
-                continue
-                
-            # Handle text content
-            if delta.content:
-                collected_content += delta.content
+        # Players see streamed text cleaned the same way as the final text
+        sanitizer = StreamSanitizer()
+        
+        async def emit(text):
+            clean = sanitizer.feed(text)
+            if clean:
+                await stream_callback(clean)
+        
+        stream = response
+        try:
+            async for chunk in stream:
+                # With include_usage the last chunk carries usage and no choices
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
                 
-                if THINKING_MODEL:
-                    # Check if we're entering thinking mode
-                    if not in_thinking and ('<think' in collected_content.lower() or '<reasoning>' in collected_content.lower()):
-                        in_thinking = True
+                delta = chunk.choices[0].delta if chunk.choices else None
                     
-                    # Check if we're exiting thinking mode
-                    if in_thinking and ('</think' in collected_content.lower() or '</reasoning>' in collected_content.lower()):
-                        in_thinking = False
-                        # Extract and send thinking if configured
-                        thinking, response = self._extract_thinking_and_response(collected_content)
-                        if thinking and SHOW_THINKING and thinking_callback:
-                            await thinking_callback(thinking)
-                        # Stream the response part
-                        if response:
-                            await stream_callback(response)
-                        continue
+                if delta is None:
+                    continue
                     
-                    # If in thinking mode, optionally stream thinking
-                    if in_thinking:
-                        if SHOW_THINKING and thinking_callback:
-                            await thinking_callback(delta.content)
-                    else:
-                        # Not in thinking, just stream normally
-                        # But wait to make sure we're not about to enter thinking
-                        if not any(tag in collected_content.lower() for tag in ['<think', '<reasoning>']):
-                            await stream_callback(delta.content)
-                else:
-                    # Non-thinking model, stream directly
-                    await stream_callback(delta.content)
-            
-            # Handle tool calls (streamed incrementally)
-            if delta.tool_calls:
-                for tc in delta.tool_calls:
-                    idx = tc.index
-                    if idx not in collected_tool_calls:
-                        collected_tool_calls[idx] = {
-                            "id": "",
-                            "name": "",
-                            "arguments": ""
-                        }
+                # Handle text content
+                if delta.content:
+                    collected_content += delta.content
                     
-                    if tc.id:
-                        collected_tool_calls[idx]["id"] = tc.id
-                    if tc.function:
-                        if tc.function.name:
-                            collected_tool_calls[idx]["name"] = tc.function.name
-                        if tc.function.arguments:
-                            collected_tool_calls[idx]["arguments"] += tc.function.arguments
+                    if THINKING_MODEL:
+                        # Check if we're entering thinking mode
+                        if not in_thinking and ('<think' in collected_content.lower() or '<reasoning>' in collected_content.lower()):
+                            in_thinking = True
+                        
+                        # Check if we're exiting thinking mode
+                        if in_thinking and ('</think' in collected_content.lower() or '</reasoning>' in collected_content.lower()):
+                            in_thinking = False
+                            # Extract and send thinking if configured
+                            thinking, response = self._extract_thinking_and_response(collected_content)
+                            if thinking and SHOW_THINKING and thinking_callback:
+                                await thinking_callback(thinking)
+                            # Stream the response part
+                            if response:
+                                await emit(response)
+                            continue
+                        
+                        # If in thinking mode, optionally stream thinking
+                        if in_thinking:
+                            if SHOW_THINKING and thinking_callback:
+                                await thinking_callback(delta.content)
+                        else:
+                            # Not in thinking, just stream normally
+                            # But wait to make sure we're not about to enter thinking
+                            if not any(tag in collected_content.lower() for tag in ['<think', '<reasoning>']):
+                                await emit(delta.content)
+                    else:
+                        # Non-thinking model, stream directly
+                        await emit(delta.content)
+                
+                # Handle tool calls (streamed incrementally)
+                if delta.tool_calls:
+                    for tc in delta.tool_calls:
+                        idx = tc.index
+                        if idx not in collected_tool_calls:
+                            collected_tool_calls[idx] = {
+                                "id": "",
+                                "name": "",
+                                "arguments": ""
+                            }
+                        
+                        if tc.id:
+                            collected_tool_calls[idx]["id"] = tc.id
+                        if tc.function:
+                            if tc.function.name:
+                                collected_tool_calls[idx]["name"] = tc.function.name
+                            if tc.function.arguments:
+                                collected_tool_calls[idx]["arguments"] += tc.function.arguments
+        except asyncio.CancelledError:
+            # Turn was cancelled or superseded - stop generating at the provider
+            if partial is not None:
+                partial["text"] = collected_content + "".join(tc["arguments"] for tc in collected_tool_calls.values())
+            await stream.close()
+            raise
+        rest = sanitizer.finish()
+        if rest:
+            await stream_callback(rest)
         
         # Process final content - extract thinking if present
         final_text = collected_content
@@ -431,16 +729,7 @@ Map: {message_data.get('map', 'unknown')}"""
             tool_calls = []
             for idx in sorted(collected_tool_calls.keys()):
                 tc = collected_tool_calls[idx]
-                try:
-                    args = json.loads(tc["arguments"]) if tc["arguments"] else {}
-                except json.JSONDecodeError:
-                    args = {}
-                
-                tool_calls.append({
-                    "id": tc["id"],
-                    "name": tc["name"],
-                    "arguments": args
-                })
+                tool_calls.append(self._parse_tool_call(tc["id"], tc["name"], tc["arguments"]))
             
             # Add assistant message WITH tool_calls to history (required by OpenAI API)
             self._add_assistant_message_with_tool_calls(player_id, final_text, tool_calls)
@@ -451,7 +740,8 @@ Map: {message_data.get('map', 'unknown')}"""
             result = {
                 "type": "tool_calls",
                 "tool_calls": tool_calls,
-                "text": self._clean_response_text(final_text)
+                "text": self._clean_response_text(final_text),
+                "usage": usage
             }
             if thinking and SHOW_THINKING:
                 result["thinking"] = thinking
@@ -465,7 +755,8 @@ Map: {message_data.get('map', 'unknown')}"""
         
         result = {
             "type": "response",
-            "text": clean_text
+            "text": clean_text,
+            "usage": usage
         }
         if thinking and SHOW_THINKING:
             result["thinking"] = thinking
@@ -480,25 +771,17 @@ Map: {message_data.get('map', 'unknown')}"""
             "role": "tool",
             "tool_call_id": tool_call_id,
             "name": tool_name,
-            "content": json.dumps(result)
+            "content": compact_tool_result(tool_name, result)
         })
     
+    def add_assistant_message(self, player_id, text):
+        """Add a reply written without the provider (e.g. a templated confirmation) to the history."""
+        self._add_message(player_id, "assistant", text)
+    
     async def continue_after_tools(self, player_id, stream_callback=None, thinking_callback=None):
         """Continue the conversation after tool results have been added."""
         try:
-            params = self._build_api_params()
-            params["messages"] = self._get_conversation(player_id)
-            params["stream"] = STREAM_RESPONSES and stream_callback is not None
-            
-            # Use retry logic for rate limits
-            response = self._api_call_with_retry(params)
-            
-            if STREAM_RESPONSES and stream_callback is not None:
-                return await self._handle_streaming_response(
-                    response, player_id, stream_callback, thinking_callback
-                )
-            else:
-                return self._handle_response(response, player_id, thinking_callback)
+            return await self._complete(player_id, stream_callback, thinking_callback)
                 
         except Exception as e:
             error_str = str(e)
@@ -508,10 +791,122 @@ Map: {message_data.get('map', 'unknown')}"""
                 return {"error": "Rate limited by AI provider. Please wait a moment and try again."}
             return {"error": error_str}
     
+    async def continue_speculatively(self, player_id, results, stream_callback=None):
+        """
+        Continue a copy of the conversation with the given tool results
+        ((tool_call_id, name, outcome) tuples), leaving the real history as it
+        is. Returns (result, messages, escalated); keep_speculation() adopts them.
+        """
+        key = f"{player_id}#speculative"
+        self.conversations[key] = list(self._get_conversation(player_id))
+        if player_id in self.large_turns:
+            self.large_turns.add(key)
+        if player_id in self.player_models:
+            self.player_models[key] = self.player_models[player_id]
+        try:
+            for tool_call_id, name, outcome in results:
+                self.add_tool_result(key, tool_call_id, name, outcome)
+            result = await self.continue_after_tools(key, stream_callback)
+            return result, self.conversations[key], key in self.large_turns
+        finally:
+            self.conversations.pop(key, None)
+            self.large_turns.discard(key)
+            self.player_models.pop(key, None)
+            wasted = self.interrupted.pop(key, None)
+            if wasted:
+                self._add_interrupted(player_id, wasted)
+    
+    def keep_speculation(self, player_id, messages, escalated, results):
+        """Make a speculative history the real one, with the real tool results in place of the provisional ones."""
+        real = {tool_call_id: (name, outcome) for tool_call_id, name, outcome in results}
+        for msg in messages:
+            if msg.get("role") == "tool" and msg.get("tool_call_id") in real:
+                name, outcome = real[msg["tool_call_id"]]
+                msg["content"] = compact_tool_result(name, outcome)
+        self.conversations[player_id] = messages
+        if escalated:
+            self.large_turns.add(player_id)
+    
+    def estimate_tokens(self, player_id):
+        """Rough token estimate (~4 chars per token) of the prompt a request for this player would send."""
+        chars = 0
+        for msg in self.conversations.get(player_id, []):
+            chars += len(msg.get("content") or "")
+            for tc in msg.get("tool_calls") or []:
+                chars += len(tc["function"]["arguments"] or "")
+        return chars // 4
+    
+    def cancel_turn(self, player_id):
+        """
+        Leave the history consistent after a turn is cancelled mid-flight.
+        Tool calls that never got a result get a cancelled result (the API
+        rejects orphaned tool calls), and the turn is closed with a short
+        assistant message so the next user message follows an assistant one.
+        """
+        conv = self.conversations.get(player_id)
+        if not conv:
+            return
+        
+        answered = set()
+        for index in range(len(conv) - 1, 0, -1):
+            msg = conv[index]
+            if msg.get("role") == "tool":
+                answered.add(msg.get("tool_call_id"))
+            elif msg.get("role") == "assistant" and msg.get("tool_calls"):
+                for tc in msg["tool_calls"]:
+                    if tc["id"] not in answered:
+                        self.add_tool_result(player_id, tc["id"], tc["function"]["name"],
+                                             {"success": False, "error": "Cancelled by player"})
+                break
+            else:
+                break
+        
+        if conv[-1].get("role") != "assistant" or conv[-1].get("tool_calls"):
+            self._add_message(player_id, "assistant", "(Cancelled)")
+    
     def clear_conversation(self, player_id):
         """Clear a player's conversation history."""
         if player_id in self.conversations:
             del self.conversations[player_id]
+        self.large_turns.discard(player_id)
+    
+    def model_choices(self):
+        """Models players may pick on this provider (name -> provider model)."""
+        return PLAYER_MODELS.get(self.provider, {})
+    
+    def player_model(self, player_id):
+        """Model a player picked for their conversation, or None for the default (and cascade)."""
+        return self.model_choices().get(self.player_models.get(player_id))
+    
+    def set_player_model(self, player_id, choice):
+        """Pick a model from PLAYER_MODELS for a conversation ("default" goes back). Returns False for unknown names."""
+        if choice == "default":
+            self.player_models.pop(player_id, None)
+            return True
+        if choice not in self.model_choices():
+            return False
+        self.player_models[player_id] = choice
+        return True
+    
+    def conversation_stats(self, player_id):
+        """Size of a player's history: messages, player messages, tool calls and estimated tokens."""
+        conv = self.conversations.get(player_id, [])[1:]  # The system prompt is not memory
+        chars = sum(len(msg.get("content") or "") for msg in conv)
+        chars += sum(len(tc["function"]["arguments"] or "") for msg in conv for tc in msg.get("tool_calls") or [])
+        return {
+            "messages": len(conv),
+            "player_messages": sum(1 for msg in conv if msg.get("role") == "user"),
+            "tool_calls": sum(len(msg.get("tool_calls") or []) for msg in conv),
+            "tokens": chars // 4
+        }
+    
+    def adopt_state(self, other):
+        """Take over another client's conversations (after a config reload). Both keep sharing them."""
+        self.conversations = other.conversations
+        self.large_turns = other.large_turns
+        self.player_models = other.player_models
+        self.interrupted = other.interrupted
+        self.last_request_at = other.last_request_at
     
     def clear_all_conversations(self):
         """Clear all conversation histories."""
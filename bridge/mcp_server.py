@@ -0,0 +1,329 @@
+"""
+GMod AI Assistant - MCP Server
+Exposes the GMod tools over the Model Context Protocol so external agents can
+drive the game directly. Two transports:
+  - Streamable HTTP, served inside the bridge (MCP_HTTP_ENABLED in config.py)
+  - stdio, by running this file; it forwards calls to the bridge over WebSocket
+Calls are multiplexed: any number can be in flight, each correlated by its own id.
+The HTTP transport needs MCP_HTTP_TOKEN and refuses unknown browser origins;
+admin tools are only offered with MCP_ALLOW_ADMIN_TOOLS and a player_id.
+"""
+
+import asyncio
+import hmac
+import sys
+import uuid
+import websockets
+import codec
+from config import (
+    MCP_TOOL_TIMEOUT, MCP_BRIDGE_URL, MCP_HTTP_TOKEN, MCP_HTTP_ALLOWED_ORIGINS, MCP_HTTP_MAX_BODY,
+    MCP_ALLOW_ADMIN_TOOLS, DEBUG
+)
+from tools import GMOD_TOOLS, ADMIN_TOOLS
+
+PROTOCOL_VERSION = "2025-03-26"
+SERVER_INFO = {"name": "gmod-ai-assistant", "version": "1.0.0"}
+MCP_HTTP_PATH = "/mcp"
+
+# Routing arguments added to every tool; stripped before the call reaches GMod
+ROUTING_PROPERTIES = {
+    "server_id": {
+        "type": "string",
+        "description": "GMod server to run on (see list_gmod_servers). Optional when only one server is connected."
+    },
+    "player_id": {
+        "type": "string",
+        "description": "SteamID64 of the player to act as (for tools that use the player's position or aim)."
+    }
+}
+
+LIST_SERVERS_TOOL = {
+    "name": "list_gmod_servers",
+    "description": "List the GMod servers connected to the bridge, with their server_id, name, map and player count.",
+    "inputSchema": {"type": "object", "properties": {}}
+}
+
+
+class MCPError(Exception):
+    """JSON-RPC error returned to the MCP client."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def mcp_tools():
+    """Convert GMOD_TOOLS (OpenAI format) to MCP tool descriptors."""
+    tools = [LIST_SERVERS_TOOL]
+    for tool in GMOD_TOOLS:
+        function = tool["function"]
+        if function["name"] in ADMIN_TOOLS and not MCP_ALLOW_ADMIN_TOOLS:
+            continue
+        schema = dict(function.get("parameters") or {"type": "object"})
+        schema["properties"] = dict(schema.get("properties", {}), **ROUTING_PROPERTIES)
+        tools.append({
+            "name": function["name"],
+            "description": function.get("description", ""),
+            "inputSchema": schema
+        })
+    return tools
+
+
+class MCPHandler:
+    """
+    JSON-RPC dispatcher for MCP. The backend provides:
+      async call_tool(name, args, server_id, player_id, timeout) -> (success, result)
+      async list_servers() -> list of dicts
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.refresh_tools()
+
+    def refresh_tools(self):
+        """Rebuild the tool list from GMOD_TOOLS (after a config reload)."""
+        self.tools = mcp_tools()
+        self.tool_names = {tool["name"] for tool in self.tools}
+
+    async def handle(self, message):
+        """Handle one JSON-RPC message or batch. Returns the response, or None for notifications."""
+        if isinstance(message, list):
+            responses = await asyncio.gather(*(self.handle(m) for m in message))
+            return [r for r in responses if r is not None] or None
+
+        msg_id = message.get("id")
+        method = message.get("method")
+        if msg_id is None:
+            return None  # Notification (e.g. notifications/initialized) or a response to us
+
+        try:
+            if method == "initialize":
+                result = {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {"tools": {"listChanged": False}},
+                    "serverInfo": SERVER_INFO
+                }
+            elif method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = {"tools": self.tools}
+            elif method == "tools/call":
+                result = await self.call_tool(message.get("params") or {})
+            else:
+                raise MCPError(-32601, f"Method not found: {method}")
+        except MCPError as e:
+            return {"jsonrpc": "2.0", "id": msg_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            print(f"[MCP] Error handling {method}: {e}", file=sys.stderr)
+            return {"jsonrpc": "2.0", "id": msg_id, "error": {"code": -32603, "message": str(e)}}
+
+        return {"jsonrpc": "2.0", "id": msg_id, "result": result}
+
+    async def call_tool(self, params):
+        name = params.get("name")
+        if name not in self.tool_names:
+            raise MCPError(-32602, f"Unknown tool: {name}")
+
+        args = dict(params.get("arguments") or {})
+        meta = params.get("_meta") or {}
+        server_id = args.pop("server_id", None) or meta.get("server_id")
+        player_id = args.pop("player_id", None)
+        timeout = meta.get("timeout", MCP_TOOL_TIMEOUT)
+        if name in ADMIN_TOOLS and not player_id:
+            # GMod only checks permissions for a player; without one the call would run unchecked
+            raise MCPError(-32602, f"{name} is an admin tool and needs the player_id of an admin to act as")
+
+        if name == LIST_SERVERS_TOOL["name"]:
+            success, result = True, await self.backend.list_servers()
+        else:
+            success, result = await self.backend.call_tool(name, args, server_id, player_id, timeout)
+
+        text = result if isinstance(result, str) else codec.dumps_text(result)
+        return {"content": [{"type": "text", "text": text}], "isError": not success}
+
+
+def _http_refusal(headers, token):
+    """Status line for a request that must be refused, or None if it may proceed."""
+    origin = headers.get("origin")
+    if origin and origin.rstrip("/") not in {allowed.rstrip("/") for allowed in MCP_HTTP_ALLOWED_ORIGINS}:
+        return "403 Forbidden"
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.strip().encode(), token.encode()):
+        return "401 Unauthorized"
+    return None
+
+
+async def serve_http(handler, host, port, token=MCP_HTTP_TOKEN):
+    """Serve MCP over streamable HTTP (JSON responses, keep-alive connections)."""
+    if not token:
+        raise ValueError("MCP_HTTP_TOKEN must be set to serve MCP over HTTP")
+
+    async def respond(writer, status, body=b"", headers=None):
+        lines = [f"HTTP/1.1 {status}", f"Content-Length: {len(body)}"]
+        for key, value in (headers or {}).items():
+            lines.append(f"{key}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                size = int(headers.get("content-length", 0))
+                if size < 0 or size > MCP_HTTP_MAX_BODY:
+                    # The body is not read, so the connection cannot be reused
+                    await respond(writer, "413 Content Too Large", headers={"Connection": "close"})
+                    break
+                body = await reader.readexactly(size)
+
+                refusal = _http_refusal(headers, token)
+                if refusal:
+                    extra = {"WWW-Authenticate": "Bearer"} if refusal.startswith("401") else None
+                    await respond(writer, refusal, headers=extra)
+                elif path.split("?", 1)[0] != MCP_HTTP_PATH:
+                    await respond(writer, "404 Not Found")
+                elif method == "POST":
+                    try:
+                        message = codec.loads(body)
+                    except codec.DecodeError:
+                        error = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+                        await respond(writer, "400 Bad Request", codec.dumps(error), {"Content-Type": "application/json"})
+                        continue
+                    response = await handler.handle(message)
+                    if response is None:
+                        await respond(writer, "202 Accepted")
+                    else:
+                        extra = {"Content-Type": "application/json"}
+                        if isinstance(message, dict) and message.get("method") == "initialize":
+                            extra["Mcp-Session-Id"] = uuid.uuid4().hex
+                        await respond(writer, "200 OK", codec.dumps(response), extra)
+                elif method == "DELETE":
+                    await respond(writer, "200 OK")
+                else:
+                    # No server-initiated stream: every call is answered on its own POST
+                    await respond(writer, "405 Method Not Allowed", headers={"Allow": "POST, DELETE"})
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"[MCP] Streamable HTTP endpoint on http://{host}:{port}{MCP_HTTP_PATH}", file=sys.stderr)
+    return server
+
+
+class BridgeConnection:
+    """MCP backend that forwards calls to a running bridge over its WebSocket."""
+
+    def __init__(self, url=MCP_BRIDGE_URL):
+        self.url = url
+        self.websocket = None
+        self.pending = {}  # call_id -> future
+        self._connecting = asyncio.Lock()
+
+    async def _ensure_connected(self):
+        async with self._connecting:
+            if self.websocket is None:
+                self.websocket = await websockets.connect(self.url)
+                asyncio.create_task(self._read(self.websocket))
+                if DEBUG:
+                    print(f"[MCP] Connected to bridge at {self.url}", file=sys.stderr)
+
+    async def _read(self, websocket):
+        try:
+            async for message in websocket:
+                data = codec.loads(message)
+                future = self.pending.pop(data.get("call_id"), None)
+                if future and not future.done():
+                    future.set_result(data)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.websocket = None
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost connection to the bridge"))
+            self.pending.clear()
+
+    async def _request(self, frame, timeout):
+        await self._ensure_connected()
+        call_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self.pending[call_id] = future
+        try:
+            await self.websocket.send(codec.dumps_text(dict(frame, call_id=call_id)))
+            # The bridge enforces the tool timeout; this only guards against a stuck bridge
+            return await asyncio.wait_for(future, timeout + 5)
+        finally:
+            self.pending.pop(call_id, None)
+
+    async def call_tool(self, name, args, server_id, player_id, timeout):
+        try:
+            data = await self._request({
+                "type": "mcp_tool_call",
+                "tool": name,
+                "args": args,
+                "server_id": server_id,
+                "player_id": player_id,
+                "timeout": timeout
+            }, timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            return False, f"Bridge unavailable: {e}"
+        if data.get("success"):
+            return True, data.get("result")
+        return False, data.get("error") or data.get("result")
+
+    async def list_servers(self):
+        data = await self._request({"type": "mcp_list_servers"}, MCP_TOOL_TIMEOUT)
+        return data.get("servers", [])
+
+
+async def serve_stdio(handler, out):
+    """Serve MCP over stdio: one JSON-RPC message per line, requests handled concurrently."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    tasks = set()
+
+    async def handle_line(line):
+        try:
+            message = codec.loads(line)
+        except codec.DecodeError:
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+        else:
+            response = await handler.handle(message)
+        if response is not None:
+            out.write(codec.dumps(response) + b"\n")
+            out.flush()
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.strip():
+            task = asyncio.create_task(handle_line(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+if __name__ == "__main__":
+    # stdout carries the protocol; send every log line to stderr instead
+    protocol_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    asyncio.run(serve_stdio(MCPHandler(BridgeConnection()), protocol_out))
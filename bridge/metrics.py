@@ -0,0 +1,64 @@
+"""
+GMod AI Assistant - Metrics
+Lightweight in-process counters and timings for the bridge.
+"""
+
+import time
+from collections import defaultdict
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.timings = {}  # name -> {"count", "total", "min", "max"}
+        self.started_at = time.time()
+        self._last_reported = None
+
+    def incr(self, name, value=1):
+        """Increment a counter."""
+        self.counters[name] += value
+
+    def observe(self, name, value):
+        """Record one sample of a timing or size."""
+        stat = self.timings.get(name)
+        if stat is None:
+            self.timings[name] = {"count": 1, "total": value, "min": value, "max": value}
+            return
+        stat["count"] += 1
+        stat["total"] += value
+        if value < stat["min"]:
+            stat["min"] = value
+        if value > stat["max"]:
+            stat["max"] = value
+
+    def snapshot(self):
+        """Return a plain-dict copy of all metrics."""
+        timings = {}
+        for name, stat in self.timings.items():
+            timings[name] = dict(stat, avg=stat["total"] / stat["count"])
+        return {
+            "uptime": round(time.time() - self.started_at),
+            "counters": dict(self.counters),
+            "timings": timings
+        }
+
+    def format_summary(self):
+        """Format metrics as printable lines, or None if nothing changed since the last call."""
+        state = (tuple(sorted(self.counters.items())), sum(s["count"] for s in self.timings.values()))
+        if state == self._last_reported:
+            return None
+        self._last_reported = state
+
+        lines = []
+        for name in sorted(self.counters):
+            value = self.counters[name]
+            lines.append(f"  {name}: {value:g}")
+        for name in sorted(self.timings):
+            stat = self.timings[name]
+            avg = stat["total"] / stat["count"]
+            lines.append(f"  {name}: n={stat['count']} avg={avg:.3f} min={stat['min']:.3f} max={stat['max']:.3f}")
+        return "\n".join(lines)
+
+
+# Shared instance used by all bridge modules
+metrics = Metrics()
@@ -0,0 +1,248 @@
+"""
+GMod AI Assistant - Mock Provider
+Offline stand-in for an OpenAI-compatible API (PROVIDER = "mock"). It picks a
+tool from keywords in the player's message and generates arguments from the
+tool schema it was sent. It makes the mistakes small local models make
+(broken JSON, wrong types, missing arguments) at a fixed rate in every
+decoding mode: it accepts strict tools and json_schema response formats but
+does not enforce them, so it cannot show how much a real backend's
+constrained decoding prevents.
+
+Run this file to check how the bridge handles those mistakes in each mode
+(retries, envelope fallback).
+"""
+
+import asyncio
+import random
+import uuid
+from types import SimpleNamespace
+import codec
+
+MALFORMED_RATE = 0.12  # Calls whose arguments are not valid JSON
+INVALID_RATE = 0.10  # Calls that are valid JSON but break the schema
+
+# Phrase -> tool used to pick a call for a player message (first match wins)
+KEYWORDS = [
+    ("zombie", "spawn_npc"), ("npc", "spawn_npc"), ("combine", "spawn_npc"),
+    ("barrel", "spawn_prop"), ("prop", "spawn_prop"), ("car", "spawn_vehicle"), ("jeep", "spawn_vehicle"),
+    ("weapon", "give_weapon"), ("gun", "give_weapon"), ("rpg", "give_weapon"),
+    ("teleport", "teleport_player"), ("health", "set_player_health"), ("armor", "set_player_armor"),
+    ("gravity", "set_gravity"), ("explode", "explode"), ("color", "set_entity_color"),
+    ("who", "get_server_info"), ("around", "get_entities_nearby"),
+]
+
+
+def _ns(**kwargs):
+    return SimpleNamespace(**kwargs)
+
+
+class _Stream:
+    """Async iterator of chunks, shaped like the openai stream object."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+class MockCompletions:
+    def __init__(self, seed=None, delay=0.0):
+        self.rng = random.Random(seed)
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        response_format = params.get("response_format") or {}
+        json_schema = response_format.get("json_schema", {})
+        if json_schema.get("name") == "companion_tick":
+            content, tool_calls = codec.dumps_text(self._companion_commands(json_schema["schema"])), []
+        elif response_format.get("type") == "json_schema":
+            text, tool_calls = self._decide(params)
+            # Spliced in as generated, so broken arguments break the whole envelope
+            content = '{"reply": %s, "tool_calls": [%s]}' % (codec.dumps_text(text), ", ".join(
+                '{"name": %s, "arguments": %s}' % (codec.dumps_text(name), args) for name, args in tool_calls
+            ))
+            tool_calls = []
+        else:
+            content, tool_calls = self._decide(params)
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in params.get("messages", [])) // 4
+        usage = _ns(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4 + 10,
+                    total_tokens=prompt_tokens + len(content) // 4 + 10)
+        calls = [
+            _ns(index=i, id=f"call_{uuid.uuid4().hex[:24]}", function=_ns(name=name, arguments=args))
+            for i, (name, args) in enumerate(tool_calls)
+        ]
+
+        if params.get("stream"):
+            chunks = [_ns(choices=[_ns(delta=_ns(content=content or None, tool_calls=calls or None))], usage=None)]
+            chunks.append(_ns(choices=[], usage=usage))
+            return _Stream(chunks)
+        message = _ns(content=content or None, tool_calls=calls or None)
+        return _ns(choices=[_ns(message=message)], usage=usage)
+
+    def _decide(self, params):
+        """Return (text, [(tool_name, arguments_json)]) for the conversation so far."""
+        messages = params.get("messages", [])
+        last = messages[-1] if messages else {}
+        tools = {tool["function"]["name"]: tool["function"] for tool in params.get("tools") or []}
+        schema = (params.get("response_format") or {}).get("json_schema", {}).get("schema")
+        if schema is not None:
+            for option in schema["properties"]["tool_calls"]["items"]["anyOf"]:
+                name = option["properties"]["name"]["enum"][0]
+                tools[name] = {"name": name, "parameters": option["properties"]["arguments"]}
+
+        if last.get("role") == "tool":
+            # Retry a rejected call; otherwise confirm
+            if "not valid JSON" in last["content"] or "Invalid arguments" in last["content"]:
+                name = last.get("name")
+                return "", [(name, self._arguments(tools[name]))]
+            return "Done!", []
+
+        text = str(last.get("content") or "").rsplit("[Player Message]\n", 1)[-1].lower()
+        for phrase, name in KEYWORDS:
+            if phrase in text and name in tools:
+                return "", [(name, self._arguments(tools[name]))]
+        return "Hi! What should I do?", []
+
+    def _companion_commands(self, schema):
+        """One command per companion id the AI Live tick schema allows."""
+        ids = schema["properties"]["commands"]["items"]["properties"]["id"]["enum"]
+        commands = []
+        for companion_id in ids:
+            action = self.rng.choice(["none", "none", "follow", "attack", "say"])
+            commands.append({
+                "id": companion_id,
+                "action": action,
+                "target": 500 if action == "attack" else None,
+                "say": "On it!" if action == "say" else None,
+            })
+        return {"commands": commands}
+
+    def _arguments(self, function):
+        """Arguments JSON for one call, with the error rates applied."""
+        parameters = function.get("parameters", {})
+        args = {
+            name: self._value(schema)
+            for name, schema in parameters.get("properties", {}).items()
+            if name in parameters.get("required", ()) or self.rng.random() < 0.5
+        }
+        roll = self.rng.random()
+        if roll < MALFORMED_RATE:
+            text = codec.dumps_text(args)
+            return self.rng.choice([text[:-1], text.replace('"', "'"), text[:-1] + ",}"])
+        if roll < MALFORMED_RATE + INVALID_RATE:
+            args = self._break(parameters, args)
+        return codec.dumps_text(args)
+
+    def _value(self, schema):
+        kind = schema.get("type")
+        if isinstance(kind, list):
+            kind = kind[0]  # Nullable strict-mode type; always generate a real value
+        if "enum" in schema:
+            return self.rng.choice([v for v in schema["enum"] if v is not None])
+        if kind == "integer":
+            return self.rng.randint(schema.get("minimum", 1), schema.get("maximum", 10))
+        if kind == "number":
+            return round(self.rng.uniform(schema.get("minimum", 0), schema.get("maximum", 10)), 2)
+        if kind == "boolean":
+            return self.rng.random() < 0.5
+        if kind == "object":
+            return {}
+        if "JSON object" in schema.get("description", ""):
+            return "{}"  # Free-form object sent as a string in strict mode
+        return "sample"
+
+    def _break(self, parameters, args):
+        """Make one schema violation a model could plausibly produce."""
+        properties = parameters.get("properties", {})
+        required = [name for name in parameters.get("required", ()) if name in args]
+        numeric = [name for name, schema in properties.items() if "maximum" in schema]
+        if numeric and self.rng.random() < 0.5:
+            name = self.rng.choice(numeric)
+            return dict(args, **{name: properties[name]["maximum"] * 10})
+        if required:
+            args = dict(args)
+            del args[self.rng.choice(required)]
+            return args
+        return dict(args, **{name: [] for name in list(properties)[:1]})
+
+
+class MockClient:
+    """Drop-in for AsyncOpenAI: client.chat.completions.create(**params)."""
+
+    def __init__(self, seed=None, delay=0.0):
+        self.chat = _ns(completions=MockCompletions(seed, delay))
+
+
+async def _compare(turns=400):
+    """Run the same player messages through the mock in each decoding mode and count retries."""
+    import providers
+    from lm_client import LMStudioClient
+    from metrics import metrics
+    from validation import validate_tool_call
+
+    messages = [f"{verb} {thing}" for verb in ("spawn", "please spawn a", "give me a", "can you")
+                for thing in ("zombie", "barrel", "jeep", "rpg", "combine", "prop")]
+    messages += ["teleport me", "set my health", "more armor", "low gravity", "explode it", "who is on"]
+
+    print(f"{turns} turns per mode, mock error rates in every mode: "
+          f"malformed {MALFORMED_RATE:.0%}, invalid {INVALID_RATE:.0%}")
+    print(f"  {'mode':14} {'malformed':>9} {'invalid':>8} {'retried':>8} {'retry rate':>10} {'calls/turn':>10}")
+    providers.CONSTRAINED_DECODING = True  # Compare the modes even where config leaves it off
+    for mode in (None, "strict_tools", "json_schema"):
+        providers.CAPABILITIES["mock"] = {"constrained": mode}
+        client = LMStudioClient(provider="mock")
+        client.client = MockClient(seed=1)
+        invalid = retried = 0
+        malformed_before = metrics.snapshot()["counters"].get("tool_args.malformed", 0)
+
+        for i in range(turns):
+            player_id = f"p{i}"
+            result = await client.chat({"player": {"steamid": player_id}, "text": messages[i % len(messages)]})
+            needed_retry = False
+            for _ in range(3):  # The model gets three attempts to fix a call
+                if result.get("type") != "tool_calls":
+                    break
+                errors = 0
+                for tc in result["tool_calls"]:
+                    if tc.get("malformed"):
+                        error = "Arguments were not valid JSON."
+                    else:
+                        _, _, error = validate_tool_call(tc["name"], tc["arguments"])
+                        invalid += error is not None
+                    errors += error is not None
+                    client.add_tool_result(player_id, tc["id"], tc["name"],
+                                           {"success": False, "error": error} if error else {"success": True})
+                if not errors:
+                    break
+                needed_retry = True
+                result = await client.continue_after_tools(player_id)
+            retried += needed_retry
+            client.clear_conversation(player_id)
+
+        calls = client.client.chat.completions.calls
+        # Broken envelopes are shown as text rather than retried, so they are counted here
+        malformed = int(metrics.snapshot()["counters"].get("tool_args.malformed", 0) - malformed_before)
+        print(f"  {str(mode):14} {malformed:9} {invalid:8} {retried:8} {retried / turns:10.1%} {calls / turns:10.2f}")
+
+
+if __name__ == "__main__":
+    # Retry-rate comparison: python mock_provider.py [turns]
+    import sys
+    import config
+
+    config.DEBUG = False  # Modules imported by _compare read DEBUG at import time
+    asyncio.run(_compare(int(sys.argv[1]) if len(sys.argv) > 1 else 400))
@@ -0,0 +1,192 @@
+"""
+GMod AI Assistant - Mock Redis
+In-process stand-in for a Redis-protocol server, implementing only the
+commands RedisStore sends (plus DEBUG SLEEP to hold a reply back), including
+WATCH/MULTI/EXEC transactions. It lets
+the Redis session store be tested without a Redis install: store.py's
+self-check runs against it, and several bridge processes can share one with
+SESSION_STORE = "redis" pointed at it.
+
+Run this file to serve one on SESSION_STORE_URL's port.
+"""
+
+import asyncio
+import time
+
+
+# Commands that change their first key (DEL changes all of its keys), for WATCH
+WRITES = {"SET", "GETDEL", "DEL", "EXPIRE", "HSET", "HINCRBY", "SADD", "SREM"}
+
+
+class StandInError(Exception):
+    """Sent back to the client as a RESP error reply."""
+
+
+def _encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class MockRedis:
+    def __init__(self):
+        self.data = {}  # key -> bytes, dict (hash) or set
+        self.expires = {}  # key -> time.monotonic() deadline
+        self.versions = {}  # key -> number of writes, to detect changes to WATCHed keys
+
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _pop(self, key):
+        self.expires.pop(key, None)
+        return self.data.pop(key, None)
+
+    def _typed(self, key, kind):
+        value = self._live(key)
+        if value is None:
+            value = self.data[key] = kind()
+        elif not isinstance(value, kind):
+            raise StandInError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    async def run(self, name, *args):
+        """Run one command and return its reply value."""
+        name = name.decode().upper()
+        if name in WRITES:
+            for key in args if name == "DEL" else args[:1]:
+                self.versions[key] = self.versions.get(key, 0) + 1
+        if name in ("AUTH", "SELECT", "PING"):
+            return "OK" if name != "PING" else "PONG"
+        if name == "DEBUG" and args and args[0].upper() == b"SLEEP":
+            await asyncio.sleep(float(args[1]))
+            return "OK"
+        if name == "GET":
+            return self._live(args[0])
+        if name == "SET":
+            self._pop(args[0])
+            self.data[args[0]] = args[1]
+            options = [arg.upper() for arg in args[2:]]
+            if b"EX" in options:
+                self.expires[args[0]] = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            return "OK"
+        if name == "GETDEL":
+            value = self._live(args[0])
+            self._pop(args[0])
+            return value
+        if name == "DEL":
+            return sum(1 for key in args if self._live(key) is not None and self._pop(key) is not None)
+        if name == "EXPIRE":
+            if self._live(args[0]) is None:
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return 1
+        if name == "HSET":
+            fields = self._typed(args[0], dict)
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in fields
+                fields[field] = value
+            return added
+        if name == "HINCRBY":
+            fields = self._typed(args[0], dict)
+            value = int(fields.get(args[1], b"0")) + int(args[2])
+            fields[args[1]] = str(value).encode()
+            return value
+        if name == "HGETALL":
+            fields = self._live(args[0]) or {}
+            return [item for pair in fields.items() for item in pair]
+        if name == "SADD":
+            members = self._typed(args[0], set)
+            added = len(set(args[1:]) - members)
+            members.update(args[1:])
+            return added
+        if name == "SREM":
+            members = self._live(args[0]) or set()
+            removed = len(members & set(args[1:]))
+            members.difference_update(args[1:])
+            return removed
+        if name == "SMEMBERS":
+            return sorted(self._live(args[0]) or ())
+        raise StandInError(f"ERR unknown command '{name}'")
+
+    async def transact(self, client, name, *args):
+        """Run one command for a client, queueing it if the client is inside MULTI."""
+        command = name.upper()
+        if command == b"WATCH":
+            client["watched"].update((key, self.versions.get(key, 0)) for key in args)
+            return "OK"
+        if command == b"UNWATCH":
+            client["watched"].clear()
+            return "OK"
+        if command == b"MULTI":
+            client["queued"] = []
+            return "OK"
+        if command == b"EXEC":
+            queued, client["queued"] = client["queued"], None
+            if queued is None:
+                raise StandInError("ERR EXEC without MULTI")
+            changed = any(self.versions.get(key, 0) != version for key, version in client["watched"].items())
+            client["watched"].clear()
+            if changed:
+                return None  # Aborted: a WATCHed key was written by someone else
+            return [await self.run(*queued_args) for queued_args in queued]
+        if client["queued"] is not None:
+            client["queued"].append((name,) + args)
+            return "QUEUED"
+        return await self.run(name, *args)
+
+    async def handle(self, reader, writer):
+        """Serve one client connection."""
+        client = {"watched": {}, "queued": None}  # WATCHed key -> version, and commands queued by MULTI
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                try:
+                    reply = _encode(await self.transact(client, *args))
+                except StandInError as e:
+                    reply = b"-%s\r\n" % str(e).encode()
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Client gone, or the stand-in is shutting down
+        finally:
+            writer.close()
+
+
+async def serve(host="localhost", port=0):
+    """Start a stand-in server; port 0 picks a free one. Returns (server, port)."""
+    server = await asyncio.start_server(MockRedis().handle, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+if __name__ == "__main__":
+    # Shared stand-in for several bridge processes: python mock_redis.py
+    from urllib.parse import urlparse
+    from config import SESSION_STORE_URL
+
+    async def main():
+        url = urlparse(SESSION_STORE_URL)
+        server, port = await serve(url.hostname or "localhost", url.port or 6379)
+        print(f"[MockRedis] Listening on port {port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
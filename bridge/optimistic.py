@@ -0,0 +1,45 @@
+"""
+GMod AI Assistant - Optimistic Continuation
+For fire-and-forget tools (OPTIMISTIC_TOOLS in tools.py) the bridge does not
+wait for GMod before asking the model for its follow-up answer: it assumes
+the tools succeeded and generates the answer while the game runs them. The
+text is held back until the real results arrive. If they all succeeded the
+answer is kept (with the real results put into the history) and the player
+gets it without waiting for a second generation; if one failed the answer is
+thrown away and generated again from the real results.
+"""
+
+import time
+from config import OPTIMISTIC_CONTINUATION
+from tools import OPTIMISTIC_TOOLS
+
+# What the model is told about a tool that has been sent to GMod but not answered yet
+PROVISIONAL_OUTCOME = {"success": True, "result": {"message": "Done"}}
+
+
+def eligible(tool_calls):
+    """Whether a batch of calls waiting for GMod may be continued optimistically."""
+    return bool(OPTIMISTIC_CONTINUATION and tool_calls
+                and all(tool_call["name"] in OPTIMISTIC_TOOLS for tool_call in tool_calls))
+
+
+class Speculation:
+    """A follow-up answer generated before GMod answered the tool calls of one message."""
+
+    def __init__(self, message_id, conversation_id, provisional):
+        self.message_id = message_id
+        self.conversation_id = conversation_id
+        self.provisional = provisional  # Tool call ids answered with PROVISIONAL_OUTCOME
+        self.task = None  # Generation task; returns (result, messages, escalated)
+        self.held = []  # Streamed text not shown to the player yet
+        self.live = False  # Once kept, new text streams straight to the player
+        self.started = time.monotonic()
+        self.finished_at = None
+
+    def failed_tools(self, outcomes):
+        """Provisional calls whose real outcome (tool call id -> outcome) was a failure."""
+        return [tool_call_id for tool_call_id in self.provisional if not outcomes[tool_call_id].get("success")]
+
+    def latency_saved(self, results_at):
+        """Seconds of generation that overlapped with the game running the tools."""
+        return max(0.0, min(results_at, self.finished_at or results_at) - self.started)
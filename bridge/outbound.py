@@ -0,0 +1,124 @@
+"""
+GMod AI Assistant - Outbound Frame Queue
+One writer task per GMod connection drains a bounded priority queue, so a
+slow socket only stalls its own queue and urgent frames (tool calls,
+cancellations, errors) overtake long answers being streamed.
+
+Stream chunks never wait for space: chunks of the same message that are
+still queued are merged into one frame (text joined, chat lines appended,
+the first chunk's offset kept). Before any other frame of a message
+is queued, that message's pending stream text is queued just ahead of it,
+so players never see a message end before its text.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import websockets
+import codec
+from config import OUTBOUND_QUEUE_SIZE, DEBUG
+from metrics import metrics
+
+# Lower is sent first
+PRIORITIES = {
+    "tool_call": 0,
+    "cancelled": 0,
+    "error": 0,
+    "mcp_tool_result": 0,
+    "mcp_servers": 0,
+    "world_state_resync": 0,
+    "response_stream": 2,
+}
+DEFAULT_PRIORITY = 1  # thinking, response, response_end, reports
+
+
+class OutboundQueue:
+    def __init__(self, websocket, send_frame, maxsize=OUTBOUND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.send_frame = send_frame
+        self.maxsize = maxsize
+        self.heap = []  # (priority, seq, queued_at, kind, payload)
+        self.seq = itertools.count()
+        self.streams = {}  # message_id -> (first frame, [chunks], [chat lines]) not yet sent
+        self.changed = asyncio.Condition()
+        self.closed = False
+
+    def _push(self, priority, kind, payload):
+        heapq.heappush(self.heap, (priority, next(self.seq), time.monotonic(), kind, payload))
+        metrics.observe("outbound.queue_depth", len(self.heap))
+
+    async def put(self, data, frame=None):
+        """Queue one frame (data, optionally already encoded). Waits while the queue is full."""
+        if self.closed:
+            return
+        kind = data.get("type")
+        message_id = data.get("message_id")
+
+        async with self.changed:
+            if kind == "response_stream":
+                pending = self.streams.get(message_id)
+                if pending is None:
+                    self.streams[message_id] = (data, [data.get("chunk", "")], list(data.get("segments", ())))
+                    self._push(PRIORITIES[kind], "stream", message_id)
+                else:
+                    pending[1].append(data.get("chunk", ""))
+                    pending[2].extend(data.get("segments", ()))
+                    metrics.incr("outbound.chunks_merged")
+                self.changed.notify_all()
+                return
+
+            if len(self.heap) >= self.maxsize:
+                metrics.incr("outbound.backpressure_waits")
+                await self.changed.wait_for(lambda: len(self.heap) < self.maxsize or self.closed)
+                if self.closed:
+                    return
+
+            priority = PRIORITIES.get(kind, DEFAULT_PRIORITY)
+            if message_id in self.streams:
+                # Keep the message's pending text ahead of this frame
+                self._push(priority, "stream", message_id)
+            self._push(priority, "frame", frame if frame is not None else codec.dumps(data))
+            self.changed.notify_all()
+
+    async def run(self):
+        """Writer loop; returns once the queue is closed or the socket closes."""
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.heap or self.closed)
+                if not self.heap:
+                    return
+                _, _, queued_at, kind, payload = heapq.heappop(self.heap)
+                self.changed.notify_all()  # Space for waiting producers
+
+            if kind == "stream":
+                pending = self.streams.pop(payload, None)
+                if pending is None:
+                    continue  # Already sent ahead of a later frame
+                first, chunks, segments = pending
+                frame = dict(first, chunk="".join(chunks))
+                if segments:
+                    frame["segments"] = segments
+                payload = codec.dumps(frame)
+
+            started = time.monotonic()
+            metrics.observe("outbound.queue_wait", started - queued_at)
+            try:
+                await self.send_frame(self.websocket, payload)
+            except websockets.exceptions.ConnectionClosed:
+                await self.close()
+                return
+            except Exception as e:
+                print(f"[Bridge] Send error: {e}")
+                continue
+            metrics.observe("outbound.send_latency", time.monotonic() - started)
+
+    async def close(self):
+        """Stop accepting frames; the writer drops whatever is still queued."""
+        async with self.changed:
+            self.closed = True
+            if DEBUG and self.heap:
+                print(f"[Bridge] Dropping {len(self.heap)} queued frames for a closed connection")
+            self.heap.clear()
+            self.streams.clear()
+            self.changed.notify_all()
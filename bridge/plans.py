@@ -0,0 +1,254 @@
+"""
+GMod AI Assistant - Plan and Execute
+A request like "spawn 5 combine, make my companion attack them, then set
+timescale to 0.5" used to cost one provider request per step of the chain:
+the model called a tool, waited for the result, then called the next one.
+With PLAN_MODE_ENABLED the model can call the bridge-local run_plan tool
+once with every step and their dependencies (a small DAG). The bridge runs
+the steps against GMod, independent ones in parallel and dependent ones in
+order, and hands the model one report for the final summary. If a step
+fails, the steps depending on it are skipped and the report says so, so the
+model can fix the plan in that same follow-up request.
+"""
+
+import asyncio
+import re
+import time
+import codec
+from config import PLAN_MAX_STEPS, DEBUG
+from metrics import metrics
+from result_policy import compact_result
+from tools import GMOD_TOOLS, PLAN_TOOL
+from validation import validate_tool_call
+
+PLAN_TOOL_NAME = PLAN_TOOL["function"]["name"]
+STEP_TOOLS = {tool["function"]["name"] for tool in GMOD_TOOLS}
+# "$<step id>.<field>.<field>..." pulls a value out of an earlier step's result
+REFERENCE = re.compile(r"^\$([\w-]+)((?:\.[\w-]+)*)$")
+
+
+def _references(value):
+    """Step ids referenced anywhere in an argument value."""
+    if isinstance(value, str):
+        match = REFERENCE.match(value)
+        return {match.group(1)} if match else set()
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return set().union(*(_references(item) for item in value)) if value else set()
+    return set()
+
+
+def _lookup(result, path):
+    """Follow a dotted path (dict keys or list indexes) into a step result."""
+    for key in path:
+        if isinstance(result, list) and key.isdigit() and int(key) < len(result):
+            result = result[int(key)]
+        elif isinstance(result, dict) and key in result:
+            result = result[key]
+        else:
+            raise KeyError(key)
+    return result
+
+
+def _decode(value, expected):
+    """Arguments and step lists may arrive JSON-encoded (strict mode sends free-form objects as strings)."""
+    if isinstance(value, str):
+        try:
+            value = codec.loads(value)
+        except codec.DecodeError:
+            return None
+    return value if isinstance(value, expected) else None
+
+
+class Plan:
+    """A validated run_plan call and the outcome of each of its steps."""
+
+    def __init__(self, steps):
+        self.steps = steps  # step id -> {"tool", "arguments", "after"}, in the model's order
+        self.outcomes = {}  # step id -> {"success", "result"} or {"success": False, "skipped": reason}
+
+    @classmethod
+    def parse(cls, arguments):
+        """Build a plan from run_plan arguments. Returns (plan, error); error is None for a plan that may run."""
+        items = _decode((arguments or {}).get("steps"), list)
+        if not items:
+            return None, "run_plan needs a non-empty list of steps."
+        if len(items) > PLAN_MAX_STEPS:
+            return None, (f"The plan has {len(items)} steps, at most {PLAN_MAX_STEPS} are allowed. "
+                          "Run the first part now and the rest afterwards.")
+
+        steps = {}
+        for i, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                return None, f"Step {i} of the plan is not an object."
+            step_id = str(item.get("id") or i)
+            if step_id in steps:
+                return None, f"Two steps have the id '{step_id}'. Give every step its own id."
+            tool = item.get("tool")
+            if tool not in STEP_TOOLS:
+                return None, f"Step '{step_id}' uses unknown tool '{tool}'."
+            args = _decode(item.get("arguments") or {}, dict)
+            if args is None:
+                return None, f"Arguments of step '{step_id}' must be a JSON object."
+            # Literal arguments are checked now, so a bad step rejects the plan before any step runs;
+            # references to earlier results are checked when the step is sent
+            deferred = {key for key, value in args.items() if _references(value)}
+            literal, _, error = validate_tool_call(tool, {k: v for k, v in args.items() if k not in deferred}, deferred)
+            if error:
+                return None, f"Step '{step_id}': {error}"
+            args = dict(literal, **{key: args[key] for key in deferred})
+            after = item.get("after") or []
+            if not isinstance(after, list):
+                after = [after]
+            steps[step_id] = {"tool": tool, "arguments": args,
+                              "after": sorted({str(dep) for dep in after} | _references(args))}
+
+        for step_id, step in steps.items():
+            for dep in step["after"]:
+                if dep == step_id or dep not in steps:
+                    return None, f"Step '{step_id}' waits for unknown step '{dep}'."
+        plan = cls(steps)
+        if plan.depth() is None:
+            return None, "The plan's steps wait for each other in a cycle, so none of them could run."
+        return plan, None
+
+    def depth(self):
+        """Number of steps on the longest dependency chain, or None if the steps form a cycle."""
+        levels = {}
+        remaining = dict(self.steps)
+        while remaining:
+            ready = [step_id for step_id, step in remaining.items() if all(dep in levels for dep in step["after"])]
+            if not ready:
+                return None
+            for step_id in ready:
+                levels[step_id] = 1 + max((levels[dep] for dep in remaining[step_id]["after"]), default=0)
+                del remaining[step_id]
+        return max(levels.values())
+
+    def succeeded(self):
+        """Whether every step ran and succeeded."""
+        return all(self.outcomes.get(step_id, {}).get("success") for step_id in self.steps)
+
+    def resolve(self, value):
+        """Replace references to earlier results in a step's arguments; raises KeyError for a missing field."""
+        if isinstance(value, str):
+            match = REFERENCE.match(value)
+            if not match:
+                return value
+            step_id, path = match.group(1), match.group(2)
+            return _lookup(self.outcomes[step_id].get("result"), path.split(".")[1:])
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    async def run(self, call):
+        """
+        Run every step as soon as the steps it waits for are done. call(tool,
+        arguments) runs one tool and returns (success, result). Returns the
+        report given to the model as the result of the run_plan call.
+        """
+        started = time.monotonic()
+        tasks = {}
+
+        async def run_step(step_id):
+            step = self.steps[step_id]
+            if step["after"]:
+                await asyncio.gather(*(tasks[dep] for dep in step["after"]))
+            failed = [dep for dep in step["after"] if not self.outcomes[dep].get("success")]
+            if failed:
+                self.outcomes[step_id] = {"success": False, "skipped": f"step '{failed[0]}' did not succeed"}
+                return
+            try:
+                arguments = self.resolve(step["arguments"])
+            except KeyError as e:
+                self.outcomes[step_id] = {"success": False, "result": f"Reference to missing field {e} of an earlier step"}
+                return
+            success, result = await call(step["tool"], arguments)
+            self.outcomes[step_id] = {"success": bool(success), "result": result}
+            if DEBUG:
+                print(f"[Plans] Step {step_id} {step['tool']}: {'ok' if success else 'failed'}")
+
+        # The step coroutines only start at the first await, after every task exists
+        for step_id in self.steps:
+            tasks[step_id] = asyncio.ensure_future(run_step(step_id))
+        try:
+            await asyncio.gather(*tasks.values())
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        report = self.report()
+        latency = time.monotonic() - started
+        depth = self.depth()
+        metrics.incr("plans.runs")
+        metrics.incr("plans.steps", len(self.steps))
+        metrics.observe("plans.latency", latency)
+        metrics.observe("plans.depth", depth)
+        if self.succeeded():
+            # Without a plan every level of the chain costs one more provider request
+            metrics.incr("plans.requests_saved_est", depth - 1)
+        else:
+            metrics.incr("plans.failed")
+        if DEBUG:
+            print(f"[Plans] {len(self.steps)} steps ({depth} deep) in {latency:.2f}s: "
+                  f"{report['succeeded']} ok, {report['failed']} failed, {report['skipped']} skipped")
+        return report
+
+    def report(self):
+        """Every step's outcome, in the model's order, with results compacted like normal tool results."""
+        steps = []
+        for step_id, step in self.steps.items():
+            outcome = self.outcomes.get(step_id, {"success": False, "skipped": "not run"})
+            line = {"id": step_id, "tool": step["tool"], "success": outcome["success"]}
+            if "skipped" in outcome:
+                line["skipped"] = outcome["skipped"]
+            elif outcome["success"]:
+                line["result"] = compact_result(step["tool"], outcome["result"])
+            else:
+                line["error"] = outcome["result"]
+            steps.append(line)
+        failed = sum(1 for line in steps if not line["success"] and "skipped" not in line)
+        skipped = sum(1 for line in steps if "skipped" in line)
+        return {"steps": steps, "succeeded": len(steps) - failed - skipped, "failed": failed, "skipped": skipped}
+
+
+if __name__ == "__main__":
+    # Run the example chain against a fake GMod that takes 0.2s per tool: python plans.py
+    import config
+
+    DEBUG = config.DEBUG = False
+    LATENCY = 0.2
+    example = {"steps": [
+        {"id": "1", "tool": "spawn_npc", "arguments": {"npc_type": "combine", "count": 5, "weapon": "ar2"}},
+        {"id": "2", "tool": "ai_live_attack", "arguments": {"entity_id": "$1.entity_ids.0"}},
+        {"id": "3", "tool": "set_timescale", "arguments": {"scale": 0.5}, "after": ["2"]},
+        {"id": "4", "tool": "set_gravity", "arguments": {"gravity": "300"}},
+    ]}
+
+    async def fake_gmod(tool, arguments):
+        await asyncio.sleep(LATENCY)
+        if tool == "spawn_npc":
+            return True, {"count": arguments["count"], "entity_ids": [101, 102, 103, 104, 105]}
+        return True, {"message": f"{tool} done", "arguments": arguments}
+
+    async def run():
+        plan, error = Plan.parse(example)
+        assert error is None, error
+        report = await plan.run(fake_gmod)
+        for line in report["steps"]:
+            print(f"  {line}")
+        print(f"{len(plan.steps)} steps, {plan.depth()} deep: GMod time {plan.depth() * LATENCY:.1f}s "
+              f"instead of {len(plan.steps) * LATENCY:.1f}s, 2 provider requests instead of {plan.depth() + 1}")
+        for bad in ({"steps": []},
+                    {"steps": [{"id": "a", "tool": "spawn_npc", "arguments": {"npc_type": "zombie"}, "after": ["b"]},
+                               {"id": "b", "tool": "spawn_npc", "arguments": {"npc_type": "zombie"}, "after": ["a"]}]},
+                    {"steps": [{"id": "a", "tool": "spawn_zombie", "arguments": {}}]},
+                    {"steps": [{"id": "a", "tool": "spawn_npc", "arguments": {"npc_type": "zombie"}},
+                               {"id": "b", "tool": "set_timescale", "arguments": {"scale": "fast"}, "after": ["a"]}]}):
+            print(f"rejected: {Plan.parse(bad)[1]}")
+
+    asyncio.run(run())
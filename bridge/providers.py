@@ -0,0 +1,166 @@
+"""
+GMod AI Assistant - Provider Capabilities
+What each provider backend supports beyond the plain OpenAI chat API, and the
+request changes that use it. With constrained decoding the backend can only
+emit tool calls that match the schemas in GMOD_TOOLS, so arguments are valid
+JSON by construction instead of being repaired or retried afterwards.
+
+Constrained decoding modes:
+  "strict_tools": tools are sent with "strict": true and strict-compatible
+                  schemas (every property required, optional ones nullable)
+  "json_schema":  for servers that constrain response_format but not tool
+                  calls (Ollama, LM Studio). The model answers with a JSON
+                  envelope {"reply", "tool_calls"} that is converted back into
+                  ordinary tool calls. Replies are not streamed in this mode.
+
+"reasoning_effort": True for providers that accept reasoning_effort and
+max_completion_tokens, which ADAPTIVE_REASONING sets per request.
+"""
+
+import uuid
+from openai import AsyncOpenAI
+import codec
+from config import CONSTRAINED_DECODING, PROVIDER_CAPABILITIES
+
+# Only providers that constrain tool calls natively are on by default. The
+# json_schema envelope gives up streaming and native tool calls, so Ollama and
+# LM Studio users opt in with PROVIDER_CAPABILITIES
+CAPABILITIES = {
+    # "keepalive": unloads idle models, so the warmer pings it while GMod is connected
+    "ollama": {"constrained": None, "keepalive": True},  # Supports "json_schema"
+    "lmstudio": {"constrained": None, "keepalive": True},  # Supports "json_schema"
+    "cerebras": {"constrained": "strict_tools", "reasoning_effort": True},
+    "openai_compatible": {"constrained": None},  # Depends on the server; set in PROVIDER_CAPABILITIES
+    "mock": {"constrained": "strict_tools", "reasoning_effort": True},
+}
+
+ENVELOPE_INSTRUCTIONS = """
+
+RESPONSE FORMAT:
+Answer with one JSON object: {"reply": "<text for the player>", "tool_calls": [{"name": "<tool>", "arguments": {...}}]}.
+Use an empty tool_calls list when no tool is needed. The available tools are:
+"""
+
+
+def capabilities(provider):
+    """Capabilities of a provider, with PROVIDER_CAPABILITIES overrides applied."""
+    return dict(CAPABILITIES.get(provider, {}), **PROVIDER_CAPABILITIES.get(provider, {}))
+
+
+def constrained_mode(provider):
+    """The constrained decoding mode to use for a provider, or None."""
+    if not CONSTRAINED_DECODING:
+        return None
+    return capabilities(provider).get("constrained")
+
+
+def create_client(provider, provider_config):
+    """Create the API client for a provider."""
+    if provider == "mock":
+        from mock_provider import MockClient
+        return MockClient()
+    return AsyncOpenAI(base_url=provider_config["base_url"], api_key=provider_config["api_key"])
+
+
+def _strict_schema(schema, required):
+    """Rewrite one property schema for strict mode; optional properties become nullable."""
+    out = {key: value for key, value in schema.items() if key != "properties"}
+    if schema.get("type") == "object" and "properties" not in schema:
+        # Free-form key/value objects can't be expressed in strict mode; validation decodes the string
+        out["type"] = "string"
+        out["description"] = schema.get("description", "") + " (JSON object encoded as a string)"
+    elif schema.get("type") == "object":
+        out.update(strict_parameters(schema))
+    elif schema.get("type") == "array" and isinstance(schema.get("items"), dict):
+        out["items"] = _strict_schema(schema["items"], True)
+    if not required:
+        out["type"] = [out["type"], "null"]
+        if "enum" in out:
+            out["enum"] = out["enum"] + [None]
+    return out
+
+
+def strict_parameters(parameters):
+    """Strict-mode version of a tool's parameter schema."""
+    properties = parameters.get("properties", {})
+    required = set(parameters.get("required", ()))
+    return {
+        "type": "object",
+        "properties": {name: _strict_schema(schema, name in required) for name, schema in properties.items()},
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+def strict_tools(tools):
+    """Tool definitions with "strict": true and strict-compatible schemas."""
+    return [
+        {
+            "type": "function",
+            "function": dict(
+                tool["function"],
+                parameters=strict_parameters(tool["function"].get("parameters", {})),
+                strict=True
+            )
+        }
+        for tool in tools
+    ]
+
+
+def envelope_format(tools):
+    """response_format whose schema only admits a reply plus calls to known tools with valid arguments."""
+    calls = [
+        {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "enum": [tool["function"]["name"]]},
+                "arguments": strict_parameters(tool["function"].get("parameters", {}))
+            },
+            "required": ["name", "arguments"],
+            "additionalProperties": False
+        }
+        for tool in tools
+    ]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "gmod_turn",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "reply": {"type": "string"},
+                    "tool_calls": {"type": "array", "items": {"anyOf": calls}}
+                },
+                "required": ["reply", "tool_calls"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def envelope_instructions(tools):
+    """System prompt addition describing the envelope and the tools (they are not sent as tools)."""
+    lines = [f"- {tool['function']['name']}: {tool['function'].get('description', '')}" for tool in tools]
+    return ENVELOPE_INSTRUCTIONS + "\n".join(lines)
+
+
+def parse_envelope(content):
+    """
+    Convert an envelope answer into (reply, tool_calls) in the client's usual shape.
+    Raises codec.DecodeError if the content is not a JSON object.
+    """
+    data = codec.loads(content or "{}")
+    if not isinstance(data, dict):
+        raise codec.DecodeError("envelope is not an object", content or "", 0)
+    tool_calls = []
+    for call in data.get("tool_calls") or []:
+        if not isinstance(call, dict):
+            continue
+        arguments = call.get("arguments")
+        tool_calls.append({
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "name": call.get("name", ""),
+            "arguments": arguments if isinstance(arguments, dict) else {}
+        })
+    return data.get("reply") or "", tool_calls
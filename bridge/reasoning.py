@@ -0,0 +1,71 @@
+"""
+GMod AI Assistant - Adaptive Reasoning Effort
+Classifies each request as trivial, normal or complex from the player's
+message and how deep into a tool chain the turn is, so reasoning models
+spend little effort on "spawn a barrel" and full effort on multi-step plans.
+The class picks a profile from REASONING_PROFILES.
+"""
+
+import re
+from cascade import needs_large_model, last_tools_failed
+
+TRIVIAL_MAX_WORDS = 8
+COMPLEX_MIN_WORDS = 30
+COMPLEX_CHAIN_DEPTH = 2  # Tool rounds already run in this turn
+
+# Several actions in one message ("spawn x and give me y")
+ACTION_VERBS = re.compile(
+    r"\b(spawn|give|make|set|teleport|build|attack|follow|kill|remove|create|put|turn|change|go)\b",
+    re.IGNORECASE
+)
+
+
+def turn_state(conversation):
+    """Return (player text, tool rounds run so far) for the turn at the end of the history."""
+    depth = 0
+    for message in reversed(conversation):
+        role = message.get("role")
+        if role == "assistant" and message.get("tool_calls"):
+            depth += 1
+        elif role == "user":
+            return (message.get("content") or "").rsplit("[Player Message]\n", 1)[-1], depth
+    return "", depth
+
+
+def classify(conversation):
+    """Return "trivial", "normal" or "complex" for the next completion of a conversation."""
+    text, depth = turn_state(conversation)
+    words = len(text.split())
+    actions = len(ACTION_VERBS.findall(text))
+
+    if depth >= COMPLEX_CHAIN_DEPTH or words >= COMPLEX_MIN_WORDS or needs_large_model(text) or actions > 2:
+        return "complex"
+    if depth and last_tools_failed(conversation):
+        return "normal"  # Needs to work out what went wrong
+    if depth == 1 and actions <= 1:
+        return "trivial"  # Confirming a single action
+    if depth == 0 and words <= TRIVIAL_MAX_WORDS and actions <= 1:
+        return "trivial"
+    return "normal"
+
+
+if __name__ == "__main__":
+    # Show how sample requests are classed: python reasoning.py
+    samples = [
+        "hi",
+        "spawn a barrel",
+        "noclip",
+        "spawn 5 zombies and give me a shotgun",
+        "build me a fort and have my companion defend it",
+        "spawn 5 combine, give them ar2s, make my companion attack them, then set timescale to 0.5",
+    ]
+    for text in samples:
+        print(f"{classify([{'role': 'user', 'content': text}]):8} {text}")
+    chain = [
+        {"role": "user", "content": "spawn a barrel"},
+        {"role": "assistant", "tool_calls": [{}]},
+        {"role": "tool", "content": '{"success":true}'},
+    ]
+    print(f"{classify(chain):8} (confirming one successful tool)")
+    chain[-1] = {"role": "tool", "content": '{"success":false,"error":"bad model"}'}
+    print(f"{classify(chain):8} (after a failed tool)")
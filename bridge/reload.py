@@ -0,0 +1,64 @@
+"""
+GMod AI Assistant - Hot Reload
+Re-reads config.py and tools.py while the bridge keeps running. Modules
+without long-lived state are reloaded; modules holding state (the running
+bridge, store, scheduler, usage ledger, metrics) are kept, and the names
+they imported from reloaded modules are pointed at the new objects.
+"""
+
+import importlib
+import os
+import runpy
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Reloaded in this order, so each module imports already-reloaded dependencies
+RELOADED = [
+    "config", "tools", "validation", "result_policy", "cascade", "reasoning",
+    "providers", "mock_provider", "warmup", "sanitizer", "streaming", "companions", "optimistic", "confirmations",
+    "plans", "catalog",
+    "lm_client", "tool_cache", "sessions", "mcp_server",
+]
+
+# Modules whose objects live on; only their imported names are updated
+REBOUND = ["world_state", "scheduler", "usage", "store", "bridge_server", "__main__"]
+
+
+class ReloadError(Exception):
+    """The new configuration could not be loaded; nothing was changed."""
+
+
+def check_config():
+    """Execute the new config.py and tools.py in a scratch namespace, so a broken edit is caught before any swap."""
+    try:
+        new_config = runpy.run_path(os.path.join(HERE, "config.py"))
+        new_config["get_provider_config"]()
+        runpy.run_path(os.path.join(HERE, "tools.py"))
+    except Exception as e:
+        raise ReloadError(f"{type(e).__name__}: {e}") from e
+
+
+def reload_modules():
+    """Reload the stateless modules and rebind names imported from them. Returns the list of reloaded names."""
+    check_config()
+    before = {name: dict(vars(sys.modules[name])) for name in RELOADED if name in sys.modules}
+
+    reloaded = []
+    for name in RELOADED:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+            reloaded.append(name)
+
+    # "from config import X" copied the old object into the importer; swap in the new one
+    for target_name in REBOUND:
+        target = sys.modules.get(target_name)
+        if target is None or (target_name == "__main__" and not hasattr(target, "BridgeServer")):
+            continue
+        namespace = vars(target)
+        for name, value in list(namespace.items()):
+            for source_name, old in before.items():
+                if name in old and old[name] is value:
+                    namespace[name] = getattr(sys.modules[source_name], name)
+                    break
+    return reloaded
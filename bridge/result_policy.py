@@ -0,0 +1,154 @@
+"""
+GMod AI Assistant - Tool Result Policies
+Compacts tool results before they enter conversation history, using the
+declarative per-tool policies in TOOL_RESULT_POLICIES. Every later request
+resends the history, so bytes saved here are saved on every turn after it.
+
+Policy keys (all optional):
+  "drop":       top-level keys to remove
+  "sort":       {list_key: field} sort a list ascending by field ("-field" for descending)
+  "top_k":      {list_key: k} keep the first k items, adding "<list_key>_omitted": n
+  "fields":     {list_key: [fields]} keep only these fields of each item
+  "round":      decimals to round floats to (0 turns them into ints)
+  "max_tokens": hard cap; the longest list is halved until the result fits,
+                then the text is cut as a last resort
+"""
+
+import codec
+from config import TOOL_RESULT_POLICIES, DEBUG
+from metrics import metrics
+
+CHARS_PER_TOKEN = 4  # Same estimate LMStudioClient uses
+
+
+def policy_for(tool_name):
+    """Merge the tool's policy over the "*" default."""
+    default = TOOL_RESULT_POLICIES.get("*", {})
+    specific = TOOL_RESULT_POLICIES.get(tool_name)
+    if specific is None:
+        return default
+    return dict(default, **specific)
+
+
+def _round(value, digits):
+    if isinstance(value, float):
+        return int(round(value)) if digits == 0 else round(value, digits)
+    if isinstance(value, dict):
+        return {k: _round(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round(v, digits) for v in value]
+    return value
+
+
+def _sort_key(field):
+    def key(item):
+        value = item.get(field) if isinstance(item, dict) else None
+        return (value is None, value if value is not None else 0)
+    return key
+
+
+def _compact(policy, data):
+    """Return a compacted copy of a result dict (the input is never modified)."""
+    drop = policy.get("drop", ())
+    sort = policy.get("sort", {})
+    top_k = policy.get("top_k", {})
+    fields = policy.get("fields", {})
+
+    out = {}
+    for key, value in data.items():
+        if key in drop:
+            continue
+        if isinstance(value, list):
+            if key in sort:
+                field = sort[key]
+                descending = field.startswith("-")
+                value = sorted(value, key=_sort_key(field.lstrip("-")), reverse=descending)
+            k = top_k.get(key)
+            if k is not None and len(value) > k:
+                out[f"{key}_omitted"] = len(value) - k
+                value = value[:k]
+            keep = fields.get(key)
+            if keep:
+                value = [
+                    {f: item[f] for f in keep if f in item} if isinstance(item, dict) else item
+                    for item in value
+                ]
+        out[key] = value
+
+    if "round" in policy:
+        out = _round(out, policy["round"])
+    return out
+
+
+def _fit(data, max_chars):
+    """Halve the longest list until the encoded result fits, or nothing is left to shrink."""
+    while len(codec.dumps_text(data)) > max_chars:
+        lists = [(len(v), k) for k, v in data.items() if isinstance(v, list) and len(v) > 1]
+        if not lists:
+            break
+        size, key = max(lists)
+        keep = size // 2
+        data = dict(data, **{key: data[key][:keep]})
+        data[f"{key}_omitted"] = data.get(f"{key}_omitted", 0) + size - keep
+    return data
+
+
+def compact_result(tool_name, data):
+    """Apply a tool's list and rounding rules to one result dict (e.g. a step nested in a plan report)."""
+    policy = policy_for(tool_name)
+    return _compact(policy, data) if policy and isinstance(data, dict) else data
+
+
+def compact_tool_result(tool_name, result):
+    """Apply the tool's size policy and return the text to store in history."""
+    raw = codec.dumps_text(result)
+    policy = policy_for(tool_name)
+    if not policy:
+        return raw
+    max_tokens = policy.get("max_tokens")
+
+    # Results arrive wrapped as {"success": ..., "result": <tool output>}
+    wrapped = isinstance(result, dict) and isinstance(result.get("result"), dict)
+    data = result["result"] if wrapped else result
+    if isinstance(data, dict):
+        data = _compact(policy, data)
+        if max_tokens:
+            overhead = len(codec.dumps_text(dict(result, result={}))) - 2 if wrapped else 0
+            data = _fit(data, max_tokens * CHARS_PER_TOKEN - overhead)
+    if wrapped:
+        data = dict(result, result=data)
+    text = codec.dumps_text(data)
+
+    if max_tokens and len(text) > max_tokens * CHARS_PER_TOKEN:
+        text = text[:max_tokens * CHARS_PER_TOKEN] + "...(truncated)"
+        metrics.incr(f"tool_result.truncated.{tool_name}")
+
+    saved = len(raw) - len(text)
+    if saved > 0:
+        metrics.incr(f"tool_result.bytes_saved.{tool_name}", saved)
+        metrics.incr(f"tool_result.tokens_saved.{tool_name}", saved // CHARS_PER_TOKEN)
+        if DEBUG:
+            print(f"[Policy] {tool_name}: {len(raw)} -> {len(text)} bytes")
+    return text
+
+
+if __name__ == "__main__":
+    # Show what the policies do to sample results: python result_policy.py
+    nearby = {
+        "success": True,
+        "entities": [
+            {"id": i, "class": "prop_physics", "model": "models/props_c17/oildrum001.mdl",
+             "distance": 480 - i * 20, "is_npc": False, "is_player": False}
+            for i in range(20)
+        ],
+        "count": 20
+    }
+    classes = {"success": True, "entity_classes": [{"class": f"class_{i}", "count": 100 - i} for i in range(30)]}
+    player = {"success": True, "name": "Player", "position": {"x": 1024.3712, "y": -512.9051, "z": 64.03125}}
+
+    for tool, output in (("get_entities_nearby", nearby), ("get_map_entities", classes), ("get_player_info", player)):
+        wrapped = {"success": True, "result": output}
+        before = len(codec.dumps_text(wrapped))
+        after = compact_tool_result(tool, wrapped)
+        print(f"{tool}: {before} -> {len(after)} bytes")
+        print(f"  {after[:300]}")
@@ -0,0 +1,177 @@
+"""
+GMod AI Assistant - Admission Scheduler
+Global concurrency cap in front of the AI provider, with priority classes,
+per-player fair queuing and fast "busy" rejection when the queue is too long.
+Requests can belong to a group (a GMod server) with its own concurrency
+limit; a full group only holds back its own requests.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from config import SCHEDULER_MAX_CONCURRENCY, SCHEDULER_QUEUE_SLO, SCHEDULER_PRIORITIES, DEBUG
+from metrics import metrics
+
+
+class ServerBusy(Exception):
+    """Raised when a request would wait longer than the queue SLO."""
+
+    def __init__(self, expected_wait):
+        super().__init__(f"AI is busy (expected wait {expected_wait:.1f}s)")
+        self.expected_wait = expected_wait
+
+
+class AdmissionScheduler:
+    def __init__(self, max_concurrency=SCHEDULER_MAX_CONCURRENCY, queue_slo=SCHEDULER_QUEUE_SLO):
+        self.max_concurrency = max_concurrency
+        self.queue_slo = queue_slo
+        self.running = 0
+        self.group_running = {}  # group -> requests holding a slot
+        self.group_limits = {}  # group -> its concurrency limit
+        # priority -> OrderedDict(player_id -> deque of (future, group)); players are served round-robin
+        self.queues = {}
+        self.avg_service_time = 3.0  # seconds, exponentially weighted
+
+    @staticmethod
+    def priority_for(is_admin, continuation):
+        """Map a request to its priority class (lower is served first)."""
+        if is_admin:
+            return SCHEDULER_PRIORITIES["admin"]
+        if continuation:
+            return SCHEDULER_PRIORITIES["continuation"]
+        return SCHEDULER_PRIORITIES["first_turn"]
+
+    def waiting(self, up_to_priority=None):
+        """Number of queued requests, optionally only those at or above a priority."""
+        return sum(
+            len(dq)
+            for priority, players in self.queues.items()
+            if up_to_priority is None or priority <= up_to_priority
+            for dq in players.values()
+        )
+
+    def _group_full(self, group):
+        return group is not None and self.group_running.get(group, 0) >= self.group_limits.get(group, 1)
+
+    def _group_waiting(self, group):
+        return sum(1 for players in self.queues.values() for dq in players.values()
+                   for _, waiter_group in dq if waiter_group == group)
+
+    def predict_wait(self, priority, group=None):
+        """Estimate how long a new request of this priority (and group) would queue."""
+        ahead = self.waiting(priority)
+        expected = (ahead + 1) / self.max_concurrency * self.avg_service_time
+        if self._group_full(group):
+            # Every earlier request of the group has to go first, whatever its priority
+            group_ahead = self._group_waiting(group)
+            expected = max(expected, (group_ahead + 1) / self.group_limits[group] * self.avg_service_time)
+        return expected
+
+    async def acquire(self, player_id, priority, group=None, group_limit=None):
+        """Wait for a provider slot. Raises ServerBusy instead of queueing past the SLO."""
+        if group is not None:
+            self.group_limits[group] = group_limit or 1
+        if self.running < self.max_concurrency and not self._group_full(group) and self._peek_waiter() is None:
+            self._admit(group)
+            metrics.observe(f"scheduler.wait.p{priority}", 0.0)
+            return
+
+        expected = self.predict_wait(priority, group)
+        if expected > self.queue_slo:
+            metrics.incr("scheduler.rejected")
+            if DEBUG:
+                print(f"[Scheduler] Rejecting {player_id} (priority {priority}), expected wait {expected:.1f}s")
+            raise ServerBusy(expected)
+
+        future = asyncio.get_running_loop().create_future()
+        players = self.queues.setdefault(priority, OrderedDict())
+        players.setdefault(player_id, deque()).append((future, group))
+        enqueued_at = time.monotonic()
+
+        try:
+            await asyncio.wait_for(future, self.queue_slo)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up - pass it on
+                self.release(group=group)
+            else:
+                self._remove(priority, player_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr("scheduler.timed_out")
+                raise ServerBusy(self.queue_slo)
+            raise
+
+        metrics.observe(f"scheduler.wait.p{priority}", time.monotonic() - enqueued_at)
+
+    def release(self, service_time=None, group=None):
+        """Free a slot and hand it to the next waiter."""
+        self.running -= 1
+        if group is not None:
+            self.group_running[group] -= 1
+            if not self.group_running[group]:
+                del self.group_running[group]
+        if service_time is not None:
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+
+        while self.running < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            future, waiter_group = waiter
+            if future.done():
+                continue
+            self._admit(waiter_group)
+            future.set_result(None)
+
+    def _admit(self, group):
+        self.running += 1
+        if group is not None:
+            self.group_running[group] = self.group_running.get(group, 0) + 1
+
+    def _peek_waiter(self):
+        """Where the next waiter is queued, as (priority, player_id), or None if no waiter can run now."""
+        for priority in sorted(self.queues):
+            for player_id, dq in self.queues[priority].items():
+                # A player's requests all come from one server, so the first one decides
+                if not self._group_full(dq[0][1]):
+                    return priority, player_id
+        return None
+
+    def _next_waiter(self):
+        """
+        Pop the next waiter: highest priority first, round-robin across players
+        within a class, skipping players whose group is at its limit.
+        """
+        found = self._peek_waiter()
+        if found is None:
+            return None
+        priority, player_id = found
+        players = self.queues[priority]
+        dq = players[player_id]
+        waiter = dq.popleft()
+        if dq:
+            players.move_to_end(player_id)
+        else:
+            del players[player_id]
+        return waiter
+
+    def _remove(self, priority, player_id, future):
+        players = self.queues.get(priority)
+        dq = players.get(player_id) if players else None
+        waiter = next((waiter for waiter in dq if waiter[0] is future), None) if dq else None
+        if waiter:
+            dq.remove(waiter)
+            if not dq:
+                del players[player_id]
+
+    @asynccontextmanager
+    async def slot(self, player_id, priority, group=None, group_limit=None):
+        """Hold a provider slot (and one of the group's) for the duration of the block."""
+        await self.acquire(player_id, priority, group, group_limit)
+        started = time.monotonic()
+        metrics.incr("scheduler.admitted")
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started, group)
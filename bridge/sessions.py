@@ -0,0 +1,46 @@
+"""
+GMod AI Assistant - Server Sessions
+One ServerSession per connected GMod server, so a single bridge can host a
+whole fleet: conversations, world state, provider overrides and concurrency
+limits are all kept per server.
+"""
+
+from catalog import base_catalog
+from config import SERVER_MAX_CONCURRENCY, SERVER_OVERRIDES
+from world_state import WorldState
+
+
+class ServerSession:
+    def __init__(self, server_id, websocket, lm_client):
+        self.server_id = server_id
+        self.websocket = websocket  # None while the server is disconnected
+        self.lm_client = lm_client
+        self.info = {}
+        self.world = WorldState()
+        self.assets = None  # Installed models and classes the server sent with its handshake
+        self.catalog = base_catalog()  # CATALOG_FILE, plus the server's assets once they arrive
+
+        overrides = SERVER_OVERRIDES.get(server_id, {})
+        self.max_concurrency = overrides.get("max_concurrency", SERVER_MAX_CONCURRENCY)  # Enforced by the scheduler
+
+    @property
+    def connected(self):
+        return self.websocket is not None
+
+    def conversation_id(self, player_id):
+        """History key for a player on this server (steamids are only unique per server here)."""
+        return f"{self.server_id}:{player_id}"
+
+
+def server_id_from_handshake(data, websocket):
+    """Pick a stable id for a GMod server from its handshake."""
+    return data.get("server_id") or data.get("address") or data.get("server_name") or f"conn-{id(websocket)}"
+
+
+def client_overrides(server_id):
+    """Return the provider/model/system_prompt overrides for a server, or None if it uses the defaults."""
+    overrides = SERVER_OVERRIDES.get(server_id, {})
+    keys = ("provider", "model", "system_prompt")
+    if not any(key in overrides for key in keys):
+        return None
+    return {key: overrides.get(key) for key in keys}
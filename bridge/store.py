@@ -0,0 +1,455 @@
+"""
+GMod AI Assistant - Session Store
+Pluggable storage for the state a bridge process needs to resume a turn:
+conversation histories, pending tool calls and server info. MemoryStore keeps
+it in-process; RedisStore keeps it in a Redis-protocol server so several
+bridge processes can serve the same GMod fleet and a tool result can land on
+any of them.
+"""
+
+import abc
+import asyncio
+from urllib.parse import urlparse
+import codec
+from config import SESSION_STORE, SESSION_STORE_URL, SESSION_STORE_PREFIX, SESSION_TTL, DEBUG
+
+
+class StoreError(Exception):
+    """Raised when the session store backend fails or replies with an error."""
+
+
+# Tries before update_conversation gives up on a conversation other bridges keep writing
+CONVERSATION_UPDATE_ATTEMPTS = 5
+
+
+class SessionStore(abc.ABC):
+    """
+    Interface shared by all backends. Everything stored must be plain JSON data.
+
+    Pending tool calls are registered per (server_id, message_id) batch. Results
+    are collected in the store, and only the call that resolves the last
+    outstanding entry gets the whole batch back, so exactly one node continues
+    the conversation.
+    """
+
+    @abc.abstractmethod
+    async def load_conversation(self, conversation_id):
+        """Return the stored message list, or None if there is none."""
+        ...
+
+    @abc.abstractmethod
+    async def save_conversation(self, conversation_id, messages):
+        ...
+
+    @abc.abstractmethod
+    async def update_conversation(self, conversation_id, update):
+        """
+        Replace a conversation with update(stored messages or None) as one atomic
+        step, so a write by another bridge in between is never lost: update is
+        called again with the newer list instead. Returns the list saved.
+        """
+        ...
+
+    @abc.abstractmethod
+    async def delete_conversation(self, conversation_id):
+        ...
+
+    @abc.abstractmethod
+    async def save_server_info(self, server_id, info):
+        ...
+
+    @abc.abstractmethod
+    async def load_server_info(self, server_id):
+        ...
+
+    @abc.abstractmethod
+    async def add_tool_calls(self, server_id, message_id, entries):
+        """Register a batch of pending tool calls (each entry has a "tool_call" with an "id")."""
+        ...
+
+    @abc.abstractmethod
+    async def pending_tool_calls(self, server_id, message_id):
+        """Return the ids of the calls still outstanding for a message."""
+        ...
+
+    @abc.abstractmethod
+    async def get_tool_call(self, tool_call_id):
+        """Return a pending entry without resolving it, or None."""
+        ...
+
+    @abc.abstractmethod
+    async def resolve_tool_call(self, tool_call_id, outcome):
+        """
+        Record the outcome of a pending call.
+        Returns None if the call is unknown (late result or cancelled), else
+        (entry, completed) where completed is a list of (entry, outcome) in call
+        order once this was the last outstanding call, or None if others remain.
+        """
+        ...
+
+    @abc.abstractmethod
+    async def drop_tool_calls(self, server_id, message_id):
+        """
+        Forget a message's batch. Returns (entry, outcome) for every call in
+        call order; outcome is None for calls that were still outstanding.
+        """
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryStore(SessionStore):
+    def __init__(self):
+        self.conversations = {}
+        self.server_info = {}
+        self.calls = {}    # tool_call_id -> entry
+        self.batches = {}  # (server_id, message_id) -> {"ids": set, "results": {index: (entry, outcome)}, "size": n}
+
+    async def load_conversation(self, conversation_id):
+        return self.conversations.get(conversation_id)
+
+    async def save_conversation(self, conversation_id, messages):
+        self.conversations[conversation_id] = messages
+
+    async def update_conversation(self, conversation_id, update):
+        messages = self.conversations[conversation_id] = update(self.conversations.get(conversation_id))
+        return messages
+
+    async def delete_conversation(self, conversation_id):
+        self.conversations.pop(conversation_id, None)
+
+    async def save_server_info(self, server_id, info):
+        self.server_info[server_id] = info
+
+    async def load_server_info(self, server_id):
+        return self.server_info.get(server_id)
+
+    async def add_tool_calls(self, server_id, message_id, entries):
+        batch = {"ids": set(), "results": {}, "size": len(entries)}
+        for index, entry in enumerate(entries):
+            tool_call_id = entry["tool_call"]["id"]
+            self.calls[tool_call_id] = dict(entry, index=index)
+            batch["ids"].add(tool_call_id)
+        self.batches[(server_id, message_id)] = batch
+
+    async def pending_tool_calls(self, server_id, message_id):
+        batch = self.batches.get((server_id, message_id))
+        return sorted(batch["ids"]) if batch else []
+
+    async def get_tool_call(self, tool_call_id):
+        return self.calls.get(tool_call_id)
+
+    async def resolve_tool_call(self, tool_call_id, outcome):
+        entry = self.calls.pop(tool_call_id, None)
+        if entry is None:
+            return None
+        key = (entry["server_id"], entry["message_id"])
+        batch = self.batches.get(key)
+        if batch is None:
+            return None
+        batch["ids"].discard(tool_call_id)
+        batch["results"][entry["index"]] = (entry, outcome)
+        if batch["ids"]:
+            return entry, None
+        del self.batches[key]
+        return entry, [batch["results"][i] for i in sorted(batch["results"])]
+
+    async def drop_tool_calls(self, server_id, message_id):
+        batch = self.batches.pop((server_id, message_id), None)
+        if not batch:
+            return []
+        results = dict(batch["results"])
+        for tool_call_id in batch["ids"]:
+            entry = self.calls.pop(tool_call_id, None)
+            if entry is not None:
+                results[entry["index"]] = (entry, None)
+        return [results[i] for i in sorted(results)]
+
+
+class RedisStore(SessionStore):
+    """
+    Session store on a Redis-protocol server (Redis, Valkey, KeyDB, ...).
+    Speaks RESP directly over one connection, so no client library is needed.
+
+    Keys (all under SESSION_STORE_PREFIX):
+      conv:<conversation_id>          JSON message list
+      server:<server_id>              JSON server info
+      call:<tool_call_id>             JSON pending entry (claimed with GETDEL)
+      batch:<server_id>:<message_id>  hash: "remaining" counter + one result field per call index
+      ids:<server_id>:<message_id>    set of outstanding tool call ids
+    """
+
+    def __init__(self, url=SESSION_STORE_URL, prefix=SESSION_STORE_PREFIX, ttl=SESSION_TTL):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.ttl = ttl
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + tuple(str(p) for p in parts))
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._command("AUTH", self.password)
+        if self.db:
+            await self._command("SELECT", self.db)
+        if DEBUG:
+            print(f"[Store] Connected to {self.host}:{self.port}/{self.db}")
+
+    async def _command(self, *args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._writer.write(b"".join(out))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("session store closed the connection")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise StoreError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = await self._reader.readexactly(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise StoreError(f"unexpected reply: {line!r}")
+
+    async def execute(self, *args):
+        """Run one command, reconnecting once if the connection dropped."""
+        return await self._exclusive(lambda: self._command(*args))
+
+    async def _exclusive(self, commands):
+        """Run commands() with the connection to itself, reconnecting once if it dropped."""
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await commands()
+                except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+                    self._disconnect()
+                    if attempt:
+                        raise StoreError(f"session store unavailable: {e}") from e
+                except BaseException:
+                    # Cancelled (or failed) between sending a command and reading its
+                    # whole reply: the next command would read this one's reply
+                    self._disconnect()
+                    raise
+
+    def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _get_json(self, key):
+        value = await self.execute("GET", key)
+        return codec.loads(value) if value is not None else None
+
+    async def _set_json(self, key, value):
+        await self.execute("SET", key, codec.dumps(value), "EX", self.ttl)
+
+    async def load_conversation(self, conversation_id):
+        return await self._get_json(self._key("conv", conversation_id))
+
+    async def save_conversation(self, conversation_id, messages):
+        await self._set_json(self._key("conv", conversation_id), messages)
+
+    async def update_conversation(self, conversation_id, update):
+        key = self._key("conv", conversation_id)
+
+        async def watched_update():
+            # WATCH makes EXEC fail if another client writes the key after the GET
+            await self._command("WATCH", key)
+            value = await self._command("GET", key)
+            messages = update(codec.loads(value) if value is not None else None)
+            await self._command("MULTI")
+            await self._command("SET", key, codec.dumps(messages), "EX", self.ttl)
+            return messages if await self._command("EXEC") is not None else None
+
+        for _ in range(CONVERSATION_UPDATE_ATTEMPTS):
+            messages = await self._exclusive(watched_update)
+            if messages is not None:
+                return messages
+        raise StoreError(f"conversation {conversation_id} kept changing during the update")
+
+    async def delete_conversation(self, conversation_id):
+        await self.execute("DEL", self._key("conv", conversation_id))
+
+    async def save_server_info(self, server_id, info):
+        await self._set_json(self._key("server", server_id), info)
+
+    async def load_server_info(self, server_id):
+        return await self._get_json(self._key("server", server_id))
+
+    async def add_tool_calls(self, server_id, message_id, entries):
+        batch_key = self._key("batch", server_id, message_id)
+        ids_key = self._key("ids", server_id, message_id)
+        await self.execute("DEL", batch_key, ids_key)
+        await self.execute("HSET", batch_key, "remaining", len(entries))
+        await self.execute("EXPIRE", batch_key, self.ttl)
+        for index, entry in enumerate(entries):
+            tool_call_id = entry["tool_call"]["id"]
+            await self._set_json(self._key("call", tool_call_id), dict(entry, index=index))
+            await self.execute("SADD", ids_key, tool_call_id)
+        await self.execute("EXPIRE", ids_key, self.ttl)
+
+    async def pending_tool_calls(self, server_id, message_id):
+        ids = await self.execute("SMEMBERS", self._key("ids", server_id, message_id))
+        return sorted(i.decode() for i in ids or [])
+
+    async def get_tool_call(self, tool_call_id):
+        return await self._get_json(self._key("call", tool_call_id))
+
+    async def resolve_tool_call(self, tool_call_id, outcome):
+        # GETDEL claims the call atomically, so a duplicate result on another node is ignored
+        value = await self.execute("GETDEL", self._key("call", tool_call_id))
+        if value is None:
+            return None
+        entry = codec.loads(value)
+        batch_key = self._key("batch", entry["server_id"], entry["message_id"])
+        await self.execute("SREM", self._key("ids", entry["server_id"], entry["message_id"]), tool_call_id)
+        await self.execute("HSET", batch_key, entry["index"], codec.dumps([entry, outcome]))
+        # HINCRBY is atomic: exactly one node sees the batch reach zero
+        remaining = await self.execute("HINCRBY", batch_key, "remaining", -1)
+        if remaining > 0:
+            return entry, None
+
+        fields = await self.execute("HGETALL", batch_key)
+        await self.execute("DEL", batch_key)
+        results = {}
+        for name, value in zip(fields[::2], fields[1::2]):
+            if name != b"remaining":
+                results[int(name)] = tuple(codec.loads(value))
+        return entry, [results[i] for i in sorted(results)]
+
+    async def drop_tool_calls(self, server_id, message_id):
+        ids_key = self._key("ids", server_id, message_id)
+        batch_key = self._key("batch", server_id, message_id)
+        results = {}
+        for tool_call_id in await self.execute("SMEMBERS", ids_key) or []:
+            value = await self.execute("GETDEL", self._key("call", tool_call_id.decode()))
+            if value is not None:
+                entry = codec.loads(value)
+                results[entry["index"]] = (entry, None)
+        fields = await self.execute("HGETALL", batch_key) or []
+        for name, value in zip(fields[::2], fields[1::2]):
+            if name != b"remaining":
+                results[int(name)] = tuple(codec.loads(value))
+        await self.execute("DEL", ids_key, batch_key)
+        return [results[i] for i in sorted(results)]
+
+    async def close(self):
+        self._disconnect()
+
+
+def create_store(kind=SESSION_STORE):
+    """Build the session store selected in config."""
+    if kind == "memory":
+        return MemoryStore()
+    if kind == "redis":
+        return RedisStore()
+    raise ValueError(f"Unknown SESSION_STORE: {kind}")
+
+
+if __name__ == "__main__":
+    # Self-check of the configured backend, and of RedisStore against mock_redis: python store.py
+    import mock_redis
+
+    async def check(store, name):
+        await store.save_conversation("check:1", [{"role": "user", "content": "hi"}])
+        assert (await store.load_conversation("check:1"))[0]["content"] == "hi"
+        # Another bridge saving between the read and the write makes the update start over
+        raced = [{"role": "user", "content": "hi"}, {"role": "user", "content": "again"}]
+        if isinstance(store, RedisStore):
+            other = RedisStore(f"redis://{store.host}:{store.port}/{store.db}", store.prefix)
+            command = store._command
+
+            async def racing_command(*args):
+                if args[0] == "MULTI" and not seen[1:]:
+                    await other.save_conversation("check:1", raced)
+                return await command(*args)
+
+            store._command = racing_command
+        else:
+            other = None
+            await store.save_conversation("check:1", raced)
+        seen = []
+
+        def append(messages):
+            seen.append([m["content"] for m in messages])
+            return messages + [{"role": "assistant", "content": "hello"}]
+
+        result = await store.update_conversation("check:1", append)
+        if other is not None:
+            await other.close()
+            del store._command
+            assert seen == [["hi"], ["hi", "again"]], seen
+        assert [m["content"] for m in result] == ["hi", "again", "hello"], result
+        assert await store.load_conversation("check:1") == result
+        await store.delete_conversation("check:1")
+
+        def entries(message_id):
+            return [
+                {"server_id": "check", "message_id": message_id, "tool_call": {"id": f"c{i}", "name": "noclip"}}
+                for i in range(3)
+            ]
+
+        await store.add_tool_calls("check", "m1", entries("m1"))
+        assert await store.pending_tool_calls("check", "m1") == ["c0", "c1", "c2"]
+        assert (await store.resolve_tool_call("c1", {"success": True}))[1] is None
+        assert await store.resolve_tool_call("c1", {"success": True}) is None  # duplicate
+        assert (await store.resolve_tool_call("c2", {"success": True}))[1] is None
+        _, completed = await store.resolve_tool_call("c0", {"success": False})
+        assert [e["tool_call"]["id"] for e, _ in completed] == ["c0", "c1", "c2"]
+
+        await store.add_tool_calls("check", "m2", entries("m2"))
+        await store.resolve_tool_call("c1", {"success": True})
+        assert [o for _, o in await store.drop_tool_calls("check", "m2")] == [None, {"success": True}, None]
+        assert await store.resolve_tool_call("c0", {}) is None
+        await store.close()
+        print(f"[Store] {name} store OK")
+
+    async def check_cancel(store):
+        # A command cancelled before its reply arrives must not leave the reply for the next one
+        await store.execute("SET", "check:key", "value")
+        command = asyncio.ensure_future(store.execute("DEBUG", "SLEEP", "0.2"))
+        await asyncio.sleep(0.05)
+        command.cancel()
+        await asyncio.gather(command, return_exceptions=True)
+        assert await store.execute("GET", "check:key") == b"value"
+        await store.close()
+        print("[Store] redis store resyncs after a cancelled command")
+
+    async def main():
+        await check(create_store(), SESSION_STORE)
+        server, port = await mock_redis.serve()
+        async with server:
+            url = f"redis://localhost:{port}/0"
+            await check(RedisStore(url), "redis (mock_redis)")
+            await check_cancel(RedisStore(url))
+
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+GMod AI Assistant - Chat-Ready Streaming
+Turns a streamed answer into append-only frames for GMod. Each
+response_stream frame carries only the new text, its byte offset in the
+answer, and any chat lines that are now complete. GMod appends the text to
+its HUD preview and prints the lines as they are, instead of re-sending and
+re-splitting the whole answer every update.
+
+Chat lines are split the way AIAssistant.Chat.SplitMessage does: whole
+sentences packed up to CHAT_SEGMENT_BYTES, long sentences split on words,
+and words longer than a line cut (on a UTF-8 character boundary).
+"""
+
+import re
+from config import CHAT_SEGMENT_BYTES
+
+# A sentence is finished once its . ! or ? and the whitespace after it are followed by more text
+SENTENCE_END = re.compile(r"[.!?]+\s+(?=\S)")
+
+
+def _size(text):
+    return len(text.encode("utf-8"))
+
+
+class ChatSegmenter:
+    """Incremental splitter: feed() text as it arrives, finish() at the end. Both return finished lines."""
+
+    def __init__(self, limit=CHAT_SEGMENT_BYTES):
+        self.limit = limit
+        self.current = ""  # Whole sentences packed into the next line
+        self.pending = ""  # Text of the sentence still being written
+        self.trim = False  # Drop whitespace that follows a split on a space
+
+    def feed(self, text):
+        segments = []
+        self.pending += text
+        if self.trim:
+            self.pending = self.pending.lstrip()
+            self.trim = not self.pending
+        start = 0
+        for match in SENTENCE_END.finditer(self.pending):
+            self._add_sentence(self.pending[start:match.end()], segments)
+            start = match.end()
+        self.pending = self.pending[start:]
+
+        # The unfinished sentence can only grow, so stop waiting once it cannot fit
+        if self.current and _size(self.current) + _size(self.pending) > self.limit:
+            self._emit(self.current, segments)
+            self.current = ""
+        if not self.current:
+            self.pending = self._split_long(self.pending, segments, final=False)
+        return segments
+
+    def finish(self):
+        segments = []
+        if self.pending:
+            self._add_sentence(self.pending, segments)
+            self.pending = ""
+        self._emit(self.current, segments)
+        self.current = ""
+        return segments
+
+    def _add_sentence(self, sentence, segments):
+        if _size(self.current) + _size(sentence) <= self.limit:
+            self.current += sentence
+            return
+        self._emit(self.current, segments)
+        self.current = self._split_long(sentence, segments, final=True)
+
+    def _split_long(self, text, segments, final):
+        """Emit full lines from text longer than a line; returns the rest."""
+        while _size(text) > self.limit:
+            head = text.encode("utf-8")[:self.limit + 1].decode("utf-8", "ignore")
+            cut = max(head.rfind(" "), head.rfind("\n"))
+            if cut > 0:
+                self._emit(head[:cut], segments)
+                text = text[cut:].lstrip()
+                self.trim = not text
+            elif not final and " " not in text and "\n" not in text:
+                return text  # One long word still streaming; cut it once it ends
+            else:
+                head = text.encode("utf-8")[:self.limit].decode("utf-8", "ignore")
+                self._emit(head, segments)
+                text = text[len(head):]
+        return text
+
+    def _emit(self, text, segments):
+        text = text.strip()
+        if text:
+            segments.append(text)
+
+
+class ChatStream:
+    """Frames for one streamed answer (kept across tool rounds of the same message)."""
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+        self.offset = 0  # Bytes of answer text already sent
+        self.segmenter = ChatSegmenter()
+
+    def chunk_frame(self, chunk):
+        frame = {
+            "type": "response_stream",
+            "message_id": self.message_id,
+            "offset": self.offset,
+            "chunk": chunk,
+        }
+        segments = self.segmenter.feed(chunk)
+        if segments:
+            frame["segments"] = segments
+        self.offset += _size(chunk)
+        return frame
+
+    def end_frame(self):
+        return {
+            "type": "response_end",
+            "message_id": self.message_id,
+            "length": self.offset,
+            "segments": self.segmenter.finish(),
+        }
+
+
+def split_message(text, limit=CHAT_SEGMENT_BYTES):
+    """Chat lines for a complete answer."""
+    segmenter = ChatSegmenter(limit)
+    return segmenter.feed(text) + segmenter.finish()
+
+
+if __name__ == "__main__":
+    # Protocol self-check: python streaming.py
+    import random
+
+    rng = random.Random(44)
+    words = ["spawn", "zombies", "ok.", "Done!", "really?", "été", "\U0001F600", "a" * 300, "line\n"]
+    for _ in range(2000):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 120)))
+        limit = rng.choice([16, 60, CHAT_SEGMENT_BYTES])
+        whole = split_message(text, limit)
+
+        # Streamed in random pieces the lines must come out the same
+        stream, i, streamed = ChatStream("m"), 0, []
+        stream.segmenter.limit = limit
+        while i < len(text):
+            size = rng.randint(1, 12)
+            frame = stream.chunk_frame(text[i:i + size])
+            assert frame["offset"] == len(text[:i].encode("utf-8")), "offsets are byte positions"
+            streamed += frame.get("segments", [])
+            i += size
+        end = stream.end_frame()
+        streamed += end["segments"]
+        assert end["length"] == len(text.encode("utf-8"))
+
+        assert streamed == whole, (text, streamed, whole)
+        assert all(len(s.encode("utf-8")) <= limit for s in whole), "every line fits"
+        assert all(s == s.strip() and s for s in whole)
+        # Nothing is lost: lines rejoin to the text apart from whitespace
+        assert "".join(whole).replace(" ", "").replace("\n", "") == text.replace(" ", "").replace("\n", "")
+    print("segmenter: 2000 random answers OK")
+
+    sample = ("I spawned five zombies around you. They are hostile, so watch out! "
+              "Your companion is set to defend you and will follow you around the map. ") * 3
+    for line in split_message(sample):
+        print(f"{len(line.encode('utf-8')):3} | {line}")
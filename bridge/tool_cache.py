@@ -0,0 +1,92 @@
+"""
+GMod AI Assistant - Tool Result Cache
+Short-lived cache for read-only tool results, keyed by server, scope (player
+or whole server), tool and arguments. Mutating tools invalidate every entry
+for their server.
+"""
+
+import time
+from collections import defaultdict
+from config import TOOL_CACHE_ENABLED, TOOL_CACHE_TTL, TOOL_CACHE_TTLS, DEBUG
+from metrics import metrics
+from tools import READ_ONLY_TOOLS, SERVER_SCOPED_TOOLS
+
+SERVER_SCOPE = "*"
+PRUNE_ABOVE = 1024  # Drop expired entries once the cache holds this many
+
+
+class ToolCache:
+    def __init__(self, enabled=TOOL_CACHE_ENABLED, ttl=TOOL_CACHE_TTL, ttls=TOOL_CACHE_TTLS):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.ttls = ttls
+        self.entries = {}  # key -> (expires_at, result)
+        # (server_id, scope) -> generation; bumped on invalidation so results
+        # of reads sent before a mutation are not cached afterwards
+        self.generations = defaultdict(int)
+
+    @staticmethod
+    def _scope(server_id, tool, player_id):
+        return server_id, SERVER_SCOPE if tool in SERVER_SCOPED_TOOLS else player_id
+
+    def _key(self, server_id, tool, args, player_id):
+        return self._scope(server_id, tool, player_id) + (tool, repr(sorted((args or {}).items())))
+
+    def cacheable(self, tool):
+        return self.enabled and tool in READ_ONLY_TOOLS
+
+    @staticmethod
+    def mutates(tool):
+        return tool not in READ_ONLY_TOOLS
+
+    def generation(self, server_id, tool, player_id):
+        """Current generation of the tool's scope, recorded when a read is sent to GMod."""
+        return self.generations[self._scope(server_id, tool, player_id)]
+
+    def get(self, server_id, tool, args, player_id):
+        """Return a cached result, or None."""
+        if not self.cacheable(tool):
+            return None
+        key = self._key(server_id, tool, args, player_id)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.entries.pop(key, None)
+            metrics.incr("tool_cache.misses")
+            return None
+        metrics.incr("tool_cache.hits")
+        metrics.incr(f"tool_cache.hits.{tool}")
+        return entry[1]
+
+    def put(self, server_id, tool, args, player_id, result, generation):
+        """Cache a successful read, unless its scope was invalidated since it was sent."""
+        if not self.cacheable(tool) or generation != self.generation(server_id, tool, player_id):
+            return
+        now = time.monotonic()
+        if len(self.entries) >= PRUNE_ABOVE:
+            self.entries = {k: v for k, v in self.entries.items() if v[0] >= now}
+        ttl = self.ttls.get(tool, self.ttl)
+        self.entries[self._key(server_id, tool, args, player_id)] = (now + ttl, result)
+
+    def _drop(self, server_id):
+        # Every scope that handed out a generation on this server, so no read in flight gets cached
+        for scope in [scope for scope in self.generations if scope[0] == server_id]:
+            self.generations[scope] += 1
+        stale = [key for key in self.entries if key[0] == server_id]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def invalidate(self, server_id):
+        """Forget every player's entries and the server-wide ones after a mutating tool."""
+        if not self.enabled:
+            return
+        dropped = self._drop(server_id)
+        metrics.incr("tool_cache.invalidations")
+        if DEBUG and dropped:
+            print(f"[Cache] Invalidated {dropped} cached results on {server_id}")
+
+    def flush(self, server_id):
+        """Forget every cached result for a server (on request); returns how many were dropped."""
+        dropped = self._drop(server_id)
+        metrics.incr("tool_cache.flushes")
+        return dropped
@@ -46,6 +46,8 @@ GMOD_TOOLS = [
                     },
                     "count": {
                         "type": "integer",
+                        "minimum": 1,
+                        "maximum": 20,
                         "description": "Number of NPCs to spawn (1-20, default 1). Use this when player asks for multiple NPCs like 'spawn 10 zombies' or 'give me an army'."
                     },
                     "position": {
@@ -150,6 +152,8 @@ GMOD_TOOLS = [
                 "properties": {
                     "health": {
                         "type": "integer",
+                        "minimum": 0,
+                        "maximum": 1000,
                         "description": "Health value (0-1000)"
                     }
                 },
@@ -167,6 +171,8 @@ GMOD_TOOLS = [
                 "properties": {
                     "armor": {
                         "type": "integer",
+                        "minimum": 0,
+                        "maximum": 255,
                         "description": "Armor value (0-255)"
                     }
                 },
@@ -376,6 +382,8 @@ GMOD_TOOLS = [
                     },
                     "magnitude": {
                         "type": "integer",
+                        "minimum": 10,
+                        "maximum": 1000,
                         "description": "Explosion power (10-1000, default 100)"
                     }
                 }
@@ -524,10 +532,10 @@ GMOD_TOOLS = [
                         "type": "string",
                         "description": "Color name: red, green, blue, yellow, purple, orange, pink, white, black, invisible"
                     },
-                    "r": {"type": "integer", "description": "Red (0-255)"},
-                    "g": {"type": "integer", "description": "Green (0-255)"},
-                    "b": {"type": "integer", "description": "Blue (0-255)"},
-                    "a": {"type": "integer", "description": "Alpha/transparency (0-255)"}
+                    "r": {"type": "integer", "minimum": 0, "maximum": 255, "description": "Red (0-255)"},
+                    "g": {"type": "integer", "minimum": 0, "maximum": 255, "description": "Green (0-255)"},
+                    "b": {"type": "integer", "minimum": 0, "maximum": 255, "description": "Blue (0-255)"},
+                    "a": {"type": "integer", "minimum": 0, "maximum": 255, "description": "Alpha/transparency (0-255)"}
                 }
             }
         }
@@ -806,6 +814,8 @@ GMOD_TOOLS = [
                 "properties": {
                     "health": {
                         "type": "integer",
+                        "minimum": 1,
+                        "maximum": 1000,
                         "description": "Health value (1-1000)"
                     }
                 },
@@ -1155,6 +1165,106 @@ GMOD_TOOLS = [
 ]
 
 
+# Bridge-local tool (see plans.py): offered to the model with PLAN_MODE_ENABLED,
+# run by the bridge as a series of GMod tool calls and never sent to GMod itself
+PLAN_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "run_plan",
+        "description": "Run several tool calls as one plan when the player asks for more than one thing "
+                       "(e.g. 'spawn 5 combine, make my companion attack them, then slow down time'). "
+                       "Steps without dependencies run in parallel; a step runs after the steps in its 'after' list. "
+                       "An argument written as \"$<step id>.<field>\" is replaced by that field of the step's result "
+                       "(e.g. \"$1.entity_ids.0\" for the first entity spawned by step 1) and makes the step wait for it. "
+                       "Steps after a failed step are skipped. You get every step's result at the end.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "description": "The steps of the plan",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {
+                                "type": "string",
+                                "description": "Short unique step id, e.g. '1'"
+                            },
+                            "tool": {
+                                "type": "string",
+                                "enum": [tool["function"]["name"] for tool in GMOD_TOOLS],
+                                "description": "Tool to call"
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments for the tool"
+                            },
+                            "after": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Ids of steps that must finish first"
+                            }
+                        },
+                        "required": ["id", "tool", "arguments"]
+                    }
+                }
+            },
+            "required": ["steps"]
+        }
+    }
+}
+
+# Bridge-local tool (see catalog.py): offered with CATALOG_ENABLED and answered
+# from the bridge's asset catalog without asking GMod
+SEARCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "search_assets",
+        "description": "Look up the exact model paths, NPC types, weapon, entity and vehicle classes installed on "
+                       "the server by (part of) their name, e.g. 'oil drum' or 'combine'. Use it before spawn_prop "
+                       "or when unsure of a class name. Instant, it does not touch the game.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Name or words to look for"
+                },
+                "kind": {
+                    "type": "string",
+                    "enum": ["model", "npc", "weapon", "entity", "vehicle"],
+                    "description": "Only search this kind of asset"
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 25,
+                    "description": "Maximum number of results (default 10)"
+                }
+            },
+            "required": ["query"]
+        }
+    }
+}
+
+# Tools that only read game state. Their results can be cached, and every
+# other tool is treated as mutating.
+READ_ONLY_TOOLS = {
+    "get_player_info", "get_entities_nearby", "get_server_info", "get_map_entities",
+    "ai_live_status", "ai_live_scan", "ai_live_inspect", "ai_live_inventory", "search_assets",
+}
+
+# Tools only admins may use (mirrors ADMIN_ONLY_TOOLS in the Lua config)
+ADMIN_TOOLS = {"run_command", "change_map"}
+
+# Read-only tools whose result is the same for every player on a server
+SERVER_SCOPED_TOOLS = {"get_server_info", "get_map_entities"}
+
+# Mutating tools whose result the model rarely needs. With OPTIMISTIC_CONTINUATION
+# the follow-up answer is generated while GMod runs them (see optimistic.py).
+OPTIMISTIC_TOOLS = {"spawn_npc", "spawn_prop", "set_gravity", "ai_live_gesture", "play_sound"}
+
+
 def get_tool_names():
     """Get list of all available tool names."""
     return [tool["function"]["name"] for tool in GMOD_TOOLS]
@@ -0,0 +1,176 @@
+"""
+GMod AI Assistant - Usage Ledger
+Records provider token usage per player and per provider in a local SQLite
+ledger with minute/day rollups, and enforces per-player token budgets.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from config import (
+    USAGE_DB_PATH, USAGE_FLUSH_INTERVAL, USAGE_TOKENS_PER_MINUTE, USAGE_TOKENS_PER_DAY,
+    USAGE_ADMINS_EXEMPT, DEBUG
+)
+from metrics import metrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Minute rollups older than this are pruned (day rollups are kept)
+MINUTE_RETENTION = 2 * 24 * 60 * 60
+
+
+class UsageLedger:
+    def __init__(self, path=USAGE_DB_PATH):
+        self.db = sqlite3.connect(os.path.join(HERE, path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS usage_minute (
+                minute INTEGER NOT NULL,
+                steamid TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                requests INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (minute, steamid, provider)
+            );
+            CREATE TABLE IF NOT EXISTS usage_day (
+                day TEXT NOT NULL,
+                steamid TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                name TEXT,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                requests INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, steamid, provider)
+            );
+        """)
+        self.db.commit()
+        self.names = {}  # steamid -> last known player name
+        self._last_prune = 0
+        self.dirty = False  # Recorded usage not yet committed
+
+    @staticmethod
+    def _buckets(now=None):
+        now = now or time.time()
+        return int(now // 60), time.strftime("%Y-%m-%d", time.localtime(now))
+
+    def remember_name(self, steamid, name):
+        if name:
+            self.names[steamid] = name
+
+    def record(self, steamid, usage):
+        """Add one completion's usage (as returned by LMStudioClient) to the ledger."""
+        minute, day = self._buckets()
+        provider = usage.get("provider", "unknown")
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+
+        self.db.execute("""
+            INSERT INTO usage_minute (minute, steamid, provider, prompt_tokens, completion_tokens, requests)
+            VALUES (?, ?, ?, ?, ?, 1)
+            ON CONFLICT (minute, steamid, provider) DO UPDATE SET
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                requests = requests + 1
+        """, (minute, steamid, provider, prompt_tokens, completion_tokens))
+        self.db.execute("""
+            INSERT INTO usage_day (day, steamid, provider, name, prompt_tokens, completion_tokens, requests)
+            VALUES (?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (day, steamid, provider) DO UPDATE SET
+                name = COALESCE(excluded.name, name),
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                requests = requests + 1
+        """, (day, steamid, provider, self.names.get(steamid), prompt_tokens, completion_tokens))
+
+        if minute - self._last_prune > 60:
+            self.db.execute("DELETE FROM usage_minute WHERE minute < ?", (minute - MINUTE_RETENTION // 60,))
+            self._last_prune = minute
+        # Committed in batches by run() so the event loop doesn't wait on a disk
+        # sync per completion; budget checks read this connection and see it already
+        self.dirty = True
+
+        metrics.incr("usage.prompt_tokens", prompt_tokens)
+        metrics.incr("usage.completion_tokens", completion_tokens)
+        if usage.get("estimated"):
+            metrics.incr("usage.estimated_records")
+
+    def flush(self):
+        """Commit recorded usage to disk."""
+        if self.dirty:
+            self.db.commit()
+            self.dirty = False
+
+    async def run(self):
+        """Commit recorded usage every USAGE_FLUSH_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(USAGE_FLUSH_INTERVAL)
+            self.flush()
+
+    def tokens_used(self, steamid):
+        """Return (tokens this minute, tokens today) for a player across all providers."""
+        minute, day = self._buckets()
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage_minute WHERE minute = ? AND steamid = ?",
+            (minute, steamid)
+        ).fetchone()
+        minute_tokens = row[0]
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage_day WHERE day = ? AND steamid = ?",
+            (day, steamid)
+        ).fetchone()
+        return minute_tokens, row[0]
+
+    def check_budget(self, steamid, is_admin=False):
+        """Return an error message if the player is over budget, else None."""
+        if is_admin and USAGE_ADMINS_EXEMPT:
+            return None
+
+        minute_tokens, day_tokens = self.tokens_used(steamid)
+        if USAGE_TOKENS_PER_MINUTE and minute_tokens >= USAGE_TOKENS_PER_MINUTE:
+            metrics.incr("usage.rejected_minute")
+            if DEBUG:
+                print(f"[Usage] {steamid} over minute budget ({minute_tokens}/{USAGE_TOKENS_PER_MINUTE})")
+            return "You've hit your AI usage limit for this minute. Please wait a moment."
+        if USAGE_TOKENS_PER_DAY and day_tokens >= USAGE_TOKENS_PER_DAY:
+            metrics.incr("usage.rejected_day")
+            if DEBUG:
+                print(f"[Usage] {steamid} over daily budget ({day_tokens}/{USAGE_TOKENS_PER_DAY})")
+            return "You've used your AI token budget for today. It resets tomorrow."
+        return None
+
+    def report(self, limit=5):
+        """Build a short text report of the top consumers (today and in the last hour)."""
+        minute, day = self._buckets()
+        lines = [f"Top AI token users today ({day}):"]
+
+        rows = self.db.execute("""
+            SELECT steamid, MAX(name), SUM(prompt_tokens), SUM(completion_tokens), SUM(requests)
+            FROM usage_day WHERE day = ?
+            GROUP BY steamid
+            ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?
+        """, (day, limit)).fetchall()
+        if not rows:
+            lines.append("  (no usage recorded)")
+        for i, (steamid, name, prompt_tokens, completion_tokens, requests) in enumerate(rows, 1):
+            lines.append(f"  {i}. {name or steamid}: {prompt_tokens + completion_tokens} tokens "
+                         f"({prompt_tokens} in / {completion_tokens} out, {requests} requests)")
+
+        rows = self.db.execute("""
+            SELECT provider, SUM(prompt_tokens + completion_tokens), SUM(requests)
+            FROM usage_day WHERE day = ?
+            GROUP BY provider ORDER BY 2 DESC
+        """, (day,)).fetchall()
+        for provider, tokens, requests in rows:
+            lines.append(f"  Provider {provider}: {tokens} tokens, {requests} requests")
+
+        rows = self.db.execute("""
+            SELECT steamid, SUM(prompt_tokens + completion_tokens)
+            FROM usage_minute WHERE minute > ?
+            GROUP BY steamid ORDER BY 2 DESC LIMIT ?
+        """, (minute - 60, limit)).fetchall()
+        if rows:
+            lines.append("Last hour: " + ", ".join(
+                f"{self.names.get(steamid, steamid)} {tokens}" for steamid, tokens in rows
+            ))
+        return lines
@@ -0,0 +1,191 @@
+"""
+GMod AI Assistant - Tool Argument Validation
+Validators compiled once from the JSON schemas in GMOD_TOOLS. They coerce
+near-miss arguments (e.g. "5" for an integer), clamp numbers into their
+minimum/maximum like the Lua handlers' math.Clamp, and reject calls with
+wrong types or missing arguments before they reach GMod, with an error
+precise enough for the model to fix the call.
+"""
+
+import difflib
+import codec
+from tools import GMOD_TOOLS, PLAN_TOOL, SEARCH_TOOL
+
+TRUE_STRINGS = {"true", "yes", "on", "1"}
+FALSE_STRINGS = {"false", "no", "off", "0"}
+
+
+def _coerce_integer(value):
+    if isinstance(value, bool):
+        raise ValueError("must be an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            pass
+        else:
+            if number.is_integer():
+                return int(number)
+    raise ValueError("must be an integer")
+
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        raise ValueError("must be a number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise ValueError("must be a number")
+
+
+def _coerce_string(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError("must be a string")
+
+
+def _coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+    raise ValueError("must be true or false")
+
+
+def _coerce_object(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = codec.loads(value)
+        except codec.DecodeError:
+            pass
+        else:
+            if isinstance(parsed, dict):
+                return parsed
+    raise ValueError("must be an object")
+
+
+COERCERS = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "string": _coerce_string,
+    "boolean": _coerce_boolean,
+    "object": _coerce_object,
+}
+
+
+def _compile_property(name, schema):
+    """Build a function that coerces and checks one argument, raising ValueError with a precise message."""
+    coerce = COERCERS.get(schema.get("type"))
+    enum = schema.get("enum")
+    by_lower = {str(v).lower(): v for v in enum} if enum else None
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+
+    def check(value):
+        if coerce:
+            try:
+                value = coerce(value)
+            except ValueError as e:
+                raise ValueError(f"'{name}' {e} (got {value!r})")
+        if by_lower is not None:
+            match = by_lower.get(str(value).lower())
+            if match is None:
+                raise ValueError(f"'{name}' must be one of {', '.join(map(str, enum))} (got {value!r})")
+            value = match
+        # Out of range is not worth a round trip: GMod clamps these values too
+        if minimum is not None and value < minimum:
+            value = minimum
+        elif maximum is not None and value > maximum:
+            value = maximum
+        return value
+
+    return check
+
+
+def _compile_tool(parameters):
+    properties = {name: _compile_property(name, schema) for name, schema in parameters.get("properties", {}).items()}
+    required = tuple(parameters.get("required", ()))
+
+    def validate(args, deferred=()):
+        """Return (coerced_args, changed). Raises ValueError on the first bad argument."""
+        if not isinstance(args, dict):
+            raise ValueError("arguments must be a JSON object")
+        out = {}
+        changed = False
+        for key, value in args.items():
+            if value is None:
+                changed = True  # Treat null as omitted
+                continue
+            check = properties.get(key)
+            if check is None:
+                out[key] = value  # Unknown extras are passed through; GMod ignores them
+                continue
+            coerced = check(value)
+            changed = changed or coerced is not value
+            out[key] = coerced
+        for key in required:
+            if key not in out and key not in deferred:
+                raise ValueError(f"missing required argument '{key}'")
+        return out, changed
+
+    return validate
+
+
+VALIDATORS = {tool["function"]["name"]: _compile_tool(tool["function"].get("parameters", {}))
+              for tool in GMOD_TOOLS + [PLAN_TOOL, SEARCH_TOOL]}
+
+
+def validate_tool_call(name, args, deferred=()):
+    """
+    Validate and coerce one tool call. Required arguments named in deferred
+    are supplied later (plan step references) and may be missing from args.
+    Returns (args, changed, error); error is None when the call may be sent.
+    """
+    validate = VALIDATORS.get(name)
+    if validate is None:
+        close = difflib.get_close_matches(str(name), VALIDATORS, n=3)
+        hint = f" Did you mean: {', '.join(close)}?" if close else ""
+        return args, False, f"Unknown tool '{name}'.{hint}"
+    try:
+        coerced, changed = validate(args, deferred)
+    except ValueError as e:
+        return args, False, f"Invalid arguments for {name}: {e}. Fix the arguments and call the tool again."
+    return coerced, changed, None
+
+
+if __name__ == "__main__":
+    # Examples and timing: python validation.py
+    import timeit
+
+    samples = [
+        ("spawn_npc", {"npc_type": "zombie", "count": "5"}),
+        ("spawn_npc", {"npc_type": "zombie", "count": 50}),
+        ("spawn_prop", {"frozen": "yes"}),
+        ("spawn_vehicle", {"vehicle_type": "Jeep"}),
+        ("set_entity_color", {"r": 255.0, "g": "0", "b": 0}),
+        ("spawn_zombie", {}),
+    ]
+    for name, args in samples:
+        print(f"{name} {args} -> {validate_tool_call(name, args)}")
+
+    number = 100000
+    seconds = timeit.timeit(lambda: validate_tool_call("spawn_npc", {"npc_type": "zombie", "count": "5"}), number=number)
+    print(f"{seconds / number * 1e6:.2f} us per call")
@@ -0,0 +1,89 @@
+"""
+GMod AI Assistant - Provider Warm-up
+Warms provider clients when the bridge starts and keeps them warm while GMod
+servers are connected, so the first !ai after startup or a quiet spell does
+not pay for connection setup, model loading (Ollama, LM Studio) and an
+uncached system prompt. Warm-ups are one-token requests that carry the same
+system prompt and tools as real requests.
+"""
+
+import asyncio
+import time
+from config import WARMUP_KEEPALIVE_INTERVAL, DEBUG
+from metrics import metrics
+from providers import capabilities
+
+# Ledger id warm-up tokens are recorded under (shows up in !ai_usage)
+WARMUP_USAGE_ID = "system:warmup"
+
+
+class FirstChunkTimer:
+    """Wraps a provider stream and records when its first chunk arrived."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.first_chunk_at = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for chunk in self.stream:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.monotonic()
+            yield chunk
+
+    async def close(self):
+        await self.stream.close()
+
+
+class Warmer:
+    """
+    Runs warm-ups for the bridge's provider clients. The bridge provides:
+      clients_in_use() -> the provider clients in use
+      connected() -> whether any GMod server is connected
+      tasks -> set that keeps background tasks alive
+      usage -> the usage ledger warm-up tokens are recorded in
+    """
+
+    def __init__(self, bridge, interval=WARMUP_KEEPALIVE_INTERVAL):
+        self.bridge = bridge
+        self.interval = interval
+
+    async def warm(self, client, reason):
+        """Warm a client's models (the cascade's small one too); failures are logged and otherwise ignored."""
+        for model in filter(None, (client.model, client.small_model)):
+            try:
+                ttft, usage = await client.warm_up(model)
+            except Exception as e:
+                metrics.incr("warmup.failures")
+                print(f"[Warmup] {client.provider}/{model} failed: {e}")
+                continue
+            self.bridge.usage.record(WARMUP_USAGE_ID, usage)
+            metrics.incr(f"warmup.requests.{reason}")
+            metrics.observe(f"warmup.ttft.{reason}", ttft)
+            if DEBUG or reason == "startup":
+                print(f"[Warmup] {client.provider}/{model} ({reason}): first token in {ttft:.2f}s")
+
+    def warm_soon(self, client, reason="new_client"):
+        """Warm a client in the background (e.g. one created for a server override)."""
+        task = asyncio.create_task(self.warm(client, reason))
+        self.bridge.tasks.add(task)
+        task.add_done_callback(self.bridge.tasks.discard)
+
+    async def run(self):
+        """Warm every client now, then ping idle local ones while GMod servers are connected."""
+        await asyncio.gather(*(self.warm(client, "startup") for client in self.bridge.clients_in_use()))
+        if not self.interval:
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.bridge.connected():
+                continue
+            now = time.monotonic()
+            for client in self.bridge.clients_in_use():
+                # Hosted providers keep their models loaded; pinging them only costs tokens
+                if not capabilities(client.provider).get("keepalive"):
+                    continue
+                if now - (client.last_request_at or 0) >= self.interval:
+                    await self.warm(client, "keepalive")
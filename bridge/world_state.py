@@ -0,0 +1,282 @@
+"""
+GMod AI Assistant - World State Mirror
+Keeps an in-memory copy of the GMod world, fed by periodic delta-encoded
+snapshots, so read-only tools can be answered without a round trip to GMod.
+"""
+
+import math
+import time
+from config import WORLD_STATE_MAX_AGE, WORLD_STATE_GRID_SIZE, DEBUG
+
+
+# Tools that can be answered from the mirror instead of GMod
+WORLD_STATE_TOOLS = {
+    "get_player_info",
+    "get_server_info",
+    "get_map_entities",
+    "get_entities_nearby",
+}
+
+
+class SpatialGrid:
+    """Uniform grid index of entity positions for radius queries."""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cy, cz) -> set of entity ids
+        self.positions = {}  # entity id -> (cell, (x, y, z))
+
+    def _cell(self, pos):
+        size = self.cell_size
+        return (int(pos[0] // size), int(pos[1] // size), int(pos[2] // size))
+
+    def insert(self, ent_id, pos):
+        """Insert or move an entity."""
+        cell = self._cell(pos)
+        old = self.positions.get(ent_id)
+        if old and old[0] != cell:
+            self._discard(ent_id, old[0])
+        if not old or old[0] != cell:
+            self.cells.setdefault(cell, set()).add(ent_id)
+        self.positions[ent_id] = (cell, pos)
+
+    def remove(self, ent_id):
+        """Remove an entity from the index."""
+        old = self.positions.pop(ent_id, None)
+        if old:
+            self._discard(ent_id, old[0])
+
+    def _discard(self, ent_id, cell):
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.discard(ent_id)
+            if not bucket:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells = {}
+        self.positions = {}
+
+    def query_radius(self, center, radius):
+        """Return [(distance, ent_id)] within radius of center, nearest first."""
+        lo = self._cell((center[0] - radius, center[1] - radius, center[2] - radius))
+        hi = self._cell((center[0] + radius, center[1] + radius, center[2] + radius))
+        radius_sq = radius * radius
+        found = []
+        for cx in range(lo[0], hi[0] + 1):
+            for cy in range(lo[1], hi[1] + 1):
+                for cz in range(lo[2], hi[2] + 1):
+                    bucket = self.cells.get((cx, cy, cz))
+                    if not bucket:
+                        continue
+                    for ent_id in bucket:
+                        pos = self.positions[ent_id][1]
+                        dx = pos[0] - center[0]
+                        dy = pos[1] - center[1]
+                        dz = pos[2] - center[2]
+                        dist_sq = dx * dx + dy * dy + dz * dz
+                        if dist_sq <= radius_sq:
+                            found.append((math.sqrt(dist_sq), ent_id))
+        found.sort()
+        return found
+
+
+class WorldState:
+    """Mirror of one GMod server's world, built from world_state frames."""
+
+    def __init__(self, grid_size=WORLD_STATE_GRID_SIZE, max_age=WORLD_STATE_MAX_AGE):
+        self.max_age = max_age
+        self.server = {}
+        self.players = {}     # steamid -> player dict
+        self.entities = {}    # entity id -> entity dict
+        self.companions = {}  # owner steamid -> companion dict
+        self.class_counts = {}
+        self.grid = SpatialGrid(grid_size)
+        self.seq = None
+        self.updated_at = 0
+        self.stale_seq = None  # Set by mark_stale: snapshots up to this seq predate a mutating tool call
+        self.truncated = False  # GMod hit WORLD_STATE_MAX_ENTITIES, so the entity list is incomplete
+
+    def is_fresh(self):
+        """True if a full snapshot has been applied, updates are recent and no mutation is pending."""
+        if self.seq is None or time.monotonic() - self.updated_at > self.max_age:
+            return False
+        return self.stale_seq is None or self.seq > self.stale_seq
+
+    def mark_stale(self):
+        """
+        A mutating tool was sent to GMod (or its result came back): the mirror
+        may not show its effect yet, so stop answering until a newer snapshot.
+        Called again when the result arrives, so a snapshot that was already in
+        flight when the tool ran does not count.
+        """
+        self.stale_seq = self.seq if self.seq is not None else -1
+
+    def apply(self, data):
+        """
+        Apply a world_state frame.
+
+        Full frames replace everything. Delta frames carry only changed
+        players/entities/companions plus removed keys, and must follow the
+        previous sequence number. Returns False if a delta could not be applied
+        and GMod should resend a full snapshot.
+        """
+        seq = data.get("seq")
+        if data.get("full"):
+            self.players = {}
+            self.entities = {}
+            self.companions = {}
+            self.class_counts = {}
+            self.grid.clear()
+        elif self.seq is None or seq != self.seq + 1:
+            if DEBUG:
+                print(f"[World] Out of order delta (have {self.seq}, got {seq}), requesting resync")
+            self.seq = None
+            return False
+
+        if "truncated" in data:
+            self.truncated = bool(data["truncated"])
+
+        if "server" in data:
+            self.server.update(data["server"])
+
+        for player in data.get("players") or []:
+            self.players[player["steamid"]] = player
+        for steamid in data.get("removed_players") or []:
+            self.players.pop(steamid, None)
+
+        for ent in data.get("entities") or []:
+            ent_id = ent["id"] = int(ent["id"])
+            self.entities[ent_id] = ent
+            pos = ent.get("pos")
+            if pos:
+                self.grid.insert(ent_id, (pos[0], pos[1], pos[2]))
+        for ent_id in data.get("removed_entities") or []:
+            ent_id = int(ent_id)
+            self.entities.pop(ent_id, None)
+            self.grid.remove(ent_id)
+
+        for companion in data.get("companions") or []:
+            self.companions[companion["owner"]] = companion
+        for owner in data.get("removed_companions") or []:
+            self.companions.pop(owner, None)
+
+        # An empty Lua table is serialized as [] rather than {}
+        if "class_counts" in data:
+            self.class_counts = data["class_counts"] or {}
+
+        self.seq = seq
+        self.updated_at = time.monotonic()
+        return True
+
+    # =========================================================================
+    # Local tool implementations (mirror the Lua handlers' result shapes)
+    # =========================================================================
+
+    def can_answer(self, tool_name, player_id):
+        """Check whether a tool call can be answered from the mirror."""
+        if tool_name not in WORLD_STATE_TOOLS or not self.is_fresh():
+            return False
+        if tool_name == "get_entities_nearby" and self.truncated:
+            return False  # Entities GMod would return may be missing from the mirror
+        if tool_name in ("get_player_info", "get_entities_nearby"):
+            return player_id in self.players
+        return True
+
+    def answer(self, tool_name, args, player_id):
+        """Answer a read-only tool call. Returns (success, result)."""
+        if tool_name == "get_player_info":
+            return True, self.get_player_info(player_id)
+        if tool_name == "get_server_info":
+            return True, self.get_server_info()
+        if tool_name == "get_map_entities":
+            return True, self.get_map_entities()
+        if tool_name == "get_entities_nearby":
+            return True, self.get_entities_nearby(player_id, args.get("radius"))
+        return False, f"Unknown world state tool: {tool_name}"
+
+    def get_player_info(self, player_id):
+        player = self.players.get(player_id)
+        if not player:
+            return {"success": False, "error": "No player"}
+        pos = player.get("pos") or [0, 0, 0]
+        return {
+            "success": True,
+            "name": player.get("name"),
+            "steamid": player_id,
+            "health": player.get("health"),
+            "armor": player.get("armor"),
+            "position": {"x": pos[0], "y": pos[1], "z": pos[2]},
+            "weapon": player.get("weapon", "none"),
+            "is_alive": player.get("alive", True),
+            "is_admin": player.get("is_admin", False),
+            "team": player.get("team"),
+            "model": player.get("model")
+        }
+
+    def get_server_info(self):
+        players = [
+            {"name": p.get("name"), "steamid": steamid, "is_admin": p.get("is_admin", False)}
+            for steamid, p in self.players.items()
+        ]
+        return {
+            "success": True,
+            "server_name": self.server.get("server_name"),
+            "map": self.server.get("map"),
+            "gamemode": self.server.get("gamemode"),
+            "player_count": len(players),
+            "max_players": self.server.get("max_players"),
+            "players": players,
+            "tickrate": self.server.get("tickrate")
+        }
+
+    def get_map_entities(self, limit=30):
+        classes = sorted(self.class_counts.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "success": True,
+            "entity_classes": [{"class": cls, "count": count} for cls, count in classes[:limit]]
+        }
+
+    def get_entities_nearby(self, player_id, radius=None, limit=20):
+        player = self.players.get(player_id)
+        if not player or not player.get("pos"):
+            return {"success": False, "error": "No player"}
+        try:
+            radius = float(radius) if radius is not None else 500
+        except (TypeError, ValueError):
+            radius = 500
+
+        center = player["pos"]
+        entities = []
+        for distance, ent_id in self.grid.query_radius(center, radius):
+            if ent_id == player.get("id"):
+                continue
+            ent = self.entities[ent_id]
+            entities.append({
+                "id": ent_id,
+                "class": ent.get("class"),
+                "model": ent.get("model", ""),
+                "distance": round(distance),
+                "is_npc": ent.get("is_npc", False),
+                "is_player": ent.get("is_player", False),
+                "name": ent.get("name")
+            })
+            if len(entities) >= limit:
+                break
+
+        return {"success": True, "entities": entities, "count": len(entities)}
+
+    def build_context(self, player_id, radius=800, limit=5):
+        """Summarize the player's surroundings for the user message context block."""
+        if not self.is_fresh() or player_id not in self.players:
+            return None
+
+        context = {}
+        companion = self.companions.get(player_id)
+        if companion:
+            context["companion"] = companion
+
+        nearby = self.get_entities_nearby(player_id, radius, limit)
+        if nearby.get("entities"):
+            context["nearby"] = nearby["entities"]
+        return context
@@ -37,11 +37,11 @@ net.Receive("AIAssistant_Response", function()
     surface.PlaySound("buttons/button14.wav")
 end)
 
--- Receive streaming update
+-- Receive streaming update (only the text added since the last update)
 net.Receive("AIAssistant_StreamUpdate", function()
     local text = net.ReadString()
     
-    AIAssistant.Client.StreamText = text
+    AIAssistant.Client.StreamText = AIAssistant.Client.StreamText .. text
     AIAssistant.Client.ShowStream = true
     AIAssistant.Client.IsThinking = false
 end)
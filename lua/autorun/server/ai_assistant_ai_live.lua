@@ -142,6 +142,127 @@ timer.Create("AIAssistant_AILive_Cleanup", 30, 0, function()
     end
 end)
 
+-- === AUTONOMY ===
+-- Autonomous companions are observed every AILIVE_TICK_INTERVAL seconds and all of them
+-- are sent to the bridge in one companion_tick frame; the bridge answers with one
+-- companion_commands frame holding a command for each companion that should act.
+
+AIAssistant.AILive.Tick = 0
+AIAssistant.AILive.TickPending = nil -- CurTime() the unanswered tick was sent at
+
+-- Switch autonomy on or off for a player's companion
+function AIAssistant.AILive.ToggleAuto(ply)
+    local ent = AIAssistant.AILive.GetForPlayer(ply)
+    if not IsValid(ent) then
+        return false, "You don't have an AI companion."
+    end
+    
+    local data = AIAssistant.AILive.Entities[ent]
+    data.autonomous = not data.autonomous
+    if data.autonomous then
+        return true, "Your companion now acts on its own. Use !ai_live_auto again to take back control."
+    end
+    return true, "Your companion is back under your control."
+end
+
+-- What one companion sees, in the shape the bridge's planner expects
+local function Observe(ent, data)
+    local owner = ent:GetOwnerPlayer()
+    local observation = {
+        id = ent:EntIndex(),
+        name = ent:GetAIName(),
+        owner = data.steamId,
+        owner_name = IsValid(owner) and owner:Nick() or nil,
+        owner_admin = IsValid(owner) and owner:IsAdmin() or false,
+        owner_distance = IsValid(owner) and math.Round(ent:GetPos():Distance(owner:GetPos())) or nil,
+        state = ent.AIState or "idle",
+        health = ent:Health(),
+        max_health = ent:GetMaxHealth(),
+        target = IsValid(ent.TargetEntity) and ent.TargetEntity:EntIndex() or nil,
+    }
+    
+    if ent:HasWeapon() then
+        local wep = ent:GetWeapon()
+        if IsValid(wep) then
+            observation.weapon = wep:GetClass()
+        end
+    end
+    
+    local _, nearby = ent:CommandScan(AIAssistant.Config.AILIVE_SCAN_RADIUS)
+    observation.nearby = nearby
+    return observation
+end
+
+-- Send one tick with every autonomous companion on the server
+function AIAssistant.AILive.SendTick()
+    local pending = AIAssistant.AILive.TickPending
+    if pending and CurTime() - pending < AIAssistant.Config.AILIVE_TICK_TIMEOUT then
+        return
+    end
+    
+    local companions = {}
+    for ent, data in pairs(AIAssistant.AILive.Entities) do
+        if data.autonomous and IsValid(ent) and ent:Health() > 0 then
+            table.insert(companions, Observe(ent, data))
+        end
+    end
+    if #companions == 0 then return end
+    
+    AIAssistant.AILive.Tick = AIAssistant.AILive.Tick + 1
+    local sent = AIAssistant.WS.Send({
+        type = "companion_tick",
+        tick = AIAssistant.AILive.Tick,
+        companions = companions
+    }, true)
+    AIAssistant.AILive.TickPending = sent and CurTime() or nil
+end
+
+-- Run one planned command on its companion
+local function RunCommand(ent, command)
+    local target = command.target and Entity(command.target) or nil
+    local action = command.action
+    
+    if action == "follow" then
+        ent:CommandFollow(ent:GetOwnerPlayer())
+    elseif action == "stop" then
+        ent:CommandStop()
+    elseif action == "move_to" and IsValid(target) then
+        ent:CommandMoveTo(target:GetPos())
+    elseif action == "attack" and IsValid(target) and not target:IsPlayer() then
+        ent:CommandAttack(target)
+    elseif action == "find_cover" then
+        ent:CommandFindCover()
+    elseif action == "retreat" then
+        ent:CommandRetreat()
+    elseif action == "patrol" then
+        ent:CommandPatrol()
+    end
+    
+    if command.say then
+        ent:CommandSay(command.say)
+    end
+end
+
+-- Apply a companion_commands frame from the bridge
+function AIAssistant.AILive.HandleCommands(data)
+    AIAssistant.AILive.TickPending = nil
+    
+    for _, command in ipairs(data.commands or {}) do
+        local ent = Entity(tonumber(command.id) or -1)
+        local tracked = IsValid(ent) and AIAssistant.AILive.Entities[ent]
+        -- The player may have switched autonomy off while the tick was planned
+        if tracked and tracked.autonomous then
+            RunCommand(ent, command)
+        end
+    end
+end
+
+timer.Create("AIAssistant_AILive_Tick", AIAssistant.Config.AILIVE_TICK_INTERVAL, 0, function()
+    if AIAssistant.WS and AIAssistant.WS.Connected then
+        AIAssistant.AILive.SendTick()
+    end
+end)
+
 -- Command handlers for chat
 hook.Add("PlayerSay", "AIAssistant_AILiveCommands", function(ply, text)
     local lower = string.lower(text)
@@ -157,6 +278,17 @@ hook.Add("PlayerSay", "AIAssistant_AILiveCommands", function(ply, text)
         return ""
     end
     
+    -- Autonomy toggle
+    if lower == "/ai_live_auto" or lower == "!ai_live_auto" then
+        if AIAssistant.CanUse and AIAssistant.CanUse(ply) then
+            local success, msg = AIAssistant.AILive.ToggleAuto(ply)
+            ply:ChatPrint("[AI Assistant] " .. msg)
+        else
+            ply:ChatPrint("[AI Assistant] You don't have permission.")
+        end
+        return ""
+    end
+    
     -- Remove command
     if lower == "/ai_live_remove" or lower == "!ai_live_remove" then
         if AIAssistant.CanUse and AIAssistant.CanUse(ply) then
@@ -195,6 +327,18 @@ concommand.Add("ai_live_remove", function(ply, cmd, args)
     ply:ChatPrint("[AI Assistant] " .. msg)
 end)
 
+concommand.Add("ai_live_auto", function(ply, cmd, args)
+    if not IsValid(ply) then return end
+    
+    if not AIAssistant.CanUse or not AIAssistant.CanUse(ply) then
+        ply:ChatPrint("[AI Assistant] You don't have permission.")
+        return
+    end
+    
+    local success, msg = AIAssistant.AILive.ToggleAuto(ply)
+    ply:ChatPrint("[AI Assistant] " .. msg)
+end)
+
 -- Status command
 concommand.Add("ai_live_status", function(ply, cmd, args)
     if not IsValid(ply) then return end
@@ -210,6 +354,7 @@ concommand.Add("ai_live_status", function(ply, cmd, args)
     ply:ChatPrint("  Name: " .. ent:GetAIName())
     ply:ChatPrint("  Health: " .. ent:Health() .. "/" .. ent:GetMaxHealth())
     ply:ChatPrint("  State: " .. (ent.AIState or "unknown"))
+    ply:ChatPrint("  Autonomous: " .. (AIAssistant.AILive.Entities[ent].autonomous and "yes" or "no"))
     ply:ChatPrint("  Position: " .. tostring(ent:GetPos()))
     
     if ent:HasWeapon() then
@@ -10,6 +10,25 @@ AIAssistant.Chat = AIAssistant.Chat or {}
 -- Fallback Debug function if config hasn't loaded yet
 AIAssistant.Debug = AIAssistant.Debug or function(...) print("[AI Assistant]", ...) end
 
+-- Control commands answered by the bridge itself (no AI request): chat/console name -> protocol command
+local CONTROL_COMMANDS = {
+    clear = "clear",
+    memory = "memory",
+    model = "model",
+    flush = "flush_cache",
+}
+
+local function SendControl(ply, command, args)
+    if not IsValid(ply) then return end
+    
+    if not AIAssistant.CanUse(ply) or not AIAssistant.WS.Connected then
+        ply:ChatPrint("[AI Assistant] Not connected or no permission.")
+        return
+    end
+    
+    AIAssistant.WS.SendControl(ply, command, args)
+end
+
 -- Hook into player chat
 hook.Add("PlayerSay", "AIAssistant_ChatHook", function(ply, text, teamChat)
     local lower = string.lower(text)
@@ -19,6 +38,47 @@ hook.Add("PlayerSay", "AIAssistant_ChatHook", function(ply, text, teamChat)
         return -- Let the AI Live handler process these
     end
     
+    -- Cancel the player's in-flight request
+    if lower == "!ai_cancel" or lower == "/ai_cancel" then
+        if AIAssistant.CanUse(ply) and AIAssistant.WS.Connected then
+            AIAssistant.WS.SendCancel(ply)
+        else
+            ply:ChatPrint("[AI Assistant] Not connected or no permission.")
+        end
+        return ""
+    end
+    
+    -- Token usage report (admins only)
+    if lower == "!ai_usage" or lower == "/ai_usage" then
+        if not ply:IsAdmin() then
+            ply:ChatPrint("[AI Assistant] Only admins can view AI usage.")
+        elseif AIAssistant.WS.Connected then
+            AIAssistant.WS.SendUsageReport(ply)
+        else
+            ply:ChatPrint("[AI Assistant] Not connected to bridge.")
+        end
+        return ""
+    end
+    
+    -- Reload the bridge's config and tools without restarting it (admins only)
+    if lower == "!ai_reload" or lower == "/ai_reload" then
+        if not ply:IsAdmin() then
+            ply:ChatPrint("[AI Assistant] Only admins can reload the AI bridge.")
+        elseif AIAssistant.WS.Connected then
+            AIAssistant.WS.SendReloadConfig(ply)
+        else
+            ply:ChatPrint("[AI Assistant] Not connected to bridge.")
+        end
+        return ""
+    end
+    
+    -- Clear memory, memory stats, model selection and cache flush
+    local control, arg = string.match(lower, "^[!/]ai_(%a+)%s*(%S*)$")
+    if CONTROL_COMMANDS[control] then
+        SendControl(ply, CONTROL_COMMANDS[control], control == "model" and {model = arg} or nil)
+        return ""
+    end
+    
     -- Check for AI prefix
     local prefix = AIAssistant.Config.CHAT_PREFIX
     local prefixAlt = AIAssistant.Config.CHAT_PREFIX_ALT
@@ -149,8 +209,8 @@ function AIAssistant.Chat.SplitMessage(text)
     return chunks
 end
 
--- Show AI response to player
-function AIAssistant.Chat.ShowResponse(ply, text)
+-- Show AI response to player (segments: chat lines already split by the bridge)
+function AIAssistant.Chat.ShowResponse(ply, text, segments)
     if not IsValid(ply) then return end
     
     -- Stop thinking indicator
@@ -159,7 +219,7 @@ function AIAssistant.Chat.ShowResponse(ply, text)
     net.Send(ply)
     
     -- Split message if needed to avoid 255 byte limit
-    local chunks = AIAssistant.Chat.SplitMessage(text)
+    local chunks = segments or AIAssistant.Chat.SplitMessage(text)
     
     -- Send each chunk with a small delay to maintain order
     for i, chunk in ipairs(chunks) do
@@ -177,6 +237,15 @@ function AIAssistant.Chat.ShowResponse(ply, text)
     AIAssistant.Debug("Response to", ply:Nick() .. ":", string.sub(text, 1, 100))
 end
 
+-- Print chat lines of a streamed response as soon as the bridge completes them
+function AIAssistant.Chat.PrintSegments(ply, segments)
+    if not IsValid(ply) or not segments then return end
+    
+    for _, segment in ipairs(segments) do
+        ply:ChatPrint(MSG_PREFIX .. segment)
+    end
+end
+
 -- Broadcast AI message to all players
 function AIAssistant.Chat.Broadcast(text)
     for _, ply in ipairs(player.GetAll()) do
@@ -225,6 +294,26 @@ end)
 
 -- Clear memory command
 concommand.Add("ai_clear", function(ply)
+    SendControl(ply, "clear")
+end)
+
+-- Memory stats command
+concommand.Add("ai_memory", function(ply)
+    SendControl(ply, "memory")
+end)
+
+-- Model selection command (no argument lists the choices)
+concommand.Add("ai_model", function(ply, cmd, args)
+    SendControl(ply, "model", {model = args[1]})
+end)
+
+-- Tool cache flush command
+concommand.Add("ai_flush", function(ply)
+    SendControl(ply, "flush_cache")
+end)
+
+-- Cancel command
+concommand.Add("ai_cancel", function(ply)
     if not IsValid(ply) then return end
     
     if not AIAssistant.WS.Connected then
@@ -232,33 +321,39 @@ concommand.Add("ai_clear", function(ply)
         return
     end
     
-    -- Send clear command to AI (handled as special message)
-    AIAssistant.WS.SendChat(ply, "clear")
-    ply:ChatPrint("[AI Assistant] Memory clear requested...")
+    AIAssistant.WS.SendCancel(ply)
 end)
 
--- Also handle !ai_clear in chat
-hook.Add("PlayerSay", "AIAssistant_ClearMemory", function(ply, text)
-    local lower = string.lower(text)
+-- Usage report command (admins and server console)
+concommand.Add("ai_usage", function(ply)
+    if IsValid(ply) and not ply:IsAdmin() then
+        ply:ChatPrint("[AI Assistant] Only admins can view AI usage.")
+        return
+    end
     
-    if lower == "!ai_clear" or lower == "/ai_clear" then
-        if AIAssistant.CanUse(ply) and AIAssistant.WS.Connected then
-            AIAssistant.WS.SendChat(ply, "clear")
-            ply:ChatPrint("[AI Assistant] Memory clear requested...")
-        else
-            ply:ChatPrint("[AI Assistant] Not connected or no permission.")
-        end
-        return ""
+    if not AIAssistant.WS.Connected then
+        local msg = "[AI Assistant] Not connected to bridge."
+        if IsValid(ply) then ply:ChatPrint(msg) else print(msg) end
+        return
     end
     
-    if lower == "!ai_memory" or lower == "/ai_memory" then
-        if AIAssistant.CanUse(ply) and AIAssistant.WS.Connected then
-            AIAssistant.WS.SendChat(ply, "memory")
-        else
-            ply:ChatPrint("[AI Assistant] Not connected or no permission.")
-        end
-        return ""
+    AIAssistant.WS.SendUsageReport(ply)
+end)
+
+-- Bridge reload command (admins and server console)
+concommand.Add("ai_reload", function(ply)
+    if IsValid(ply) and not ply:IsAdmin() then
+        ply:ChatPrint("[AI Assistant] Only admins can reload the AI bridge.")
+        return
     end
+    
+    if not AIAssistant.WS.Connected then
+        local msg = "[AI Assistant] Not connected to bridge."
+        if IsValid(ply) then ply:ChatPrint(msg) else print(msg) end
+        return
+    end
+    
+    AIAssistant.WS.SendReloadConfig(ply)
 end)
 
 AIAssistant.Debug("Chat handler loaded")
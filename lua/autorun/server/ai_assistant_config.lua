@@ -10,6 +10,28 @@ AIAssistant.Config = AIAssistant.Config or {}
 AIAssistant.Config.BRIDGE_URL = "ws://localhost:8765"
 AIAssistant.Config.RECONNECT_DELAY = 5 -- Seconds between reconnection attempts
 AIAssistant.Config.MAX_RECONNECT_DELAY = 60 -- Maximum delay (exponential backoff cap)
+AIAssistant.Config.SERVER_ID = "" -- Identifies this server to a shared bridge ("" = use IP:port)
+
+-- World State Feed (lets the bridge answer read-only tools without a round trip)
+AIAssistant.Config.WORLD_STATE_ENABLED = true
+AIAssistant.Config.WORLD_STATE_INTERVAL = 1 -- Seconds between snapshots
+AIAssistant.Config.WORLD_STATE_FULL_EVERY = 30 -- Send a full snapshot every N ticks, deltas otherwise
+AIAssistant.Config.WORLD_STATE_MAX_ENTITIES = 512 -- Cap on entities per snapshot; spawned entities and those near players are kept first
+AIAssistant.Config.WORLD_STATE_MOVE_THRESHOLD = 16 -- Units an entity must move before it is resent
+
+-- AI Live Autonomy (companions switched on with !ai_live_auto are planned by the bridge every tick)
+AIAssistant.Config.AILIVE_TICK_INTERVAL = 2 -- Seconds between autonomy ticks
+AIAssistant.Config.AILIVE_SCAN_RADIUS = 1000 -- Units around a companion included in its observation
+AIAssistant.Config.AILIVE_TICK_TIMEOUT = 15 -- Seconds to wait for the bridge before sending the next tick anyway
+
+-- Asset Catalog (installed models and classes sent to the bridge at handshake, so it can fix names)
+AIAssistant.Config.CATALOG_ENABLED = true
+AIAssistant.Config.CATALOG_MAX_MODELS = 3000 -- Cap on model paths sent
+AIAssistant.Config.CATALOG_MODEL_DIRS = { -- Folders searched for prop models
+    "models/props_c17", "models/props_junk", "models/props_interiors", "models/props_wasteland",
+    "models/props_borealis", "models/props_lab", "models/props_combine", "models/props_vehicles",
+    "models/props_canal", "models/props_trainstation", "models/props_docks", "models/props_phx",
+}
 
 -- Assistant Settings
 AIAssistant.Config.ASSISTANT_NAME = "AI Assistant"
@@ -33,6 +55,7 @@ AIAssistant.Config.ALLOWED_PLAYERS = {}
 -- Tool Permissions (which tools require admin)
 AIAssistant.Config.ADMIN_ONLY_TOOLS = {
     "run_command",
+    "change_map",
     "kick_player",
     "ban_player",
 }
@@ -67,15 +90,22 @@ function AIAssistant.CanUse(ply)
     return false
 end
 
+-- Check if a tool requires admin
+function AIAssistant.IsAdminOnlyTool(toolName)
+    for _, tool in ipairs(AIAssistant.Config.ADMIN_ONLY_TOOLS) do
+        if tool == toolName then
+            return true
+        end
+    end
+    return false
+end
+
 -- Check if a player can use a specific tool
 function AIAssistant.CanUseTool(ply, toolName)
     if not AIAssistant.CanUse(ply) then return false end
     
-    -- Check if tool is admin-only
-    for _, tool in ipairs(AIAssistant.Config.ADMIN_ONLY_TOOLS) do
-        if tool == toolName then
-            return ply:IsAdmin() or ply:IsSuperAdmin()
-        end
+    if AIAssistant.IsAdminOnlyTool(toolName) then
+        return ply:IsAdmin() or ply:IsSuperAdmin()
     end
     
     return true
@@ -103,6 +103,37 @@ local function GetPosition(args, ply, key)
     return pos or Vector(0, 0, 0)
 end
 
+-- Weapon aliases
+local WEAPON_ALIASES = {
+    crowbar = "weapon_crowbar",
+    pistol = "weapon_pistol",
+    smg = "weapon_smg1",
+    shotgun = "weapon_shotgun",
+    ar2 = "weapon_ar2",
+    rifle = "weapon_ar2",
+    rpg = "weapon_rpg",
+    crossbow = "weapon_crossbow",
+    grenade = "weapon_frag",
+    frag = "weapon_frag",
+    physcannon = "weapon_physcannon",
+    gravgun = "weapon_physcannon",
+    physgun = "weapon_physgun",
+    toolgun = "gmod_tool",
+    slam = "weapon_slam",
+    bugbait = "weapon_bugbait",
+    stunstick = "weapon_stunstick",
+    ["357"] = "weapon_357",
+    magnum = "weapon_357",
+}
+
+-- Helper: Add the weapon_ prefix unless the name already is a weapon class
+local function WeaponClass(weapon)
+    if string.StartWith(weapon, "weapon_") or string.StartWith(weapon, "gmod_") or weapons.GetStored(weapon) then
+        return weapon
+    end
+    return "weapon_" .. weapon
+end
+
 -- ============================================
 -- SPAWNING TOOLS
 -- ============================================
@@ -158,36 +189,42 @@ AIAssistant.Tools.Register("spawn_prop", "Spawn a prop/model in the world", func
     }
 end)
 
+-- NPC type aliases
+local NPC_ALIASES = {
+    zombie = "npc_zombie",
+    fastzombie = "npc_fastzombie",
+    headcrab = "npc_headcrab",
+    antlion = "npc_antlion",
+    combine = "npc_combine_s",
+    soldier = "npc_combine_s",
+    metro = "npc_metropolice",
+    police = "npc_metropolice",
+    citizen = "npc_citizen",
+    alyx = "npc_alyx",
+    barney = "npc_barney",
+    kleiner = "npc_kleiner",
+    dog = "npc_dog",
+    turret = "npc_turret_floor",
+    strider = "npc_strider",
+    gunship = "npc_combinegunship",
+    hunter = "npc_hunter",
+    vortigaunt = "npc_vortigaunt",
+    crow = "npc_crow",
+    seagull = "npc_seagull",
+    pigeon = "npc_pigeon",
+}
+
 AIAssistant.Tools.Register("spawn_npc", "Spawn one or more NPCs", function(args, ply)
     local npcType = args.npc_type or args.type or "npc_citizen"
     local count = math.Clamp(tonumber(args.count) or 1, 1, 20)  -- Max 20 for performance
     
-    -- NPC type aliases
-    local npcAliases = {
-        zombie = "npc_zombie",
-        fastzombie = "npc_fastzombie",
-        headcrab = "npc_headcrab",
-        antlion = "npc_antlion",
-        combine = "npc_combine_s",
-        soldier = "npc_combine_s",
-        metro = "npc_metropolice",
-        police = "npc_metropolice",
-        citizen = "npc_citizen",
-        alyx = "npc_alyx",
-        barney = "npc_barney",
-        kleiner = "npc_kleiner",
-        dog = "npc_dog",
-        turret = "npc_turret_floor",
-        strider = "npc_strider",
-        gunship = "npc_combinegunship",
-        hunter = "npc_hunter",
-        vortigaunt = "npc_vortigaunt",
-        crow = "npc_crow",
-        seagull = "npc_seagull",
-        pigeon = "npc_pigeon",
-    }
+    npcType = NPC_ALIASES[string.lower(npcType)] or npcType
     
-    npcType = npcAliases[string.lower(npcType)] or npcType
+    -- Spawnmenu NPCs (e.g. "CombineElite") are a class plus a model and keyvalues
+    local listed = list.Get("NPC")[npcType]
+    if listed and listed.Class then
+        npcType = listed.Class
+    end
     
     -- Add npc_ prefix if not present
     if not string.StartWith(npcType, "npc_") then
@@ -218,13 +255,21 @@ AIAssistant.Tools.Register("spawn_npc", "Spawn one or more NPCs", function(args,
         else
             npc:SetPos(pos)
             
+            if listed then
+                if listed.Model then
+                    npc:SetModel(listed.Model)
+                end
+                for key, value in pairs(listed.KeyValues or {}) do
+                    npc:SetKeyValue(key, tostring(value))
+                end
+                if listed.SpawnFlags then
+                    npc:SetKeyValue("spawnflags", tostring(listed.SpawnFlags))
+                end
+            end
+            
             -- Set weapon if specified
             if args.weapon then
-                local weapon = args.weapon
-                if not string.StartWith(weapon, "weapon_") then
-                    weapon = "weapon_" .. weapon
-                end
-                npc:SetKeyValue("additionalequipment", weapon)
+                npc:SetKeyValue("additionalequipment", WeaponClass(WEAPON_ALIASES[string.lower(args.weapon)] or args.weapon))
             end
             
             npc:Spawn()
@@ -292,18 +337,26 @@ AIAssistant.Tools.Register("spawn_entity", "Spawn any entity class", function(ar
     }
 end)
 
+-- Vehicle aliases
+local VEHICLE_DATA = {
+    jeep = {class = "prop_vehicle_jeep", model = "models/buggy.mdl", script = "scripts/vehicles/jeep_test.txt"},
+    airboat = {class = "prop_vehicle_airboat", model = "models/airboat.mdl", script = "scripts/vehicles/airboat.txt"},
+    jalopy = {class = "prop_vehicle_jeep", model = "models/vehicle.mdl", script = "scripts/vehicles/jalopy.txt"},
+    pod = {class = "prop_vehicle_prisoner_pod", model = "models/vehicles/prisoner_pod.mdl", script = "scripts/vehicles/prisoner_pod.txt"},
+}
+
 AIAssistant.Tools.Register("spawn_vehicle", "Spawn a vehicle", function(args, ply)
     local vehicleType = args.vehicle_type or args.type or "jeep"
     
-    -- Vehicle aliases
-    local vehicleData = {
-        jeep = {class = "prop_vehicle_jeep", model = "models/buggy.mdl", script = "scripts/vehicles/jeep_test.txt"},
-        airboat = {class = "prop_vehicle_airboat", model = "models/airboat.mdl", script = "scripts/vehicles/airboat.txt"},
-        jalopy = {class = "prop_vehicle_jeep", model = "models/vehicle.mdl", script = "scripts/vehicles/jalopy.txt"},
-        pod = {class = "prop_vehicle_prisoner_pod", model = "models/vehicles/prisoner_pod.mdl", script = "scripts/vehicles/prisoner_pod.txt"},
-    }
-    
-    local data = vehicleData[string.lower(vehicleType)] or vehicleData.jeep
+    local data = VEHICLE_DATA[string.lower(vehicleType)]
+    if not data then
+        -- Spawnmenu vehicles (addons included) by their list name
+        local listed = list.Get("Vehicles")[vehicleType]
+        if listed and listed.Class then
+            data = {class = listed.Class, model = listed.Model, script = listed.KeyValues and listed.KeyValues.vehiclescript}
+        end
+    end
+    data = data or VEHICLE_DATA.jeep
     local pos = GetPosition(args, ply)
     
     local vehicle = ents.Create(data.class)
@@ -311,10 +364,14 @@ AIAssistant.Tools.Register("spawn_vehicle", "Spawn a vehicle", function(args, pl
         return {success = false, error = "Failed to create vehicle"}
     end
     
-    vehicle:SetModel(data.model)
+    if data.model then
+        vehicle:SetModel(data.model)
+    end
     vehicle:SetPos(pos + Vector(0, 0, 50))
     vehicle:SetAngles(Angle(0, IsValid(ply) and ply:EyeAngles().y or 0, 0))
-    vehicle:SetKeyValue("vehiclescript", data.script)
+    if data.script then
+        vehicle:SetKeyValue("vehiclescript", data.script)
+    end
     vehicle:Spawn()
     vehicle:Activate()
     
@@ -461,29 +518,6 @@ AIAssistant.Tools.Register("give_weapon", "Give a weapon to the player", functio
         return {success = false, error = "No weapon specified"}
     end
     
-    -- Weapon aliases
-    local weaponAliases = {
-        crowbar = "weapon_crowbar",
-        pistol = "weapon_pistol",
-        smg = "weapon_smg1",
-        shotgun = "weapon_shotgun",
-        ar2 = "weapon_ar2",
-        rifle = "weapon_ar2",
-        rpg = "weapon_rpg",
-        crossbow = "weapon_crossbow",
-        grenade = "weapon_frag",
-        frag = "weapon_frag",
-        physcannon = "weapon_physcannon",
-        gravgun = "weapon_physcannon",
-        physgun = "weapon_physgun",
-        toolgun = "gmod_tool",
-        slam = "weapon_slam",
-        bugbait = "weapon_bugbait",
-        stunstick = "weapon_stunstick",
-        ["357"] = "weapon_357",
-        magnum = "weapon_357",
-    }
-    
     -- Ammo type mapping for weapons
     local weaponAmmoTypes = {
         weapon_smg1 = "smg1",
@@ -495,12 +529,7 @@ AIAssistant.Tools.Register("give_weapon", "Give a weapon to the player", functio
         weapon_rpg = "rpg_round",
     }
     
-    weapon = weaponAliases[string.lower(weapon)] or weapon
-    
-    -- Add weapon_ prefix if not present
-    if not string.StartWith(weapon, "weapon_") and not string.StartWith(weapon, "gmod_") then
-        weapon = "weapon_" .. weapon
-    end
+    weapon = WeaponClass(WEAPON_ALIASES[string.lower(weapon)] or weapon)
     
     ply:Give(weapon)
     
@@ -1762,4 +1791,45 @@ AIAssistant.Tools.Register("ai_live_drive_to", "Make your AI drive toward a posi
     return {success = success, message = msg}
 end)
 
+-- ============================================
+-- ASSET CATALOG
+-- ============================================
+
+-- Installed NPCs, weapons, entities, vehicles and prop models, sent to the bridge
+-- with the handshake so it can fix asset names and answer searches without us
+function AIAssistant.Tools.BuildCatalog()
+    local function Listed(listName, filter)
+        local items = {}
+        for name, data in pairs(list.Get(listName)) do
+            if not filter or filter(data) then
+                table.insert(items, {name = name, label = data.PrintName or data.Name})
+            end
+        end
+        return items
+    end
+    
+    local vehicles = Listed("Vehicles")
+    for alias in pairs(VEHICLE_DATA) do
+        table.insert(vehicles, {name = alias})
+    end
+    
+    local models = {}
+    local maxModels = AIAssistant.Config.CATALOG_MAX_MODELS
+    for _, dir in ipairs(AIAssistant.Config.CATALOG_MODEL_DIRS) do
+        for _, name in ipairs(file.Find(dir .. "/*.mdl", "GAME")) do
+            if #models >= maxModels then break end
+            table.insert(models, dir .. "/" .. name)
+        end
+    end
+    
+    return {
+        npc = Listed("NPC"),
+        weapon = Listed("Weapon", function(data) return data.Spawnable end),
+        entity = Listed("SpawnableEntities"),
+        vehicle = vehicles,
+        model = models,
+        aliases = {npc = NPC_ALIASES, weapon = WEAPON_ALIASES},
+    }
+end
+
 AIAssistant.Debug("Tools loaded - " .. table.Count(AIAssistant.Tools.Registry) .. " tools registered")
@@ -0,0 +1,270 @@
+--[[
+    AI Assistant World State Feed
+    Periodically sends delta-encoded world snapshots (players, entities, AI Live
+    companions) to the bridge so it can answer read-only tools locally.
+]]
+
+-- Ensure config is loaded first
+if not AIAssistant then
+    include("ai_assistant_config.lua")
+end
+
+AIAssistant.World = AIAssistant.World or {}
+AIAssistant.World.Seq = 0
+AIAssistant.World.ForceFull = true
+AIAssistant.World.TicksSinceFull = 0
+AIAssistant.World.Last = nil -- Last state sent to the bridge
+
+-- Classes that are never interesting to the AI
+local IGNORED_CLASSES = {
+    worldspawn = true,
+    predicted_viewmodel = true,
+    gmod_hands = true,
+    physgun_beam = true,
+}
+
+local function RoundPos(pos)
+    return {math.Round(pos.x), math.Round(pos.y), math.Round(pos.z)}
+end
+
+local function MovedFar(a, b)
+    local threshold = AIAssistant.Config.WORLD_STATE_MOVE_THRESHOLD
+    return math.abs(a[1] - b[1]) > threshold
+        or math.abs(a[2] - b[2]) > threshold
+        or math.abs(a[3] - b[3]) > threshold
+end
+
+-- Compare two records field by field, ignoring small position changes
+local function RecordChanged(old, new)
+    if not old then return true end
+    for key, value in pairs(new) do
+        if key == "pos" then
+            if not old.pos or MovedFar(old.pos, value) then return true end
+        elseif old[key] ~= value then
+            return true
+        end
+    end
+    return false
+end
+
+local function CollectPlayers()
+    local players = {}
+    for _, ply in ipairs(player.GetAll()) do
+        local steamid = ply:SteamID64()
+        if steamid then
+            local weapon = ply:GetActiveWeapon()
+            players[steamid] = {
+                steamid = steamid,
+                id = ply:EntIndex(),
+                name = ply:Nick(),
+                health = ply:Health(),
+                armor = ply:Armor(),
+                pos = RoundPos(ply:GetPos()),
+                weapon = IsValid(weapon) and weapon:GetClass() or "none",
+                alive = ply:Alive(),
+                is_admin = ply:IsAdmin(),
+                team = team.GetName(ply:Team()),
+                model = ply:GetModel()
+            }
+        end
+    end
+    return players
+end
+
+-- Lower sorts first: entities players spawned, then NPCs, then whatever is closest to a player
+local function EntityPriority(ent, playerPositions)
+    local pos = ent:GetPos()
+    local nearest = math.huge
+    for _, plyPos in ipairs(playerPositions) do
+        nearest = math.min(nearest, pos:DistToSqr(plyPos))
+    end
+    local rank = ent:CreatedByMap() and 2 or 0
+    if ent:IsNPC() or ent:IsPlayer() then rank = rank - 1 end
+    return rank, nearest
+end
+
+local function CollectEntities()
+    local entities = {}
+    local classCounts = {}
+    local candidates = {}
+    local maxEntities = AIAssistant.Config.WORLD_STATE_MAX_ENTITIES
+
+    for _, ent in ipairs(ents.GetAll()) do
+        local class = ent:GetClass()
+        classCounts[class] = (classCounts[class] or 0) + 1
+
+        -- Skip held weapons and internal entities
+        local held = ent:IsWeapon() and IsValid(ent:GetOwner())
+        if ent:EntIndex() > 0 and not IGNORED_CLASSES[class] and not held then
+            table.insert(candidates, ent)
+        end
+    end
+
+    -- Map entities alone can fill the cap; keep the ones tools care about
+    local truncated = #candidates > maxEntities
+    if truncated then
+        local playerPositions = {}
+        for _, ply in ipairs(player.GetAll()) do
+            table.insert(playerPositions, ply:GetPos())
+        end
+        local keys = {}
+        for _, ent in ipairs(candidates) do
+            local rank, distance = EntityPriority(ent, playerPositions)
+            keys[ent] = {rank, distance}
+        end
+        table.sort(candidates, function(a, b)
+            local ka, kb = keys[a], keys[b]
+            if ka[1] ~= kb[1] then return ka[1] < kb[1] end
+            return ka[2] < kb[2]
+        end)
+    end
+
+    for i = 1, math.min(#candidates, maxEntities) do
+        local ent = candidates[i]
+        entities[ent:EntIndex()] = {
+            id = ent:EntIndex(),
+            class = ent:GetClass(),
+            model = ent:GetModel() or "",
+            pos = RoundPos(ent:GetPos()),
+            is_npc = ent:IsNPC(),
+            is_player = ent:IsPlayer(),
+            name = ent:IsPlayer() and ent:Nick() or nil
+        }
+    end
+
+    return entities, classCounts, truncated
+end
+
+local function CollectCompanions()
+    local companions = {}
+    if not AIAssistant.AILive or not AIAssistant.AILive.Entities then
+        return companions
+    end
+
+    for ent, data in pairs(AIAssistant.AILive.Entities) do
+        if IsValid(ent) then
+            local weapon = ent.GetWeapon and ent:GetWeapon() or nil
+            companions[data.steamId] = {
+                owner = data.steamId,
+                id = ent:EntIndex(),
+                name = ent:GetAIName(),
+                health = ent:Health(),
+                max_health = ent:GetMaxHealth(),
+                state = ent.AIState or "unknown",
+                pos = RoundPos(ent:GetPos()),
+                weapon = IsValid(weapon) and weapon:GetClass() or "none"
+            }
+        end
+    end
+    return companions
+end
+
+-- Fill changed/removed lists for one keyed section of the snapshot
+local function DiffSection(old, new, full)
+    local changed = {}
+    local removed = {}
+
+    for key, record in pairs(new) do
+        if full or RecordChanged(old and old[key], record) then
+            table.insert(changed, record)
+        else
+            -- Keep the previously sent record so slow drift still crosses the threshold
+            new[key] = old[key]
+        end
+    end
+
+    if not full and old then
+        for key in pairs(old) do
+            if not new[key] then
+                table.insert(removed, key)
+            end
+        end
+    end
+
+    return changed, removed
+end
+
+local function CountsChanged(old, new)
+    if not old then return true end
+    for class, count in pairs(new) do
+        if old[class] ~= count then return true end
+    end
+    for class in pairs(old) do
+        if not new[class] then return true end
+    end
+    return false
+end
+
+-- Build and send one world_state frame
+function AIAssistant.World.SendSnapshot()
+    if not AIAssistant.WS or not AIAssistant.WS.Connected then return end
+
+    local world = AIAssistant.World
+    world.TicksSinceFull = world.TicksSinceFull + 1
+    local full = world.ForceFull or not world.Last
+        or world.TicksSinceFull >= AIAssistant.Config.WORLD_STATE_FULL_EVERY
+    local last = (not full) and world.Last or nil
+
+    local players = CollectPlayers()
+    local entities, classCounts, truncated = CollectEntities()
+    local companions = CollectCompanions()
+
+    local changedPlayers, removedPlayers = DiffSection(last and last.players, players, full)
+    local changedEntities, removedEntities = DiffSection(last and last.entities, entities, full)
+    local changedCompanions, removedCompanions = DiffSection(last and last.companions, companions, full)
+
+    world.Seq = world.Seq + 1
+
+    local frame = {
+        type = "world_state",
+        seq = world.Seq,
+        full = full,
+        players = changedPlayers,
+        removed_players = removedPlayers,
+        entities = changedEntities,
+        removed_entities = removedEntities,
+        companions = changedCompanions,
+        removed_companions = removedCompanions,
+        truncated = truncated -- The bridge only answers get_entities_nearby from a complete list
+    }
+
+    if full then
+        frame.server = {
+            server_name = GetHostName(),
+            map = game.GetMap(),
+            gamemode = engine.ActiveGamemode(),
+            max_players = game.MaxPlayers(),
+            tickrate = math.Round(1 / engine.TickInterval())
+        }
+    end
+
+    if full or CountsChanged(last and last.classCounts, classCounts) then
+        frame.class_counts = classCounts
+    end
+
+    world.Last = {
+        players = players,
+        entities = entities,
+        companions = companions,
+        classCounts = classCounts
+    }
+
+    if full then
+        world.ForceFull = false
+        world.TicksSinceFull = 0
+    end
+
+    AIAssistant.WS.Send(frame, true)
+end
+
+-- Ask for a full snapshot on the next tick (after connecting or on resync)
+function AIAssistant.World.RequestFull()
+    AIAssistant.World.ForceFull = true
+end
+
+timer.Create("AIAssistant_WorldState", AIAssistant.Config.WORLD_STATE_INTERVAL, 0, function()
+    if not AIAssistant.Config.WORLD_STATE_ENABLED then return end
+    AIAssistant.World.SendSnapshot()
+end)
+
+AIAssistant.Debug("World state feed loaded")
@@ -37,6 +37,14 @@ local function GenerateMessageId()
     return "msg_" .. os.time() .. "_" .. messageIdCounter
 end
 
+-- Asset catalog for the handshake, built once (scanning model folders is slow)
+function AIAssistant.WS.Catalog()
+    if not AIAssistant.WS.CatalogCache and AIAssistant.Tools.BuildCatalog then
+        AIAssistant.WS.CatalogCache = AIAssistant.Tools.BuildCatalog()
+    end
+    return AIAssistant.WS.CatalogCache
+end
+
 -- Connect to the bridge server
 function AIAssistant.WS.Connect()
     if not TryLoadGWSockets() then
@@ -71,11 +79,19 @@ function AIAssistant.WS.Connect()
         -- Send handshake with server info
         AIAssistant.WS.Send({
             type = "handshake",
+            server_id = AIAssistant.Config.SERVER_ID ~= "" and AIAssistant.Config.SERVER_ID or nil,
+            address = game.GetIPAddress(),
             server_name = GetHostName(),
             map = game.GetMap(),
             max_players = game.MaxPlayers(),
-            player_count = #player.GetAll()
+            player_count = #player.GetAll(),
+            assets = AIAssistant.Config.CATALOG_ENABLED and AIAssistant.WS.Catalog() or nil
         })
+        
+        -- Start the world state feed with a full snapshot
+        if AIAssistant.World then
+            AIAssistant.World.RequestFull()
+        end
     end
     
     function socket:onMessage(msg)
@@ -126,15 +142,19 @@ function AIAssistant.WS.ScheduleReconnect()
     end)
 end
 
--- Send a message to the bridge
-function AIAssistant.WS.Send(data)
+-- Send a message to the bridge (quiet skips debug logging for periodic frames)
+function AIAssistant.WS.Send(data, quiet)
     if not AIAssistant.WS.Connected or not AIAssistant.WS.Socket then
-        AIAssistant.Debug("Cannot send - not connected")
+        if not quiet then
+            AIAssistant.Debug("Cannot send - not connected")
+        end
         return false
     end
     
     local json = util.TableToJSON(data)
-    AIAssistant.Debug("Sending:", string.sub(json, 1, 200))
+    if not quiet then
+        AIAssistant.Debug("Sending:", string.sub(json, 1, 200))
+    end
     AIAssistant.WS.Socket:write(json)
     return true
 end
@@ -208,6 +228,42 @@ function AIAssistant.WS.SendToolResult(messageId, toolCallId, toolName, success,
     })
 end
 
+-- Ask the bridge to cancel the player's in-flight message
+function AIAssistant.WS.SendCancel(ply)
+    if not IsValid(ply) then return false end
+    
+    return AIAssistant.WS.Send({
+        type = "cancel",
+        player_id = ply:SteamID64()
+    })
+end
+
+-- Send a control command the bridge answers itself without the AI (clear, memory, model, flush_cache)
+function AIAssistant.WS.SendControl(ply, command, args)
+    return AIAssistant.WS.Send({
+        type = "control",
+        command = command,
+        player_id = IsValid(ply) and ply:SteamID64() or nil,
+        args = args
+    })
+end
+
+-- Ask the bridge for the token usage report (admins only)
+function AIAssistant.WS.SendUsageReport(ply)
+    return AIAssistant.WS.Send({
+        type = "usage_report",
+        player_id = IsValid(ply) and ply:SteamID64() or nil
+    })
+end
+
+-- Ask the bridge to reload its config.py and tools.py (admins only)
+function AIAssistant.WS.SendReloadConfig(ply)
+    return AIAssistant.WS.Send({
+        type = "reload_config",
+        player_id = IsValid(ply) and ply:SteamID64() or nil
+    })
+end
+
 -- Handle incoming messages from bridge
 function AIAssistant.WS.HandleMessage(data)
     local msgType = data.type
@@ -236,6 +292,34 @@ function AIAssistant.WS.HandleMessage(data)
         -- Error from bridge/AI
         AIAssistant.WS.HandleError(data)
         
+    elseif msgType == "cancelled" then
+        -- A message was cancelled (explicitly or superseded by a newer one)
+        AIAssistant.WS.HandleCancelled(data)
+        
+    elseif msgType == "usage_report" then
+        -- Token usage report requested by an admin
+        AIAssistant.WS.HandleUsageReport(data)
+        
+    elseif msgType == "control_result" then
+        -- Answer to a control command (memory cleared, memory stats, model picked...)
+        AIAssistant.WS.PrintReport(data, "[AI Assistant] ")
+        
+    elseif msgType == "reload_result" then
+        -- Outcome of a config reload requested by an admin
+        AIAssistant.WS.PrintReport(data, "[AI Reload] ")
+        
+    elseif msgType == "companion_commands" then
+        -- Commands for autonomous AI Live companions, one frame per tick
+        if AIAssistant.AILive then
+            AIAssistant.AILive.HandleCommands(data)
+        end
+        
+    elseif msgType == "world_state_resync" then
+        -- Bridge lost track of our deltas, send a full snapshot next tick
+        if AIAssistant.World then
+            AIAssistant.World.RequestFull()
+        end
+        
     else
         AIAssistant.Debug("Unknown message type:", msgType)
     end
@@ -251,11 +335,11 @@ function AIAssistant.WS.HandleResponse(data)
     
     local callback = AIAssistant.WS.PendingCallbacks[data.message_id]
     if callback and IsValid(callback.player) then
-        AIAssistant.Chat.ShowResponse(callback.player, data.text)
+        AIAssistant.Chat.ShowResponse(callback.player, data.text, data.segments)
     else
         -- Broadcast to all if no specific player
         for _, ply in ipairs(player.GetAll()) do
-            AIAssistant.Chat.ShowResponse(ply, data.text)
+            AIAssistant.Chat.ShowResponse(ply, data.text, data.segments)
         end
     end
 end
@@ -264,32 +348,44 @@ end
 AIAssistant.WS.StreamBuffers = {}
 
 -- Handle streaming response chunk
+-- Chunks are append-only: data.offset is the byte position of data.chunk in the
+-- answer, and data.segments holds chat lines the bridge has finished splitting
 function AIAssistant.WS.HandleStreamChunk(data)
     local messageId = data.message_id
     
     -- Initialize buffer if needed
     if not AIAssistant.WS.StreamBuffers[messageId] then
         AIAssistant.WS.StreamBuffers[messageId] = {
-            text = "",
+            length = 0,
+            unsent = "",
             lastUpdate = 0
         }
     end
+    local buffer = AIAssistant.WS.StreamBuffers[messageId]
+    
+    local chunk = data.chunk or ""
+    local offset = data.offset or buffer.length
+    if offset < buffer.length then
+        return  -- Already have this text
+    elseif offset > buffer.length then
+        AIAssistant.Debug("Stream gap for", messageId, "at", buffer.length, "->", offset)
+    end
+    buffer.length = offset + #chunk
+    buffer.unsent = buffer.unsent .. chunk
+    
+    local callback = AIAssistant.WS.PendingCallbacks[messageId]
+    if not (callback and IsValid(callback.player)) then return end
     
-    -- Append chunk to buffer
-    AIAssistant.WS.StreamBuffers[messageId].text = AIAssistant.WS.StreamBuffers[messageId].text .. (data.chunk or "")
+    AIAssistant.Chat.PrintSegments(callback.player, data.segments)
     
-    -- Rate-limit UI updates (every 100ms)
+    -- Rate-limit UI updates (every 100ms), sending only the text added since the last one
     local now = SysTime()
-    if now - AIAssistant.WS.StreamBuffers[messageId].lastUpdate > 0.1 then
-        AIAssistant.WS.StreamBuffers[messageId].lastUpdate = now
-        
-        local callback = AIAssistant.WS.PendingCallbacks[messageId]
-        if callback and IsValid(callback.player) then
-            -- Send streaming update to client
-            net.Start("AIAssistant_StreamUpdate")
-            net.WriteString(AIAssistant.WS.StreamBuffers[messageId].text)
-            net.Send(callback.player)
-        end
+    if buffer.unsent ~= "" and now - buffer.lastUpdate > 0.1 then
+        buffer.lastUpdate = now
+        net.Start("AIAssistant_StreamUpdate")
+        net.WriteString(buffer.unsent)
+        net.Send(callback.player)
+        buffer.unsent = ""
     end
 end
 
@@ -301,8 +397,11 @@ function AIAssistant.WS.HandleStreamEnd(data)
     if buffer then
         local callback = AIAssistant.WS.PendingCallbacks[messageId]
         if callback and IsValid(callback.player) then
-            -- Send final complete message
-            AIAssistant.Chat.ShowResponse(callback.player, buffer.text)
+            -- Stop thinking indicator and print the last chat lines
+            net.Start("AIAssistant_Thinking")
+            net.WriteBool(false)
+            net.Send(callback.player)
+            AIAssistant.Chat.PrintSegments(callback.player, data.segments)
             
             -- Mark as delivered to prevent duplicate from HandleResponse
             AIAssistant.WS.DeliveredMessages = AIAssistant.WS.DeliveredMessages or {}
@@ -342,8 +441,14 @@ function AIAssistant.WS.HandleToolCall(data)
     
     AIAssistant.Debug("Tool call:", toolName, "tool_call_id:", toolCallId, "args:", util.TableToJSON(args))
     
-    -- Check permissions
-    if IsValid(ply) and not AIAssistant.CanUseTool(ply, toolName) then
+    -- Check permissions (admin tools need a player to check, e.g. MCP calls without player_id)
+    local allowed
+    if IsValid(ply) then
+        allowed = AIAssistant.CanUseTool(ply, toolName)
+    else
+        allowed = not AIAssistant.IsAdminOnlyTool(toolName)
+    end
+    if not allowed then
         AIAssistant.WS.SendToolResult(data.message_id, toolCallId, toolName, false, "Permission denied: " .. toolName .. " requires admin")
         return
     end
@@ -384,6 +489,70 @@ function AIAssistant.WS.HandleError(data)
     end
 end
 
+-- Handle a cancelled message
+function AIAssistant.WS.HandleCancelled(data)
+    local ply = nil
+    local callback = data.message_id and AIAssistant.WS.PendingCallbacks[data.message_id]
+    if callback then
+        ply = callback.player
+    elseif data.player_id then
+        for _, p in ipairs(player.GetAll()) do
+            if p:SteamID64() == data.player_id then
+                ply = p
+                break
+            end
+        end
+    end
+    
+    if IsValid(ply) then
+        if not data.message_id then
+            ply:ChatPrint("[AI Assistant] Nothing to cancel.")
+        elseif data.reason ~= "superseded" then
+            ply:ChatPrint("[AI Assistant] Request cancelled.")
+            net.Start("AIAssistant_Thinking")
+            net.WriteBool(false)
+            net.Send(ply)
+        end
+        
+        if data.message_id and AIAssistant.WS.StreamBuffers[data.message_id] then
+            net.Start("AIAssistant_StreamEnd")
+            net.Send(ply)
+        end
+    end
+    
+    -- Cleanup
+    if data.message_id then
+        AIAssistant.WS.PendingCallbacks[data.message_id] = nil
+        AIAssistant.WS.StreamBuffers[data.message_id] = nil
+    end
+end
+
+-- Show the usage report to the admin who asked for it (or the server console)
+function AIAssistant.WS.HandleUsageReport(data)
+    AIAssistant.WS.PrintReport(data, "[AI Usage] ")
+end
+
+-- Print report lines to the player in data.player_id (or the server console)
+function AIAssistant.WS.PrintReport(data, prefix)
+    local target = nil
+    if data.player_id then
+        for _, p in ipairs(player.GetAll()) do
+            if p:SteamID64() == data.player_id then
+                target = p
+                break
+            end
+        end
+    end
+    
+    for _, line in ipairs(data.lines or {}) do
+        if IsValid(target) then
+            target:ChatPrint(prefix .. line)
+        else
+            print(prefix .. line)
+        end
+    end
+end
+
 -- Disconnect from bridge
 function AIAssistant.WS.Disconnect()
     if AIAssistant.WS.Socket then
@@ -344,8 +344,8 @@ function ENT:CommandGiveWeapon(weaponClass)
     
     weaponClass = weaponAliases[string.lower(weaponClass)] or weaponClass
     
-    -- Add weapon_ prefix if needed
-    if not string.StartWith(weaponClass, "weapon_") then
+    -- Add weapon_ prefix if needed (exact classes from the bridge's catalog may not have one)
+    if not string.StartWith(weaponClass, "weapon_") and not weapons.GetStored(weaponClass) then
         weaponClass = "weapon_" .. weaponClass
     end
     